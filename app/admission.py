@@ -0,0 +1,163 @@
+import math
+import threading
+import time
+from flask import current_app, g, jsonify, request
+from app.monitoring.metrics import DESCRIPTIONS, registre
+
+DESCRIPTIONS.update({
+    'admission_limit': ('gauge', 'Requêtes simultanées autorisées par limite (somme des workers)'),
+    'admission_in_flight': ('gauge', 'Requêtes admises en cours par limite'),
+    'admission_queued': ('gauge', "Requêtes en file d'attente par limite"),
+    'admission_rejected_total': ('counter', 'Requêtes refusées (503) par limite'),
+    'admission_wait_seconds': ('histogram', "Temps d'attente avant admission"),
+})
+
+
+class AdmissionRefusee(Exception):
+    """Limite saturée : file pleine ou attente maximale dépassée"""
+
+    def __init__(self, limite):
+        super().__init__(f'limite « {limite} » atteinte')
+        self.limite = limite
+
+
+def analyser_limites(texte):
+    """'allergies=16, allergies_allergy_statistics=2' → {'allergies': 16, ...}"""
+    limites = {}
+    for element in (texte or '').split(','):
+        if element.strip():
+            cle, valeur = element.split('=')
+            limites[cle.strip()] = int(valeur)
+    return limites
+
+
+def cles_endpoint(cles, endpoint):
+    """Clés s'appliquant à un endpoint : la sienne puis celle de son namespace (le plus long préfixe)"""
+    namespaces = [cle for cle in cles if endpoint.startswith(cle + '_')]
+    return [cle for cle in (endpoint if endpoint in cles else None, max(namespaces, key=len, default=None))
+            if cle is not None]
+
+
+class Limiteur:
+    """Sémaphore à file d'attente bornée : `limite` requêtes actives, `file_max` en attente"""
+
+    def __init__(self, nom, limite, file_max):
+        self.nom = nom
+        self.limite = limite
+        self.file_max = file_max
+        self.actives = 0
+        self.en_attente = 0
+        self._condition = threading.Condition()
+        registre.definir('admission_limit', limite, limite=nom)
+        self._publier()
+
+    def _publier(self):
+        registre.definir('admission_in_flight', self.actives, limite=self.nom)
+        registre.definir('admission_queued', self.en_attente, limite=self.nom)
+
+    def acquerir(self, echeance):
+        """Prend une place avant `echeance` (horloge monotone) ; False si refusé"""
+        with self._condition:
+            if self.actives < self.limite and self.en_attente == 0:
+                self.actives += 1
+                self._publier()
+                return True
+            if self.en_attente >= self.file_max:
+                return False
+            self.en_attente += 1
+            self._publier()
+            try:
+                admis = self._condition.wait_for(lambda: self.actives < self.limite,
+                                                 max(0.0, echeance - time.monotonic()))
+                if admis:
+                    self.actives += 1
+                return admis
+            finally:
+                self.en_attente -= 1
+                self._publier()
+
+    def liberer(self):
+        with self._condition:
+            self.actives -= 1
+            self._publier()
+            self._condition.notify()
+
+
+class ControleAdmission:
+    """Limites de concurrence par endpoint et par namespace, propres à chaque worker.
+
+    Une clé de `limites` désigne soit un endpoint Flask exact
+    (`allergies_allergy_statistics`), soit un namespace (`allergies`), qui couvre
+    alors tous ses endpoints. Une requête passe d'abord la limite de sa route
+    puis celle de son namespace, dans le même délai d'attente.
+    """
+
+    def __init__(self, limites, file_max=32, attente_max=0.5):
+        self.attente_max = attente_max
+        self.limiteurs = {nom: Limiteur(nom, limite, file_max) for nom, limite in limites.items()}
+        self._par_endpoint = {}
+
+    def limiteurs_pour(self, endpoint):
+        if endpoint not in self._par_endpoint:
+            self._par_endpoint[endpoint] = [self.limiteurs[cle] for cle in cles_endpoint(self.limiteurs, endpoint)]
+        return self._par_endpoint[endpoint]
+
+    def admettre(self, endpoint, attente=None):
+        """Renvoie les limiteurs acquis (à libérer) ou lève AdmissionRefusee"""
+        echeance = time.monotonic() + (self.attente_max if attente is None else attente)
+        acquis = []
+        for limiteur in self.limiteurs_pour(endpoint):
+            if not limiteur.acquerir(echeance):
+                liberer(acquis)
+                raise AdmissionRefusee(limiteur.nom)
+            acquis.append(limiteur)
+        return acquis
+
+
+def liberer(acquis):
+    for limiteur in reversed(acquis):
+        limiteur.liberer()
+
+
+def reponse_saturee(refus):
+    """Corps et en-têtes d'une réponse 503 (partagés avec le chemin ASGI)"""
+    delai = current_app.config.get('ADMISSION_RETRY_AFTER', 1)
+    registre.incrementer('admission_rejected_total', limite=refus.limite)
+    corps = {'message': f'Serveur saturé : {refus}, réessayez plus tard'}
+    return corps, {'Retry-After': str(max(1, math.ceil(delai)))}
+
+
+# ============= HOOKS FLASK =============
+
+def _admettre():
+    controle = current_app.extensions.get('admission')
+    if controle is None or request.endpoint is None:
+        return None
+    debut = time.perf_counter()
+    try:
+        g.admission_acquis = controle.admettre(request.endpoint)
+    except AdmissionRefusee as refus:
+        corps, entetes = reponse_saturee(refus)
+        return jsonify(corps), 503, entetes
+    if g.admission_acquis:
+        registre.observer('admission_wait_seconds', time.perf_counter() - debut, endpoint=request.endpoint)
+    return None
+
+
+def _liberer(exception=None):
+    liberer(g.pop('admission_acquis', []))
+
+
+def init_admission(app):
+    """Brancher le contrôle d'admission (503 + Retry-After au-delà des limites)"""
+    limites = analyser_limites(app.config.get('ADMISSION_LIMITS'))
+    if not app.config.get('ADMISSION_ENABLED', True) or not limites:
+        return
+
+    app.extensions['admission'] = ControleAdmission(
+        limites,
+        file_max=app.config.get('ADMISSION_MAX_QUEUE', 32),
+        attente_max=app.config.get('ADMISSION_MAX_WAIT_MS', 500) / 1000
+    )
+    app.before_request(_admettre)
+    app.teardown_request(_liberer)
@@ -0,0 +1,237 @@
+import threading
+import time
+import numpy as np
+from sqlalchemy import func, select
+from app.db.db import db
+from app.model import Aliment, Allergie, Categorie, ReactionAllergique, seuil_allergie_defaut
+from app.reactivite import lire_porteurs
+
+# Quantile de la loi normale pour les intervalles de confiance à 95 %
+Z_95 = 1.959964
+BORNES_DISTRIBUTION = np.arange(0, 101, 10)
+TAILLE_PARTITION = 200000
+
+
+class TableauReactions:
+    """Réactions aliment sous forme de colonnes NumPy (indices denses, compteurs int32)"""
+
+    def __init__(self, utilisateurs, aliments, consommations, reactions, aliment_ids, seuils, categories,
+                 noms_aliments=None, noms_categories=None, nombre_utilisateurs=None):
+        self.utilisateurs = utilisateurs      # indice dense de l'utilisateur, par réaction
+        self.aliments = aliments              # indice dense de l'aliment, par réaction
+        self.consommations = consommations
+        self.reactions = reactions
+        self.aliment_ids = aliment_ids        # indice dense → id de l'aliment
+        self.seuils = seuils                  # seuil (%) par aliment (sinon allergies portées, sinon global)
+        self.categories = categories          # indice de catégorie par aliment (-1 = sans catégorie)
+        self.noms_aliments = noms_aliments if noms_aliments is not None else {}
+        self.noms_categories = noms_categories if noms_categories is not None else {}
+        if nombre_utilisateurs is None:
+            nombre_utilisateurs = int(utilisateurs.max(initial=-1)) + 1
+        self.nombre_utilisateurs = nombre_utilisateurs
+
+    def __len__(self):
+        return len(self.consommations)
+
+
+def charger_reactions(taille_partition=TAILLE_PARTITION):
+    """Charge toutes les réactions aliment en colonnes NumPy, par partitions (mémoire bornée côté pilote)"""
+    colonnes = []
+    requete = (
+        select(ReactionAllergique.id, ReactionAllergique.utilisateur_id, ReactionAllergique.aliment_id,
+               func.coalesce(ReactionAllergique.times_eaten, 0), func.coalesce(ReactionAllergique.times_reacted, 0))
+        .where(ReactionAllergique.aliment_id.isnot(None))
+        .order_by(ReactionAllergique.id)
+        .limit(taille_partition)
+    )
+    dernier = None
+    while True:
+        # Pagination par clé sur l'id : mémoire bornée quel que soit le pilote. Exécutée par la
+        # connexion de la session (échéances, statistiques SQL) mais lue sur le curseur DBAPI :
+        # convertir des tuples bruts est plusieurs fois plus rapide que des objets Row
+        page = requete if dernier is None else requete.where(ReactionAllergique.id > dernier)
+        resultat = db.session.connection().execute(page)
+        lignes = resultat.cursor.fetchall()
+        resultat.close()
+        if not lignes:
+            break
+        partition = np.array(lignes, dtype=np.int64).reshape(-1, 5)
+        colonnes.append(partition[:, 1:])
+        if len(lignes) < taille_partition:
+            break
+        dernier = int(partition[-1, 0])
+    brut = np.concatenate(colonnes) if colonnes else np.zeros((0, 4), dtype=np.int64)
+
+    utilisateur_ids, utilisateurs = np.unique(brut[:, 0], return_inverse=True)
+    aliment_ids, aliments = np.unique(brut[:, 1], return_inverse=True)
+
+    # Métadonnées des aliments présents : seuil, catégorie, nom
+    defaut = seuil_allergie_defaut()
+    seuils = np.full(len(aliment_ids), defaut, dtype=np.float64)
+    # Seuil des allergies portées (le plus bas), remplacé ensuite par celui de l'aliment
+    seuils_allergies = dict(db.session.execute(
+        select(Allergie.id, Allergie.seuil_detection).where(Allergie.seuil_detection.isnot(None))
+    ).all())
+    if seuils_allergies:
+        portes = np.full(len(aliment_ids), np.inf)
+        for aliment_id, allergie_id in lire_porteurs():
+            indice = np.searchsorted(aliment_ids, aliment_id)
+            if allergie_id in seuils_allergies and indice < len(aliment_ids) and aliment_ids[indice] == aliment_id:
+                portes[indice] = min(portes[indice], seuils_allergies[allergie_id])
+        seuils = np.where(np.isinf(portes), seuils, portes)
+    categories = np.full(len(aliment_ids), -1, dtype=np.int32)
+    noms_aliments = {}
+    categorie_ids = {}
+    for aliment_id, nom, seuil, categorie_id in db.session.execute(
+        select(Aliment.id, Aliment.nom, Aliment.seuil_allergie, Aliment.categorie_id)
+    ):
+        indice = np.searchsorted(aliment_ids, aliment_id)
+        if indice < len(aliment_ids) and aliment_ids[indice] == aliment_id:
+            noms_aliments[int(indice)] = nom
+            if seuil is not None:
+                seuils[indice] = seuil
+            if categorie_id is not None:
+                categories[indice] = categorie_ids.setdefault(categorie_id, len(categorie_ids))
+    noms = dict(db.session.execute(select(Categorie.id, Categorie.nom)).all())
+    noms_categories = {indice: noms.get(categorie_id) for categorie_id, indice in categorie_ids.items()}
+
+    return TableauReactions(
+        utilisateurs.astype(np.int32), aliments.astype(np.int32),
+        brut[:, 2].astype(np.int32), brut[:, 3].astype(np.int32),
+        aliment_ids, seuils, categories, noms_aliments, noms_categories, len(utilisateur_ids)
+    )
+
+
+def intervalle_wilson(succes, essais, z=Z_95):
+    """Bornes de Wilson (en %) de la proportion succes / essais, vectorisées ; NaN si essais = 0"""
+    succes = np.asarray(succes, dtype=np.float64)
+    essais = np.asarray(essais, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = succes / essais
+        z2 = z * z
+        denominateur = 1 + z2 / essais
+        centre = (p + z2 / (2 * essais)) / denominateur
+        marge = z * np.sqrt(p * (1 - p) / essais + z2 / (4 * essais * essais)) / denominateur
+    return np.clip(centre - marge, 0, 1) * 100, np.clip(centre + marge, 0, 1) * 100
+
+
+def _agreger(indices, taille, consommations, reactions, allergiques, taux, expose):
+    """Sommes par groupe (aliment ou catégorie) en une passe de bincount chacune"""
+    total_consommations = np.bincount(indices, weights=consommations, minlength=taille)
+    total_reactions = np.bincount(indices, weights=reactions, minlength=taille)
+    nombre = np.bincount(indices, minlength=taille)
+    # `taux` vaut 0 hors exposition : pas de sélection booléenne (copie de N lignes) nécessaire
+    nombre_exposes = np.bincount(indices, weights=expose, minlength=taille)
+    somme_taux = np.bincount(indices, weights=taux, minlength=taille)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        taux_global = np.where(total_consommations > 0, total_reactions / total_consommations * 100, 0.0)
+        taux_moyen = np.where(nombre_exposes > 0, somme_taux / nombre_exposes, 0.0)
+    basse, haute = intervalle_wilson(total_reactions, total_consommations)
+    return {
+        'reactions': nombre,
+        'allergiques': np.bincount(indices, weights=allergiques, minlength=taille).astype(np.int64),
+        'consommations': total_consommations.astype(np.int64),
+        'reactions_observees': total_reactions.astype(np.int64),
+        'taux_global': taux_global,
+        'taux_moyen': taux_moyen,
+        'borne_basse': np.nan_to_num(basse),
+        'borne_haute': np.nan_to_num(haute),
+    }
+
+
+def _lignes(agregats, ordre, libelles):
+    return [
+        {
+            **libelles(int(i)),
+            'reactions': int(agregats['reactions'][i]),
+            'reactions_allergiques': int(agregats['allergiques'][i]),
+            'consommations': int(agregats['consommations'][i]),
+            'taux_global': round(float(agregats['taux_global'][i]), 2),
+            'taux_moyen_par_utilisateur': round(float(agregats['taux_moyen'][i]), 2),
+            'intervalle_confiance_95': [round(float(agregats['borne_basse'][i]), 2),
+                                        round(float(agregats['borne_haute'][i]), 2)],
+        }
+        for i in ordre
+    ]
+
+
+def analyser(tableau, top=10, min_consommations=20):
+    """Indicateurs de population calculés en colonnes : global, par aliment, par catégorie, distribution.
+
+    Les aliments sont classés par borne basse de Wilson du taux de réaction : un
+    aliment peu consommé ne remonte pas sur un taux élevé mais peu significatif.
+    """
+    consommations = tableau.consommations.astype(np.float64)
+    reactions = tableau.reactions.astype(np.float64)
+    expose = tableau.consommations > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        taux = np.where(expose, reactions / consommations * 100, 0.0)
+    # Même règle que ReactionAllergique.est_allergique, sans division
+    allergiques = expose & (reactions * 100 > tableau.seuils[tableau.aliments] * consommations)
+
+    nombre_aliments = len(tableau.aliment_ids)
+    par_aliment = _agreger(tableau.aliments, nombre_aliments, consommations, reactions, allergiques, taux, expose)
+    significatifs = np.flatnonzero(par_aliment['consommations'] >= min_consommations)
+    ordre = significatifs[np.argsort(-par_aliment['borne_basse'][significatifs], kind='stable')][:top]
+
+    # Catégories : l'indice -1 (sans catégorie) est décalé en 0
+    nombre_categories = int(tableau.categories.max(initial=-1)) + 2
+    categorie_par_reaction = tableau.categories[tableau.aliments] + 1
+    par_categorie = _agreger(categorie_par_reaction, nombre_categories, consommations, reactions,
+                             allergiques, taux, expose)
+    ordre_categories = np.argsort(-par_categorie['taux_global'], kind='stable')
+    ordre_categories = ordre_categories[par_categorie['reactions'][ordre_categories] > 0]
+
+    distribution, _ = np.histogram(taux[expose], bins=BORNES_DISTRIBUTION)
+    # Indices d'utilisateurs denses : un marquage booléen évite un np.unique (tri ou hachage) sur N lignes
+    marques = np.zeros(tableau.nombre_utilisateurs, dtype=bool)
+    marques[tableau.utilisateurs[allergiques]] = True
+    utilisateurs_allergiques = int(marques.sum())
+    total_consommations = consommations.sum()
+    basse, haute = intervalle_wilson(reactions.sum(), total_consommations)
+
+    return {
+        'global': {
+            'reactions': len(tableau),
+            'reactions_allergiques': int(allergiques.sum()),
+            'utilisateurs': tableau.nombre_utilisateurs,
+            'utilisateurs_avec_allergie': utilisateurs_allergiques,
+            'aliments': nombre_aliments,
+            'taux_global': round(float(reactions.sum() / total_consommations * 100), 2) if total_consommations else 0.0,
+            'taux_moyen': round(float(taux[expose].mean()), 2) if expose.any() else 0.0,
+            'taux_median': round(float(np.median(taux[expose])), 2) if expose.any() else 0.0,
+            'intervalle_confiance_95': [round(float(np.nan_to_num(basse)), 2), round(float(np.nan_to_num(haute)), 2)],
+        },
+        'aliments_a_risque': _lignes(par_aliment, ordre, lambda i: {
+            'aliment_id': int(tableau.aliment_ids[i]),
+            'aliment': tableau.noms_aliments.get(i),
+            'seuil_allergie': float(tableau.seuils[i]),
+        }),
+        'categories': _lignes(par_categorie, ordre_categories, lambda i: {
+            'categorie': tableau.noms_categories.get(i - 1, 'Sans catégorie') if i else 'Sans catégorie',
+        }),
+        'distribution_taux': [
+            {'de': int(debut), 'a': int(fin), 'reactions': int(nombre)}
+            for debut, fin, nombre in zip(BORNES_DISTRIBUTION[:-1], BORNES_DISTRIBUTION[1:], distribution)
+        ],
+    }
+
+
+# ============= CACHE DU PROCESSUS =============
+
+_cache = {'tableau': None, 'charge_a': 0.0}
+_verrou = threading.Lock()
+
+
+def tableau_courant(duree_cache):
+    """Tableau des réactions du worker, rechargé au-delà de `duree_cache` secondes"""
+    with _verrou:
+        if _cache['tableau'] is None or time.monotonic() - _cache['charge_a'] > duree_cache:
+            _cache['tableau'] = charger_reactions()
+            _cache['charge_a'] = time.monotonic()
+        return _cache['tableau'], time.monotonic() - _cache['charge_a']
+
+
+def invalider():
+    with _verrou:
+        _cache['tableau'] = None
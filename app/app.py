@@ -4,7 +4,7 @@ from flask_migrate import Migrate
 from dotenv import load_dotenv
 from app.db.db import db
 from app.config.config import Config
-from app.initialize_functions import register_blueprints
+from app.initialize_functions import register_blueprints, register_commands, register_index_memoire, register_monitoring, register_protections
 
 load_dotenv()
 
@@ -21,7 +21,19 @@ def create_app():
     # Initialiser les migrations
     Migrate(app, db)
     
+    # Instrumentation des performances
+    register_monitoring(app)
+    
+    # Protection contre la surcharge (limites de concurrence)
+    register_protections(app)
+    
+    # Index en mémoire (vérifications d'allergies sans requête SQL)
+    register_index_memoire(app)
+    
     # Enregistrer seulement les blueprints Flask (pas l'API)
     register_blueprints(app)
     
+    # Commandes CLI (flask import-aliments, ...)
+    register_commands(app)
+    
     return app
\ No newline at end of file
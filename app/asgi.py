@@ -0,0 +1,149 @@
+import asyncio
+import json
+import time
+from asgiref.wsgi import WsgiToAsgi
+from flask_restx import marshal
+from werkzeug.exceptions import HTTPException
+from app.admission import AdmissionRefusee, liberer, reponse_saturee
+from app.db.async_engine import LecturesAsync
+from app.db.echeances import ENTETE_DELAI, delai_requete
+from app.monitoring.metrics import registre
+
+
+class ApplicationASGI:
+    """Point d'entrée ASGI : lectures critiques en asynchrone, le reste délégué à Flask.
+
+    Les endpoints de `ROUTES_ASYNC` sont servis directement sur la boucle
+    d'événements avec le moteur asynchrone : une requête SQL lente n'occupe plus
+    de thread. Ils réutilisent les requêtes (`requetes`) et l'assemblage
+    (`construire`) de leurs ressources Flask : le corps est celui du chemin Flask
+    lu en base. Ce chemin ne passe ni par les hooks Flask (statistiques SQL,
+    profilage, en-têtes X-DB-*) ni par les raccourcis en mémoire (filtre de Bloom,
+    index des allergies). Les requêtes avec query string (`?detail=false`...) et
+    toutes les autres routes passent par Flask via l'adaptateur WSGI → ASGI.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.wsgi = WsgiToAsgi(app)
+        self.lectures = None
+        self.routes = self._routes_async() if app.config.get('ASGI_ASYNC_DB', True) else {}
+
+    @staticmethod
+    def _routes_async():
+        from app.routes.allergies_advanced import AllergyCheck, UserAllergyProfile
+        from app.routes.recommandations import RecommandationsByUser, models
+
+        return {
+            # endpoint Flask : (ressource, message d'erreur, modèle de sérialisation)
+            'allergies_user_allergy_profile': (UserAllergyProfile, "Erreur lors de l'analyse", None),
+            'allergies_allergy_check': (AllergyCheck, 'Erreur lors de la vérification', None),
+            'recommandations_recommandations_by_user': (
+                RecommandationsByUser, 'Erreur lors de la récupération', models['recommandation']
+            ),
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._cycle_de_vie(receive, send)
+        if scope['type'] == 'http' and scope['method'] == 'GET' and self.routes:
+            correspondance = self._router(scope)
+            if correspondance is not None:
+                return await self._servir(correspondance, scope, send)
+        return await self.wsgi(scope, receive, send)
+
+    async def _cycle_de_vie(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                if self.routes:
+                    # Le moteur et son pool appartiennent à la boucle du serveur
+                    self.lectures = LecturesAsync(
+                        self.app.config.get('ASYNC_DATABASE_URL') or self.app.config['SQLALCHEMY_DATABASE_URI'],
+                        self.app.config.get('ASYNC_DB_POOL_SIZE', 10)
+                    )
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.lectures is not None:
+                    await self.lectures.fermer()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _router(self, scope):
+        if scope.get('query_string'):
+            # Les paramètres sont lus par la méthode get() de la ressource, pas par `requetes`
+            return None
+        # Même table de routage que Flask : mêmes URL, mêmes convertisseurs
+        adaptateur = self.app.url_map.bind('', script_name=scope.get('root_path') or None)
+        try:
+            endpoint, arguments = adaptateur.match(scope['path'], method='GET')
+        except HTTPException:
+            return None
+        if endpoint not in self.routes or self.lectures is None:
+            return None
+        return endpoint, arguments
+
+    async def _servir(self, correspondance, scope, send):
+        endpoint, arguments = correspondance
+        ressource, message_erreur, modele = self.routes[endpoint]
+        debut = time.perf_counter()
+        entetes = {}
+        try:
+            acquis = await self._admettre(endpoint)
+        except AdmissionRefusee as refus:
+            with self.app.app_context():
+                corps, entetes = reponse_saturee(refus)
+            statut = 503
+        else:
+            entete = dict(scope['headers']).get(ENTETE_DELAI.lower().encode(), b'').decode()
+            delai = delai_requete(self.app, endpoint, entete)
+            try:
+                # L'annulation de la tâche interrompt la requête côté pilote asynchrone
+                resultats = await asyncio.wait_for(self.lectures.executer(ressource.requetes(**arguments)), delai)
+                # L'assemblage peut recharger le graphe de réactivité croisée : hors de la boucle
+                corps = await asyncio.to_thread(self._construire, ressource, resultats)
+                if modele is not None:
+                    corps = marshal(corps, modele)
+                statut = 200
+            except HTTPException as e:
+                # 404 d'un id inexistant, comme le chemin Flask
+                corps, statut = {'message': e.description}, e.code
+            except asyncio.TimeoutError:
+                registre.incrementer('http_request_timeouts_total', endpoint=endpoint)
+                corps, statut = {'message': f'Délai de la requête dépassé ({delai * 1000:.0f} ms)'}, 504
+            except Exception as e:
+                corps, statut = {'message': f'{message_erreur}: {str(e)}'}, 500
+            finally:
+                liberer(acquis)
+
+        donnees = (json.dumps(corps) + '\n').encode()
+        await send({'type': 'http.response.start', 'status': statut, 'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(donnees)).encode()),
+        ] + [(cle.lower().encode(), valeur.encode()) for cle, valeur in entetes.items()]})
+        await send({'type': 'http.response.body', 'body': donnees})
+
+        registre.incrementer('http_requests_total', endpoint=endpoint, method='GET')
+        if statut >= 500:
+            registre.incrementer('http_request_errors_total', endpoint=endpoint, method='GET')
+        registre.observer('http_request_duration_seconds', time.perf_counter() - debut, endpoint=endpoint)
+
+    def _construire(self, ressource, resultats):
+        # Contexte d'application : l'assemblage lit le graphe de réactivité croisée du worker
+        with self.app.app_context():
+            return ressource.construire(resultats)
+
+    async def _admettre(self, endpoint):
+        """Mêmes limites que les requêtes Flask ; l'attente éventuelle se fait hors de la boucle"""
+        controle = self.app.extensions.get('admission')
+        if controle is None:
+            return []
+        try:
+            return controle.admettre(endpoint, attente=0)
+        except AdmissionRefusee:
+            return await asyncio.to_thread(controle.admettre, endpoint)
+
+
+def creer_application_asgi(app):
+    """Envelopper l'application Flask pour un serveur ASGI (uvicorn, hypercorn)"""
+    return ApplicationASGI(app)
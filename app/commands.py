@@ -0,0 +1,63 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+
+@click.command('import-aliments')
+@click.argument('fichier', type=click.Path(exists=True, dir_okay=False))
+@click.option('--lot', default=1000, show_default=True, help='Lignes par lot INSERT/UPDATE')
+@click.option('--separateur', default=None, help='Séparateur CSV (détecté si absent)')
+@click.option('--encodage', default='utf-8-sig', show_default=True, help='Encodage du fichier (ex. latin-1)')
+@click.option('--colonne', multiple=True, metavar='CHAMP=EN-TETE',
+              help='Correspondance explicite, ex. --colonne calories="Energie (kcal/100g)"')
+@click.option('--sans-mise-a-jour', is_flag=True, help='Ignorer les aliments déjà présents')
+@with_appcontext
+def import_aliments_command(fichier, lot, separateur, encodage, colonne, sans_mise_a_jour):
+    """📥 Importer un CSV d'aliments (tables nutritionnelles de référence)"""
+    from app.db.import_csv import importer_aliments
+
+    correspondance = dict(element.split('=', 1) for element in colonne)
+    with open(fichier, newline='', encoding=encodage) as flux:
+        rapport = importer_aliments(flux, lot, separateur, correspondance, not sans_mise_a_jour)
+
+    click.echo(f"✅ {rapport['lignes']} lignes en {rapport['duree_s']}s "
+               f"({rapport['lignes_par_seconde']:,.0f} lignes/s) : {rapport['inserees']} insérées, "
+               f"{rapport['mises_a_jour']} mises à jour, {rapport['ignorees']} ignorées, "
+               f"{rapport['rejetees']} rejetées, {rapport['categories_creees']} catégories créées")
+    for erreur in rapport['erreurs']:
+        click.echo(f"⚠️ {erreur}")
+
+
+
+@click.command('taches-worker')
+@click.option('--intervalle', default=1.0, show_default=True, help='Pause (s) quand la file est vide')
+@click.option('--lot', default=100, show_default=True, help='Tâches réservées par itération')
+@click.option('--une-fois', is_flag=True, help="S'arrêter dès que la file est vide")
+@with_appcontext
+def taches_worker_command(intervalle, lot, une_fois):
+    """⏳ Traiter la file des tâches de fond (détection automatique d'allergies)"""
+    from app.db.taches import executer_worker
+
+    click.echo(f"⏳ Worker de tâches démarré (lot de {lot})")
+    total = executer_worker(current_app._get_current_object(), intervalle, lot, une_fois)
+    click.echo(f"✅ {total} tâches traitées")
+
+
+@click.command('backfill-allergies')
+@click.option('--tranche', default=10000, show_default=True, help="Réactions par tranche d'identifiants")
+@click.option('--processus', default=4, show_default=True, help='Workers forkés (0 = processus courant)')
+@click.option('--nouvelle', is_flag=True, help='Démarrer une nouvelle campagne même si la précédente est inachevée')
+@click.option('--planifier-seulement', is_flag=True, help='Mettre les tranches en file pour `flask taches-worker`')
+@with_appcontext
+def backfill_allergies_command(tranche, processus, nouvelle, planifier_seulement):
+    """🔁 Re-détecter les allergies de toutes les réactions (reprise automatique)"""
+    from app.db.backfill import etat_backfill, executer_backfill, planifier_backfill
+
+    campagne, creee = planifier_backfill(tranche, nouvelle)
+    click.echo(f"{'🆕 Campagne' if creee else '⏯️ Reprise de la campagne'} {campagne} : {etat_backfill()['tranches']}")
+    if planifier_seulement:
+        return
+
+    executer_backfill(current_app._get_current_object(), processus)
+    etat = etat_backfill()
+    click.echo(f"✅ Tranches : {etat['tranches']} ; {etat['allergies_ajoutees']} allergies ajoutées")
@@ -0,0 +1,293 @@
+from flask import current_app
+from sqlalchemy import exists, select
+from app.db.db import db
+from app.index_memoire import IndexMemoire, lire_lignes
+from app.model import Aliment, AllergieUtilisateur, ReactionAllergique, Recette, Utilisateur
+from app.monitoring.metrics import DESCRIPTIONS, registre
+from app.reactivite import GrapheReactivite, graphe_courant, lire_porteurs
+from app.signals import allergies_modifiees, catalogue_modifie
+
+DESCRIPTIONS.update({
+    'counter_checks_total': ('counter', 'Vérifications au comptoir, par statut et par source'),
+    'counter_profiles': ('gauge', 'Utilisateurs (profils allergiques) chargés pour le comptoir'),
+    'counter_allergens': ('gauge', 'Allergies du graphe de réactivité croisée utilisé par le comptoir'),
+    'counter_rebuilds_total': ('counter', 'Reconstructions complètes de la structure du comptoir'),
+})
+
+AUTORISE = 'autorise'
+DECONSEILLE = 'deconseille'
+INTERDIT = 'interdit'
+
+
+class UtilisateurInconnu(LookupError):
+    """Badge d'un utilisateur inexistant (→ 404) : jamais de verdict « autorisé » par défaut"""
+
+
+class Catalogue:
+    """Graphe de réactivité croisée et plats connus, chargés ensemble (codes cohérents entre eux).
+
+    Les plats modifiés depuis le chargement sont mis à jour sur place, un par un ;
+    le masque des allergies d'un aliment est donc copié du graphe.
+    """
+
+    def __init__(self, graphe, aliments, recettes):
+        self.graphe = graphe
+        self.aliments = set(aliments)
+        self.recettes = set(recettes)
+        self.plats = dict(graphe.plats)
+
+
+def _lire_profils(utilisateurs=None):
+    """{utilisateur_id: (allergies confirmées, aliments au-dessus du seuil, recettes au-dessus du seuil)}
+
+    Tous les utilisateurs existants ont un profil, vide au besoin : un id absent est inconnu.
+    """
+    existants = select(Utilisateur.id)
+    allergies = select(AllergieUtilisateur.utilisateur_id, AllergieUtilisateur.allergie_id)
+    reactions = select(
+        ReactionAllergique.utilisateur_id, ReactionAllergique.aliment_id, ReactionAllergique.recette_id
+    ).where(ReactionAllergique.est_allergique)
+    if utilisateurs is not None:
+        existants = existants.where(Utilisateur.id.in_(utilisateurs))
+        allergies = allergies.where(AllergieUtilisateur.utilisateur_id.in_(utilisateurs))
+        reactions = reactions.where(ReactionAllergique.utilisateur_id.in_(utilisateurs))
+
+    brut = {utilisateur: (set(), set(), set()) for utilisateur, in lire_lignes(existants)}
+    for utilisateur, allergie in lire_lignes(allergies):
+        brut.setdefault(utilisateur, (set(), set(), set()))[0].add(allergie)
+    for utilisateur, aliment, recette in lire_lignes(reactions):
+        profil = brut.setdefault(utilisateur, (set(), set(), set()))
+        if aliment is not None:
+            profil[1].add(aliment)
+        elif recette is not None:
+            profil[2].add(recette)
+    return {u: (allergies, frozenset(aliments), frozenset(recettes)) for u, (allergies, aliments, recettes) in brut.items()}
+
+
+class IndexComptoir(IndexMemoire):
+    """Verdicts « l'utilisateur peut-il manger ce plat ? » servis depuis la mémoire du worker.
+
+    Chaque profil garde la fermeture de ses allergies confirmées dans le graphe de
+    réactivité croisée, en masque de bits (un bit par allergie), et ses aliments et
+    recettes au-dessus du seuil en ensembles ; chaque aliment a le masque des
+    allergies qu'il porte. Un verdict est un ET binaire et deux tests
+    d'appartenance. Un utilisateur absent de la structure (créé depuis le
+    chargement, ou inexistant) n'est jamais autorisé par défaut : la base
+    tranche. Un aliment ou une recette créé, modifié ou supprimé est relu seul
+    à la lecture suivante. Une allergie inconnue du graphe chargé (créée
+    depuis) rend la structure périmée : les vérifications passent par la base
+    jusqu'à la reconstruction.
+    """
+
+    nom = 'comptoir'
+
+    def __init__(self, app, intervalle=60):
+        super().__init__(app, intervalle)
+        # (catalogue, profils) remplacés d'un bloc : un verdict ne mélange jamais deux versions des codes
+        self._etat = (Catalogue(GrapheReactivite([], [], []), [], []), {})
+        self._plats_a_recharger = {}  # ('aliments' | 'recettes', id) → numéro de l'écriture qui l'a marqué
+
+    def _construire(self, utilisateurs=None):
+        # Plats marqués avant la première lecture : couverts par cette reconstruction
+        sequence = self._sequence
+        profils = _lire_profils(utilisateurs)
+        if utilisateurs is not None:
+            return profils
+        catalogue = Catalogue(
+            graphe_courant({allergie for allergies, _, _ in profils.values() for allergie in allergies},
+                           attendre=True),
+            (aliment_id for aliment_id, in lire_lignes(select(Aliment.id))),
+            (recette_id for recette_id, in lire_lignes(select(Recette.id)))
+        )
+        return catalogue, profils, sequence
+
+    def _coder(self, catalogue, allergies, aliments, recettes):
+        if not catalogue.graphe.connait(allergies):
+            self._perimer()
+        return catalogue.graphe.masque_etendu(allergies), aliments, recettes
+
+    def _installer(self, etat):
+        catalogue, profils, sequence = etat
+        self._etat = (catalogue, {u: self._coder(catalogue, *profil) for u, profil in profils.items()})
+        self._plats_a_recharger = {p: s for p, s in self._plats_a_recharger.items() if s > sequence}
+
+    def _fusionner(self, profils, utilisateurs):
+        catalogue, courants = self._etat
+        for utilisateur in utilisateurs:
+            if utilisateur in profils:
+                courants[utilisateur] = self._coder(catalogue, *profils[utilisateur])
+            else:
+                courants.pop(utilisateur, None)
+
+    def invalider_plats(self, entite, ids):
+        """Marque des aliments ou des recettes à relire, sans reconstruction complète"""
+        with self._verrou:
+            self._sequence += 1
+            for plat_id in ids:
+                self._plats_a_recharger[(entite, plat_id)] = self._sequence
+
+    def _recharger_plats(self):
+        with self._verrou:
+            marques = dict(self._plats_a_recharger)
+        aliments = [plat_id for entite, plat_id in marques if entite == 'aliments']
+        recettes = [plat_id for entite, plat_id in marques if entite == 'recettes']
+        aliments_existants, recettes_existantes, porteurs, utilisateurs = set(), set(), {}, set()
+        if aliments:
+            aliments_existants = {a for a, in lire_lignes(select(Aliment.id).where(Aliment.id.in_(aliments)))}
+            for aliment_id, allergie_id in lire_porteurs(aliments):
+                porteurs.setdefault(aliment_id, []).append(allergie_id)
+            # Seuil de l'aliment modifié : les réactions de ces utilisateurs sont réévaluées
+            utilisateurs = {u for u, in lire_lignes(
+                select(ReactionAllergique.utilisateur_id).distinct().where(ReactionAllergique.aliment_id.in_(aliments))
+            )}
+        if recettes:
+            recettes_existantes = {r for r, in lire_lignes(select(Recette.id).where(Recette.id.in_(recettes)))}
+
+        with self._verrou:
+            catalogue, _ = self._etat
+            for aliment_id in aliments:
+                allergies = porteurs.get(aliment_id, ())
+                if not catalogue.graphe.connait(allergies):
+                    self._perimer()
+                masque = catalogue.graphe.masque(allergies)
+                if masque:
+                    catalogue.plats[aliment_id] = masque
+                else:
+                    catalogue.plats.pop(aliment_id, None)
+                if aliment_id in aliments_existants:
+                    catalogue.aliments.add(aliment_id)
+                else:
+                    catalogue.aliments.discard(aliment_id)
+            for recette_id in recettes:
+                if recette_id in recettes_existantes:
+                    catalogue.recettes.add(recette_id)
+                else:
+                    catalogue.recettes.discard(recette_id)
+            for plat, sequence in marques.items():
+                if self._plats_a_recharger.get(plat) == sequence:
+                    del self._plats_a_recharger[plat]
+        if utilisateurs:
+            self.invalider(utilisateurs)
+
+    # ----- lectures -----
+
+    def pret(self, utilisateur_id):
+        pret = super().pret(utilisateur_id)
+        if self._plats_a_recharger:
+            self._recharger_plats()
+            if utilisateur_id in self._a_recharger:
+                self._recharger_utilisateurs([utilisateur_id])
+        return pret and not self._perime
+
+    def verifier(self, utilisateur_id, aliment_id=None, recette_id=None):
+        """(statut, allergènes en cause) pour un aliment ou une recette ; None si le plat est inconnu.
+
+        À appeler après `pret(utilisateur_id)`. Lève UtilisateurInconnu si l'utilisateur
+        n'est pas chargé.
+        """
+        catalogue, profils = self._etat
+        profil = profils.get(utilisateur_id)
+        if profil is None:
+            raise UtilisateurInconnu(utilisateur_id)
+        masque, aliments, recettes = profil
+        if aliment_id is not None:
+            if aliment_id not in catalogue.aliments:
+                return None
+            en_cause = masque & catalogue.plats.get(aliment_id, 0)
+            if en_cause:
+                return INTERDIT, catalogue.graphe.decoder(en_cause)
+            return (DECONSEILLE if aliment_id in aliments else AUTORISE), []
+        if recette_id not in catalogue.recettes:
+            return None
+        return (DECONSEILLE if recette_id in recettes else AUTORISE), []
+
+    def statistiques(self):
+        catalogue, profils = self._etat
+        return {
+            'profils': len(profils),
+            'allergenes': len(catalogue.graphe.noms),
+            'aliments': len(catalogue.aliments),
+            'recettes': len(catalogue.recettes),
+            'plats_a_recharger': len(self._plats_a_recharger),
+            **self._fraicheur(),
+        }
+
+    def _publier(self, reconstruction=False):
+        catalogue, profils = self._etat
+        if reconstruction:
+            registre.incrementer('counter_rebuilds_total')
+        registre.definir('counter_profiles', len(profils))
+        registre.definir('counter_allergens', len(catalogue.graphe.noms))
+
+
+def verifier_en_base(utilisateur_id, aliment_id=None, recette_id=None):
+    """Même verdict que IndexComptoir.verifier, lu en base (structure en attente de reconstruction)"""
+    if db.session.execute(select(Utilisateur.id).where(Utilisateur.id == utilisateur_id)).first() is None:
+        raise UtilisateurInconnu(utilisateur_id)
+    if aliment_id is None:
+        au_dessus = exists().where(
+            ReactionAllergique.utilisateur_id == utilisateur_id,
+            ReactionAllergique.recette_id == Recette.id,
+            ReactionAllergique.est_allergique
+        )
+        ligne = db.session.execute(select(Recette.id, au_dessus).where(Recette.id == recette_id)).first()
+        if ligne is None:
+            return None
+        return (DECONSEILLE if ligne[1] else AUTORISE), []
+
+    au_dessus = exists().where(
+        ReactionAllergique.utilisateur_id == utilisateur_id,
+        ReactionAllergique.aliment_id == Aliment.id,
+        ReactionAllergique.est_allergique
+    )
+    ligne = db.session.execute(select(Aliment.id, au_dessus).where(Aliment.id == aliment_id)).first()
+    if ligne is None:
+        return None
+    allergies = db.session.execute(
+        select(AllergieUtilisateur.allergie_id).where(AllergieUtilisateur.utilisateur_id == utilisateur_id)
+    ).scalars().all()
+    graphe = graphe_courant(allergies)
+    en_cause = graphe.masque_etendu(allergies) & graphe.allergenes(aliment_id)
+    if en_cause:
+        return INTERDIT, graphe.decoder(en_cause)
+    return (DECONSEILLE if ligne[1] else AUTORISE), []
+
+
+def comptoir_courant():
+    """Structure du comptoir du worker courant, ou None si elle est désactivée"""
+    return current_app.extensions.get('comptoir')
+
+
+def _allergies_modifiees(app, utilisateurs=None, **_):
+    comptoir = app.extensions.get('comptoir')
+    if comptoir is not None:
+        comptoir.invalider(utilisateurs)
+
+
+def _catalogue_modifie(app, entite=None, ids=(), **_):
+    comptoir = app.extensions.get('comptoir')
+    if comptoir is None:
+        return
+    if entite in ('aliments', 'recettes'):
+        # Plats créés, renommés, supprimés ou seuil modifié : relus un à un
+        comptoir.invalider_plats(entite, ids)
+    elif entite in ('allergies', 'reactivites_croisees'):
+        comptoir.invalider()
+
+
+def init_comptoir(app):
+    """Créer la structure du comptoir ; préchargée au démarrage si COUNTER_PRELOAD"""
+    if not app.config.get('COUNTER_ENABLED', True):
+        return
+    comptoir = app.extensions['comptoir'] = IndexComptoir(app, app.config.get('COUNTER_REFRESH_SECONDS', 60))
+    allergies_modifiees.connect(_allergies_modifiees, sender=app, weak=False)
+    catalogue_modifie.connect(_catalogue_modifie, sender=app, weak=False)
+    if app.config.get('COUNTER_PRELOAD'):
+        # Première vérification sans chargement synchrone ; sinon chargement à la première lecture
+        with app.app_context():
+            try:
+                comptoir.reconstruire()
+            except Exception as e:
+                app.logger.warning('Préchargement du comptoir impossible : %s', e)
+            finally:
+                db.session.remove()
@@ -17,6 +17,99 @@ class Config:
     
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRET_KEY = os.getenv('SECRET_KEY') or 'dev-secret-key'
+    APP_ENV = os.getenv('FLASK_ENV', 'development')
+    
+    # Transactions en lecture seule pour les handlers GET
+    DB_READ_ONLY_GET = os.getenv('DB_READ_ONLY_GET', 'true').lower() == 'true'
+    DB_READ_ONLY_ISOLATION = os.getenv('DB_READ_ONLY_ISOLATION', 'READ COMMITTED')
+    
+    # Instrumentation SQL (en-têtes X-DB-Queries / Server-Timing hors production)
+    SQL_SLOW_QUERY_MS = float(os.getenv('SQL_SLOW_QUERY_MS', '200'))
+    SQL_QUERY_BUDGET = int(os.getenv('SQL_QUERY_BUDGET')) if os.getenv('SQL_QUERY_BUDGET') else None
+    
+    # Métriques Prometheus (/metrics), agrégées entre workers gunicorn via un dossier partagé
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR')
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))
+    
+    # Administration et profilage à la demande (en-têtes X-Admin-Token + X-Profile: 1)
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+    PROFILER_SAMPLE_RATE = float(os.getenv('PROFILER_SAMPLE_RATE', '0'))
+    PROFILER_MAX_PROFILES = int(os.getenv('PROFILER_MAX_PROFILES', '50'))
+    PROFILER_DIR = os.getenv('PROFILER_DIR')
+    PROFILER_DIR_MAX_PROFILES = int(os.getenv('PROFILER_DIR_MAX_PROFILES', '200'))
+    
+    # Échantillonneur de piles continu (un thread par worker)
+    SAMPLER_ENABLED = os.getenv('SAMPLER_ENABLED', 'false').lower() == 'true'
+    SAMPLER_INTERVAL_MS = float(os.getenv('SAMPLER_INTERVAL_MS', '10'))
+    SAMPLER_MAX_STACKS = int(os.getenv('SAMPLER_MAX_STACKS', '10000'))
+    SAMPLER_DIR = os.getenv('SAMPLER_DIR')
+    SAMPLER_ROTATE_SECONDS = int(os.getenv('SAMPLER_ROTATE_SECONDS', '300'))
+    SAMPLER_MAX_FILES = int(os.getenv('SAMPLER_MAX_FILES', '24'))
+    
+    # Suivi mémoire tracemalloc (déclenché via /api/admin/memoire/demarrer)
+    MEMORY_SNAPSHOT_INTERVAL = int(os.getenv('MEMORY_SNAPSHOT_INTERVAL', '60'))
+    MEMORY_MAX_SNAPSHOTS = int(os.getenv('MEMORY_MAX_SNAPSHOTS', '10'))
+    
+    # Endpoint /api/batch (sous-requêtes multiplexées)
+    BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', '20'))
+    BATCH_MAX_WORKERS = int(os.getenv('BATCH_MAX_WORKERS', '4'))
+    
+    # Requêtes indépendantes des endpoints agrégés exécutées en parallèle (0 ou 1 = séquentiel)
+    DB_FANOUT_WORKERS = int(os.getenv('DB_FANOUT_WORKERS', '4'))
+    # Threads de requêtes par worker (gunicorn --threads) : DB_FANOUT_WORKERS est réduit au démarrage
+    # si le pool SQLAlchemy ne peut pas servir ces threads plus ceux des requêtes parallèles
+    WEB_THREADS = int(os.getenv('WEB_THREADS', '1'))
+    
+    # Mode ASGI (asgi.py) : lectures critiques servies avec un moteur asynchrone (asyncpg / aiosqlite)
+    ASGI_ASYNC_DB = os.getenv('ASGI_ASYNC_DB', 'true').lower() == 'true'
+    ASYNC_DATABASE_URL = os.getenv('ASYNC_DATABASE_URL')
+    ASYNC_DB_POOL_SIZE = int(os.getenv('ASYNC_DB_POOL_SIZE', '10'))
+    
+    # Contrôle d'admission : requêtes simultanées par endpoint ou namespace (par worker), 503 au-delà
+    ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true'
+    ADMISSION_LIMITS = os.getenv(
+        'ADMISSION_LIMITS', 'allergies=16,allergies_allergy_statistics=2,allergies_allergy_analytics=2,allergies_user_allergy_profile=8'
+    )
+    ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', '32'))
+    ADMISSION_MAX_WAIT_MS = float(os.getenv('ADMISSION_MAX_WAIT_MS', '500'))
+    ADMISSION_RETRY_AFTER = float(os.getenv('ADMISSION_RETRY_AFTER', '1'))
+    
+    # Échéance par requête (ms, 0 = aucune), par endpoint ou namespace ; en-tête X-Request-Timeout plafonné
+    REQUEST_TIMEOUT_MS = float(os.getenv('REQUEST_TIMEOUT_MS', '30000'))
+    REQUEST_TIMEOUTS = os.getenv('REQUEST_TIMEOUTS', 'allergies_allergy_statistics=10000,allergies_allergy_analytics=60000,allergies=5000,comptoir=1000')
+    REQUEST_TIMEOUT_MAX_MS = float(os.getenv('REQUEST_TIMEOUT_MAX_MS', '60000'))
+    
+    # Seuil global de détection d'allergie (%), remplacé par Aliment.seuil_allergie ou Allergie.seuil_detection
+    ALLERGY_THRESHOLD_DEFAULT = float(os.getenv('ALLERGY_THRESHOLD_DEFAULT', '30'))
+    
+    # File de tâches de fond (flask taches-worker) ; TACHES_INLINE traite la tâche dans la requête
+    TACHES_INLINE = os.getenv('TACHES_INLINE', 'false').lower() == 'true'
+    TACHES_MAX_TENTATIVES = int(os.getenv('TACHES_MAX_TENTATIVES', '3'))
+    TACHES_DELAI_REPRISE = int(os.getenv('TACHES_DELAI_REPRISE', '300'))
+    
+    # Index en mémoire des aliments à éviter par utilisateur ; reconstruit en arrière-plan toutes les N s (0 = jamais)
+    ALLERGY_INDEX_ENABLED = os.getenv('ALLERGY_INDEX_ENABLED', 'true').lower() == 'true'
+    ALLERGY_INDEX_REFRESH_SECONDS = float(os.getenv('ALLERGY_INDEX_REFRESH_SECONDS', '60'))
+    
+    # Filtre de Bloom des paires (utilisateur, aliment) connues : vérifications négatives sans base
+    ALLERGY_BLOOM_ENABLED = os.getenv('ALLERGY_BLOOM_ENABLED', 'true').lower() == 'true'
+    ALLERGY_BLOOM_REFRESH_SECONDS = float(os.getenv('ALLERGY_BLOOM_REFRESH_SECONDS', '60'))
+    ALLERGY_BLOOM_FP_RATE = float(os.getenv('ALLERGY_BLOOM_FP_RATE', '0.01'))
+    
+    # Vérification groupée (POST /allergies/check/<user>) : nombre maximal d'aliments + recettes par appel
+    ALLERGY_CHECK_MAX_ITEMS = int(os.getenv('ALLERGY_CHECK_MAX_ITEMS', '500'))
+    
+    # Comptoir de cafétéria (/api/comptoir) : profils et plats en mémoire, préchargés au démarrage en production
+    COUNTER_ENABLED = os.getenv('COUNTER_ENABLED', 'true').lower() == 'true'
+    COUNTER_REFRESH_SECONDS = float(os.getenv('COUNTER_REFRESH_SECONDS', '60'))
+    COUNTER_PRELOAD = os.getenv('COUNTER_PRELOAD', 'true' if APP_ENV == 'production' else 'false').lower() == 'true'
+    
+    # Graphe de réactivité croisée (/api/reactivites) : rechargé après modification, ou au plus tard toutes les N s (0 = jamais)
+    CROSS_REACTIVITY_REFRESH_SECONDS = float(os.getenv('CROSS_REACTIVITY_REFRESH_SECONDS', '60'))
+    
+    # Moteur analytique (/allergies/analytics) : durée de vie (s) des colonnes NumPy chargées par worker
+    ANALYTICS_CACHE_SECONDS = float(os.getenv('ANALYTICS_CACHE_SECONDS', '60'))
     
     # Debug de la configuration
     print(f"🔧 SQLALCHEMY_DATABASE_URI final: {SQLALCHEMY_DATABASE_URI}")
\ No newline at end of file
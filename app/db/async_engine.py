@@ -0,0 +1,51 @@
+import asyncio
+from sqlalchemy.engine import make_url
+
+# Pilotes asynchrones par dialecte (dépendances optionnelles : asyncpg, aiosqlite)
+PILOTES_ASYNC = {'postgresql': 'asyncpg', 'sqlite': 'aiosqlite'}
+
+
+def url_async(url):
+    """postgresql://… → postgresql+asyncpg://… ; sqlite:///… → sqlite+aiosqlite:///…"""
+    url = make_url(url.replace('postgres://', 'postgresql://', 1) if isinstance(url, str) else url)
+    pilote = PILOTES_ASYNC.get(url.get_backend_name())
+    if pilote is None:
+        raise ValueError(f"Pas de pilote asynchrone connu pour {url.get_backend_name()}")
+    return url.set(drivername=f'{url.get_backend_name()}+{pilote}')
+
+
+class LecturesAsync:
+    """Moteur SQLAlchemy asynchrone pour les endpoints de lecture servis en ASGI.
+
+    Le moteur (et son pool) appartient à la boucle d'événements qui l'a créé :
+    il est ouvert au démarrage du serveur ASGI (lifespan) et fermé à l'arrêt.
+    """
+
+    def __init__(self, url, taille_pool=10):
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        url = url_async(url)
+        options = {}
+        if url.get_backend_name() == 'postgresql':
+            options.update(pool_size=taille_pool, max_overflow=taille_pool,
+                           execution_options={'postgresql_readonly': True})
+        # SQLite en mémoire : une seule connexion partagée, pas de requêtes simultanées
+        self.sequentiel = url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+        self.engine = create_async_engine(url, **options)
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+
+    async def _executer(self, requete):
+        async with self.sessions() as session:
+            resultat = await session.execute(requete)
+            return resultat.all()
+
+    async def executer(self, requetes):
+        """Exécute {nom: select} en parallèle, une session (connexion) par requête"""
+        if self.sequentiel:
+            return {nom: await self._executer(requete) for nom, requete in requetes.items()}
+        noms = list(requetes)
+        lignes = await asyncio.gather(*(self._executer(requetes[nom]) for nom in noms))
+        return dict(zip(noms, lignes))
+
+    async def fermer(self):
+        await self.engine.dispose()
@@ -0,0 +1,122 @@
+import multiprocessing
+from datetime import datetime
+from sqlalchemy import and_, exists, func, insert, literal, select, update
+from app.db.db import db
+from app.db.detection import allergies_par_nom, condition_allergique, insert_sans_doublon
+from app.model import Aliment, Allergie, AllergieUtilisateur, ReactionAllergique, Tache
+from app.signals import signaler_allergies
+
+TYPE_BACKFILL = 'backfill_allergies'
+
+
+def remplir_tranche(debut, fin):
+    """Ajoute les AllergieUtilisateur manquantes des réactions d'id [debut, fin) ; renvoie le nombre inséré.
+
+    La condition allergique et l'absence de la paire (utilisateur, allergie) sont
+    évaluées par la base : une requête pour les noms, un INSERT … SELECT pour les liens.
+    Les deux insertions ignorent les conflits : deux workers forkés peuvent traiter
+    des tranches qui créent la même allergie ou le même lien.
+    """
+    dans_tranche = and_(ReactionAllergique.id >= debut, ReactionAllergique.id < fin, condition_allergique())
+    allergies_par_nom(db.session.scalars(
+        select(Aliment.nom).distinct()
+        .join(ReactionAllergique, ReactionAllergique.aliment_id == Aliment.id)
+        .where(dans_tranche)
+    ))
+
+    deja_connue = exists().where(
+        AllergieUtilisateur.utilisateur_id == ReactionAllergique.utilisateur_id,
+        AllergieUtilisateur.allergie_id == Allergie.id
+    )
+    manquantes = (
+        select(ReactionAllergique.utilisateur_id, Allergie.id, literal('Modéré'), literal(True),
+               literal(datetime.utcnow()))
+        .distinct()
+        .join(Aliment, ReactionAllergique.aliment_id == Aliment.id)
+        .join(Allergie, Allergie.nom == Aliment.nom)
+        .where(dans_tranche, ~deja_connue)
+    )
+    resultat = db.session.execute(
+        insert_sans_doublon(AllergieUtilisateur, ['utilisateur_id', 'allergie_id']).from_select(
+            ['utilisateur_id', 'allergie_id', 'gravite_personnelle', 'detectee_automatiquement', 'created_at'],
+            manquantes
+        )
+    )
+    if resultat.rowcount:
+        signaler_allergies(db.session)
+    return resultat.rowcount
+
+
+def traiter_backfill(taches):
+    """Gestionnaire de la file : une tâche = une tranche d'identifiants"""
+    return {tache.id: {'allergies_ajoutees': remplir_tranche(tache.charge['debut'], tache.charge['fin'])}
+            for tache in taches}
+
+
+def etat_backfill():
+    """Campagne la plus récente : {'campagne', 'tranches': {statut: nombre}, 'allergies_ajoutees'}"""
+    derniere = db.session.scalars(
+        select(Tache).where(Tache.type == TYPE_BACKFILL).order_by(Tache.id.desc()).limit(1)
+    ).first()
+    if derniere is None:
+        return None
+    campagne = derniere.charge['campagne']
+    taches = db.session.scalars(select(Tache).where(Tache.type == TYPE_BACKFILL, Tache.cle.like(f'{campagne}:%'))).all()
+    tranches = {}
+    for tache in taches:
+        tranches[tache.statut] = tranches.get(tache.statut, 0) + 1
+    ajoutees = sum((tache.resultat or {}).get('allergies_ajoutees', 0) for tache in taches)
+    return {'campagne': campagne, 'tranches': tranches, 'allergies_ajoutees': ajoutees}
+
+
+def planifier_backfill(tranche=10000, nouvelle=False):
+    """Découpe ReactionAllergique en tranches d'id et les met en file (une tâche par tranche).
+
+    Les tâches terminées servent de point de reprise : si une campagne est inachevée,
+    ses tranches en échec sont remises en attente au lieu d'en créer une nouvelle.
+    """
+    etat = etat_backfill()
+    if etat is not None and not nouvelle and set(etat['tranches']) - {'terminee'}:
+        db.session.execute(
+            update(Tache)
+            .where(Tache.type == TYPE_BACKFILL, Tache.cle.like(f"{etat['campagne']}:%"), Tache.statut == 'echec')
+            .values(statut='en_attente', tentatives=0, erreur=None)
+        )
+        db.session.commit()
+        return etat['campagne'], False
+
+    minimum, maximum = db.session.execute(select(func.min(ReactionAllergique.id), func.max(ReactionAllergique.id))).one()
+    campagne = datetime.utcnow().strftime('%Y%m%d%H%M%S%f')
+    if minimum is not None:
+        db.session.execute(insert(Tache), [
+            {'type': TYPE_BACKFILL, 'cle': f'{campagne}:{debut}', 'statut': 'en_attente', 'tentatives': 0,
+             'charge': {'campagne': campagne, 'debut': debut, 'fin': min(debut + tranche, maximum + 1)},
+             'created_at': datetime.utcnow()}
+            for debut in range(minimum, maximum + 1, tranche)
+        ])
+    db.session.commit()
+    return campagne, True
+
+
+def _processus_worker(app, lot):
+    from app.db.taches import executer_worker
+
+    with app.app_context():
+        # Connexions héritées du parent : ne pas les partager entre processus
+        db.engine.dispose(close=False)
+    executer_worker(app, limite=lot, une_fois=True, types=[TYPE_BACKFILL])
+
+
+def executer_backfill(app, processus=4, lot=1):
+    """Traite les tranches en attente avec `processus` workers forkés (0 = dans ce processus)"""
+    from app.db.taches import executer_worker
+
+    if processus <= 0:
+        return executer_worker(app, limite=lot, une_fois=True, types=[TYPE_BACKFILL])
+    contexte = multiprocessing.get_context('fork')
+    workers = [contexte.Process(target=_processus_worker, args=(app, lot)) for _ in range(processus)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return sum(1 for worker in workers if worker.exitcode == 0)
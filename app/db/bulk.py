@@ -0,0 +1,168 @@
+from datetime import datetime
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from app.db.db import db
+from app.signals import TABLES_ALLERGIES_UTILISATEUR, notifier_catalogue, signaler_allergies
+
+# Nombre maximal d'identifiants par clause IN (limite de paramètres SQLite)
+TAILLE_TRANCHE = 5000
+
+# Valeurs acceptées dans les filtres et les colonnes modifiées
+SCALAIRES = (str, int, float, bool, type(None))
+
+
+class OperationMasseInvalide(ValueError):
+    """Requête d'opération en masse mal formée (→ 400)"""
+
+
+class ConflitMasse(Exception):
+    """Opération en masse contraire à une contrainte d'unicité ou d'intégrité (→ 409)"""
+
+
+class SuppressionBloquee(ConflitMasse):
+    """Lignes encore référencées par une clé étrangère non nullable (→ 409)"""
+
+
+def _tranches(ids):
+    for debut in range(0, len(ids), TAILLE_TRANCHE):
+        yield ids[debut:debut + TAILLE_TRANCHE]
+
+
+def _condition(modele, donnees, filtres_autorises):
+    """Clause WHERE à partir de `ids` et/ou `filtre` (égalité, liste → IN, nom_contient → ILIKE)"""
+    ids = donnees.get('ids')
+    filtre = donnees.get('filtre') or {}
+    if not ids and not filtre:
+        raise OperationMasseInvalide("Fournir 'ids' ou 'filtre' : une opération sur toute la table est refusée")
+    if not isinstance(filtre, dict):
+        raise OperationMasseInvalide("'filtre' doit être un objet")
+
+    conditions = []
+    if ids:
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            raise OperationMasseInvalide("'ids' doit être une liste d'entiers")
+        conditions.append(modele.id.in_(ids))
+    for champ, valeur in filtre.items():
+        if champ == 'nom_contient':
+            if not isinstance(valeur, str):
+                raise OperationMasseInvalide("'nom_contient' doit être une chaîne")
+            conditions.append(modele.nom.ilike(f'%{valeur}%'))
+        elif champ not in filtres_autorises:
+            raise OperationMasseInvalide(f"Filtre non autorisé : {champ}")
+        elif not isinstance(valeur, SCALAIRES) and not (
+                isinstance(valeur, list) and all(isinstance(v, SCALAIRES) for v in valeur)):
+            raise OperationMasseInvalide(f"Filtre '{champ}' : valeur ou liste de valeurs simples attendue")
+        elif isinstance(valeur, list):
+            conditions.append(getattr(modele, champ).in_(valeur))
+        else:
+            conditions.append(getattr(modele, champ) == valeur)
+    return conditions
+
+
+def _selectionner(modele, conditions):
+    return list(db.session.scalars(select(modele.id).where(*conditions).order_by(modele.id)))
+
+
+def _verifier_unicite(modele, valeurs, ids):
+    """Même contrôle que les routes unitaires : un nom (ou une colonne unique) déjà pris → 409"""
+    for champ, valeur in valeurs.items():
+        colonne = modele.__table__.c.get(champ)
+        if colonne is None or not (colonne.unique or champ == 'nom') or not ids:
+            continue
+        if len(ids) > 1:
+            raise ConflitMasse(f"'{champ}' doit rester unique : impossible de l'attribuer à {len(ids)} lignes")
+        pris = db.session.scalar(
+            select(modele.id).where(getattr(modele, champ) == valeur, modele.id.not_in(ids)).limit(1)
+        )
+        if pris is not None:
+            raise ConflitMasse(f"{modele.__tablename__} : '{champ}' = {valeur!r} existe déjà (id {pris})")
+
+
+def mettre_a_jour_en_masse(modele, donnees, champs_modifiables, filtres_autorises):
+    """UPDATE ensembliste dans une transaction ; renvoie le nombre de lignes et leurs ids"""
+    valeurs = donnees.get('valeurs') or {}
+    if not valeurs:
+        raise OperationMasseInvalide("'valeurs' est requis")
+    if not isinstance(valeurs, dict) or not all(isinstance(v, SCALAIRES) for v in valeurs.values()):
+        raise OperationMasseInvalide("'valeurs' doit associer des colonnes à des valeurs simples")
+    interdits = set(valeurs) - set(champs_modifiables)
+    if interdits:
+        raise OperationMasseInvalide(f"Champs non modifiables : {', '.join(sorted(interdits))}")
+    if hasattr(modele, 'updated_at'):
+        valeurs = dict(valeurs, updated_at=datetime.utcnow())
+
+    conditions = _condition(modele, donnees, filtres_autorises)
+    try:
+        ids = _selectionner(modele, conditions)
+        _verifier_unicite(modele, valeurs, ids)
+        lignes = 0
+        for tranche in _tranches(ids):
+            resultat = db.session.execute(
+                update(modele).where(modele.id.in_(tranche)).values(**valeurs)
+                .execution_options(synchronize_session=False)
+            )
+            lignes += resultat.rowcount
+        db.session.commit()
+    except IntegrityError as e:
+        # Écriture concurrente ou contrainte non vérifiée en amont
+        db.session.rollback()
+        raise ConflitMasse(str(e.orig)) from e
+    except Exception:
+        db.session.rollback()
+        raise
+
+    # Les objets déjà chargés dans la session ne reflètent pas l'UPDATE ensembliste
+    db.session.expire_all()
+    notifier_catalogue(modele.__tablename__, 'update', ids)
+    return {'operation': 'update', 'entite': modele.__tablename__, 'lignes_affectees': lignes, 'ids': ids}
+
+
+def supprimer_en_masse(modele, donnees, filtres_autorises):
+    """DELETE ensembliste ; les références nullables sont remises à NULL comme le fait l'ORM"""
+    conditions = _condition(modele, donnees, filtres_autorises)
+    table = modele.__table__
+    references = [
+        (fk.parent.table, fk.parent, fk.ondelete)
+        for autre in db.Model.metadata.sorted_tables
+        for fk in autre.foreign_keys
+        if fk.column.table is table
+    ]
+
+    try:
+        ids = _selectionner(modele, conditions)
+        lignes = 0
+        for tranche in _tranches(ids):
+            for table_fille, colonne, suppression in references:
+                if table_fille.name in TABLES_ALLERGIES_UTILISATEUR:
+                    # Réactions / allergies détachées ou supprimées : profils des porteurs à rafraîchir
+                    signaler_allergies(db.session, db.session.scalars(
+                        select(table_fille.c.utilisateur_id).where(colonne.in_(tranche)).distinct()
+                    ))
+                if suppression == 'CASCADE':
+                    # Lignes qui n'ont pas de sens sans leur parent (arêtes de réactivité croisée)
+                    db.session.execute(delete(table_fille).where(colonne.in_(tranche)))
+                elif not colonne.nullable:
+                    bloquantes = db.session.scalar(
+                        select(db.func.count()).select_from(table_fille).where(colonne.in_(tranche))
+                    )
+                    if bloquantes:
+                        raise SuppressionBloquee(f"{bloquantes} ligne(s) de {table_fille.name} "
+                                                 f"référencent encore ces {table.name}")
+                else:
+                    db.session.execute(update(table_fille).where(colonne.in_(tranche)).values({colonne.name: None}))
+            resultat = db.session.execute(
+                delete(modele).where(modele.id.in_(tranche)).execution_options(synchronize_session=False)
+            )
+            lignes += resultat.rowcount
+        db.session.commit()
+    except IntegrityError as e:
+        # Écriture concurrente ou contrainte non vérifiée en amont
+        db.session.rollback()
+        raise ConflitMasse(str(e.orig)) from e
+    except Exception:
+        db.session.rollback()
+        raise
+
+    db.session.expire_all()
+    notifier_catalogue(modele.__tablename__, 'delete', ids)
+    return {'operation': 'delete', 'entite': modele.__tablename__, 'lignes_affectees': lignes, 'ids': ids}
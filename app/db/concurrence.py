@@ -0,0 +1,108 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, g
+from sqlalchemy.pool import QueuePool, SingletonThreadPool, StaticPool
+from app.db.db import db
+from app.db.transactions import _demarrer_lecture_seule, _liberer_lecture_seule
+from app.monitoring.sql_stats import StatistiquesSQL
+
+# Un pool de threads par processus worker et par usage (recréé après un fork)
+_executeurs = {}
+_verrou = threading.Lock()
+
+
+def parallelisme_possible():
+    """Faux si toutes les sessions partagent une même connexion (SQLite en mémoire)"""
+    return not isinstance(db.engine.pool, (StaticPool, SingletonThreadPool))
+
+
+def executeur(nom, max_workers):
+    """Pool de threads nommé du processus courant"""
+    cle = (os.getpid(), nom)
+    with _verrou:
+        pool = _executeurs.get(cle)
+        if pool is None:
+            pool = _executeurs[cle] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=nom)
+        return pool
+
+
+def _executer_isole(app, fonction, lecture_seule, echeance=None):
+    """Exécute une requête dans un contexte d'application neuf : session et connexion propres"""
+    with app.app_context():
+        g.sql_stats = StatistiquesSQL()
+        if echeance is not None:
+            # Même échéance que la requête HTTP (statement_timeout / interruption SQLite)
+            g.echeance = echeance
+        session = db.session()
+        etat = _demarrer_lecture_seule(session) if lecture_seule else None
+        try:
+            resultat = fonction()
+            # Détacher les objets chargés avant le rollback, qui les expirerait
+            session.expunge_all()
+            return resultat, g.sql_stats
+        finally:
+            if lecture_seule:
+                _liberer_lecture_seule(session, etat)
+
+
+def en_parallele(requetes, lecture_seule=True):
+    """Exécute des requêtes indépendantes en parallèle, chacune sur sa connexion du pool.
+
+    `requetes` associe un nom à une fonction sans argument ; renvoie {nom: résultat}.
+    La première s'exécute dans le thread appelant, sur la connexion que la requête HTTP
+    tient déjà (`lecture_seule`), plutôt que de la laisser inoccupée pendant l'attente ;
+    les autres partent dans le pool de threads du processus. Les objets ORM qu'elles
+    renvoient sont détachés (seules les colonnes chargées sont lisibles).
+    Exécution séquentielle dans la session courante si DB_FANOUT_WORKERS <= 1 ou si
+    les sessions partagent une connexion unique.
+    """
+    workers = current_app.config.get('DB_FANOUT_WORKERS', 4)
+    if workers <= 1 or len(requetes) < 2 or not parallelisme_possible():
+        return {nom: fonction() for nom, fonction in requetes.items()}
+
+    app = current_app._get_current_object()
+    pool = executeur('fanout', workers)
+    echeance = g.get('echeance')
+    (premiere, locale), *autres = requetes.items()
+    futurs = {nom: pool.submit(_executer_isole, app, fonction, lecture_seule, echeance)
+              for nom, fonction in autres}
+
+    resultats = {premiere: locale()}
+    stats = g.get('sql_stats')
+    for nom, futur in futurs.items():
+        resultats[nom], stats_thread = futur.result()
+        # Rattacher les requêtes des threads aux compteurs SQL de la requête HTTP
+        if stats is not None:
+            stats.requetes += stats_thread.requetes
+            stats.duree += stats_thread.duree
+    return resultats
+
+
+def borner_fanout(app, pool):
+    """Réduit DB_FANOUT_WORKERS à ce que le pool de connexions peut servir sans interblocage.
+
+    Chaque thread de requête (WEB_THREADS, plus les sous-requêtes de /api/batch) peut
+    tenir une connexion pendant qu'il attend ses requêtes parallèles : le pool doit
+    en offrir au moins autant que ces threads plus ceux de l'exécuteur `fanout`.
+    """
+    workers = app.config.get('DB_FANOUT_WORKERS', 4)
+    if workers <= 1 or not isinstance(pool, QueuePool) or pool._max_overflow < 0:
+        return workers
+    capacite = pool.size() + pool._max_overflow
+    threads = app.config.get('WEB_THREADS', 1) + app.config.get('BATCH_MAX_WORKERS', 4)
+    if capacite >= threads + workers:
+        return workers
+    borne = max(capacite - threads, 0)
+    app.logger.warning(
+        'Pool de %d connexions pour %d threads de requête : DB_FANOUT_WORKERS ramené de %d à %d',
+        capacite, threads, workers, borne
+    )
+    app.config['DB_FANOUT_WORKERS'] = borne
+    return borne
+
+
+def init_concurrence(app):
+    """Vérifier au démarrage que le pool de connexions suffit aux requêtes parallèles"""
+    with app.app_context():
+        borner_fanout(app, db.engine.pool)
@@ -0,0 +1,105 @@
+from datetime import datetime
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from app.db.db import db
+from app.model import Aliment, Allergie, AllergieUtilisateur, ReactionAllergique
+from app.signals import signaler_allergies, signaler_catalogue
+
+
+def condition_allergique():
+    """Équivalent SQL de ReactionAllergique.is_allergic() (seuil de l'aliment ou seuil global)"""
+    return ReactionAllergique.est_allergique
+
+
+def insert_sans_doublon(modele, colonnes_uniques):
+    """INSERT … ON CONFLICT DO NOTHING sur PostgreSQL et SQLite : un worker concurrent
+    (backfill forké, autre worker de tâches) a pu insérer la même ligne entre-temps"""
+    dialectes = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+    construire = dialectes.get(db.session.get_bind().dialect.name)
+    if construire is None:
+        return insert(modele)
+    return construire(modele).on_conflict_do_nothing(index_elements=colonnes_uniques)
+
+
+def allergies_par_nom(noms):
+    """{nom: id} des allergies nommées, celles qui manquent étant créées en un seul INSERT"""
+    noms = set(noms)
+    if not noms:
+        return {}
+    ids = dict(db.session.execute(select(Allergie.nom, Allergie.id).where(Allergie.nom.in_(noms))).all())
+    manquants = sorted(noms - set(ids))
+    if manquants:
+        resultat = db.session.execute(
+            insert_sans_doublon(Allergie, ['nom']).returning(Allergie.nom, Allergie.id), [
+                {'nom': nom, 'description': f'Allergie détectée automatiquement pour {nom}',
+                 'gravite': 'Modéré', 'created_at': datetime.utcnow()}
+                for nom in manquants
+            ]
+        )
+        creees = dict(resultat.all())
+        ids.update(creees)
+        if len(creees) < len(manquants):
+            # Créées entre-temps par un autre worker : RETURNING ne les renvoie pas
+            ids.update(db.session.execute(
+                select(Allergie.nom, Allergie.id).where(Allergie.nom.in_(set(manquants) - set(creees)))
+            ).all())
+        # Nouveaux sommets du graphe de réactivité croisée
+        signaler_catalogue(db.session, 'allergies', 'insert', creees.values())
+    return ids
+
+
+def ajouter_allergies_manquantes(lignes):
+    """Insère les AllergieUtilisateur absentes pour des lignes (reaction_id, utilisateur_id, nom d'aliment).
+
+    Renvoie {reaction_id: [allergie ajoutée]} ; une paire (utilisateur, allergie) déjà
+    présente ou produite par une autre réaction du lot n'est insérée qu'une fois.
+    """
+    allergies = allergies_par_nom(nom for _, _, nom in lignes)
+    paires = {}
+    for reaction_id, utilisateur_id, nom in lignes:
+        paires.setdefault((utilisateur_id, allergies[nom]), (reaction_id, nom))
+    if not paires:
+        return {}
+
+    existantes = set(db.session.execute(
+        select(AllergieUtilisateur.utilisateur_id, AllergieUtilisateur.allergie_id)
+        .where(tuple_(AllergieUtilisateur.utilisateur_id, AllergieUtilisateur.allergie_id).in_(list(paires)))
+    ).all())
+    nouvelles = [paire for paire in paires if paire not in existantes]
+    if nouvelles:
+        maintenant = datetime.utcnow()
+        colonnes = ['utilisateur_id', 'allergie_id']
+        resultat = db.session.execute(
+            insert_sans_doublon(AllergieUtilisateur, colonnes)
+            .returning(AllergieUtilisateur.utilisateur_id, AllergieUtilisateur.allergie_id), [
+                {'utilisateur_id': utilisateur_id, 'allergie_id': allergie_id, 'gravite_personnelle': 'Modéré',
+                 'detectee_automatiquement': True, 'created_at': maintenant}
+                for utilisateur_id, allergie_id in nouvelles
+            ]
+        )
+        # Seules les paires réellement insérées (pas celles d'un worker concurrent)
+        nouvelles = [tuple(paire) for paire in resultat.all()]
+    if nouvelles:
+        signaler_allergies(db.session, {utilisateur_id for utilisateur_id, _ in nouvelles})
+
+    ajoutees = {}
+    for utilisateur_id, allergie_id in nouvelles:
+        reaction_id, nom = paires[(utilisateur_id, allergie_id)]
+        ajoutees.setdefault(reaction_id, []).append({'id': allergie_id, 'nom': nom})
+    return ajoutees
+
+
+def detecter_allergies(reaction_ids):
+    """Détection automatique pour un lot de réactions, réévaluées au moment du traitement"""
+    lignes = db.session.execute(
+        select(ReactionAllergique.id, ReactionAllergique.utilisateur_id, Aliment.nom)
+        .join(Aliment, ReactionAllergique.aliment_id == Aliment.id)
+        .where(ReactionAllergique.id.in_(reaction_ids), condition_allergique())
+    ).all()
+    return ajouter_allergies_manquantes(lignes)
+
+
+def traiter_detections(taches):
+    """Gestionnaire de la file : un lot de tâches `detection_allergie` d'un même utilisateur"""
+    ajoutees = detecter_allergies([tache.charge['reaction_id'] for tache in taches])
+    return {tache.id: {'allergies_ajoutees': ajoutees.get(tache.charge['reaction_id'], [])} for tache in taches}
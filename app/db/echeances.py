@@ -0,0 +1,146 @@
+import time
+from flask import current_app, g, has_app_context, jsonify, request
+from sqlalchemy import event
+from werkzeug.exceptions import GatewayTimeout
+from app.admission import analyser_limites, cles_endpoint
+from app.db.db import db
+from app.monitoring.metrics import DESCRIPTIONS, registre
+
+ENTETE_DELAI = 'X-Request-Timeout'
+# Opcodes SQLite exécutés entre deux vérifications de l'échéance
+PAS_SQLITE = 1000
+
+DESCRIPTIONS['http_request_timeouts_total'] = ('counter', 'Requêtes HTTP interrompues par leur échéance (504)')
+
+
+class DelaiDepasse(GatewayTimeout):
+    """Échéance atteinte avant l'envoi d'une requête SQL"""
+    description = 'Délai de la requête dépassé'
+
+
+class Echeance:
+    """Échéance absolue d'une requête HTTP, partagée avec les threads de en_parallele"""
+    __slots__ = ('budget', 'limite', 'depassee')
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.limite = time.monotonic() + budget
+        self.depassee = False
+
+    def restant(self):
+        return self.limite - time.monotonic()
+
+    def expiree(self):
+        return time.monotonic() >= self.limite
+
+
+def delai_requete(app, endpoint, entete=None):
+    """Budget en secondes (None = sans échéance).
+
+    L'en-tête X-Request-Timeout (ms, plafonné par REQUEST_TIMEOUT_MAX_MS) l'emporte ;
+    sinon le délai de l'endpoint, puis celui de son namespace, puis REQUEST_TIMEOUT_MS.
+    """
+    plafond = app.config.get('REQUEST_TIMEOUT_MAX_MS', 60000)
+    try:
+        demande = float(entete) if entete else 0
+    except ValueError:
+        demande = 0
+    if demande > 0:
+        return min(demande, plafond) / 1000
+
+    delais = app.extensions.get('echeances', {})
+    cles = cles_endpoint(delais, endpoint)
+    millisecondes = delais[cles[0]] if cles else app.config.get('REQUEST_TIMEOUT_MS', 0)
+    return millisecondes / 1000 if millisecondes > 0 else None
+
+
+def _echeance_courante():
+    return g.get('echeance') if has_app_context() else None
+
+
+def _retirer_interruption(dbapi_connection, info):
+    if info.pop('echeance', None) is not None and hasattr(dbapi_connection, 'set_progress_handler'):
+        dbapi_connection.set_progress_handler(None, 0)
+
+
+# ============= ÉVÉNEMENTS SQLALCHEMY =============
+
+def _avant_execution(conn, cursor, statement, parameters, context, executemany):
+    echeance = _echeance_courante()
+    if echeance is None:
+        if 'echeance' in conn.info:
+            # Connexion réutilisée hors requête : ne pas garder l'interruption d'une autre
+            _retirer_interruption(conn.connection.dbapi_connection, conn.info)
+        return
+    restant = echeance.restant()
+    if restant <= 0:
+        echeance.depassee = True
+        raise DelaiDepasse()
+    if conn.info.get('echeance') is echeance:
+        return
+
+    dialecte = conn.dialect.name
+    if dialecte == 'postgresql':
+        # Borne chaque instruction de la transaction par le temps restant à sa première requête
+        cursor.execute(f'SET LOCAL statement_timeout = {max(1, int(restant * 1000))}')
+    elif dialecte == 'sqlite':
+        # Le gestionnaire de progression interrompt la requête (sqlite3.OperationalError: interrupted)
+        conn.connection.dbapi_connection.set_progress_handler(echeance.expiree, PAS_SQLITE)
+    conn.info['echeance'] = echeance
+
+
+def _debut_transaction(conn):
+    # SET LOCAL ne survit pas à la transaction précédente
+    if conn.dialect.name == 'postgresql':
+        conn.info.pop('echeance', None)
+
+
+def _erreur_execution(exception_context):
+    echeance = _echeance_courante()
+    if echeance is None:
+        return
+    origine = exception_context.original_exception
+    # 57014 = query_canceled (statement_timeout)
+    if getattr(origine, 'pgcode', None) == '57014' or 'interrupted' in str(origine):
+        echeance.depassee = True
+
+
+def _retour_au_pool(dbapi_connection, connection_record):
+    _retirer_interruption(dbapi_connection, connection_record.info)
+
+
+# ============= HOOKS FLASK =============
+
+def _debut_requete():
+    if request.endpoint is None:
+        return
+    budget = delai_requete(current_app, request.endpoint, request.headers.get(ENTETE_DELAI))
+    if budget is not None:
+        g.echeance = Echeance(budget)
+
+
+def _fin_requete(response):
+    echeance = g.pop('echeance', None)
+    if echeance is None or not echeance.depassee:
+        return response
+
+    # Les handlers convertissent souvent l'erreur SQL en 500 : la réponse est remplacée
+    registre.incrementer('http_request_timeouts_total', endpoint=request.endpoint or 'inconnu')
+    reponse = jsonify({'message': f'Délai de la requête dépassé ({echeance.budget * 1000:.0f} ms)'})
+    reponse.status_code = 504
+    return reponse
+
+
+def init_echeances(app):
+    """Brancher les échéances par requête (statement_timeout PostgreSQL, interruption SQLite)"""
+    app.extensions['echeances'] = analyser_limites(app.config.get('REQUEST_TIMEOUTS'))
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _avant_execution)
+            event.listen(engine, 'begin', _debut_transaction)
+            event.listen(engine, 'handle_error', _erreur_execution)
+            event.listen(engine, 'checkin', _retour_au_pool)
+
+    app.before_request(_debut_requete)
+    app.after_request(_fin_requete)
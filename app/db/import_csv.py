@@ -0,0 +1,200 @@
+import csv
+import re
+import time
+import unicodedata
+from datetime import datetime
+from sqlalchemy import insert, select, update
+from app.db.db import db
+from app.model import Aliment, Categorie
+from app.signals import notifier_catalogue
+
+# En-têtes reconnus (normalisés) → champ du modèle Aliment ; un alias couvre aussi
+# les en-têtes qui le prolongent (« proteines_g_100g » pour « proteines »)
+CORRESPONDANCES = {
+    'nom': ('nom', 'name', 'aliment', 'alim_nom_fr', 'product_name', 'libelle'),
+    'description': ('description', 'alim_nom_eng'),
+    'calories': ('calories', 'kcal', 'energie_kcal', 'energy_kcal',
+                 'energie_reglement_ue_n_1169_2011_kcal'),
+    'proteines': ('proteines', 'protein', 'proteins'),
+    'lipides': ('lipides', 'fat'),
+    'glucides': ('glucides', 'carbohydrates'),
+    'fibres': ('fibres', 'fiber', 'fibre'),
+    'type_aliment': ('type_aliment', 'type', 'alim_ssgrp_nom_fr'),
+    'categorie': ('categorie', 'category', 'categories', 'alim_grp_nom_fr', 'groupe'),
+}
+CHAMPS_NUMERIQUES = ('calories', 'proteines', 'lipides', 'glucides', 'fibres')
+_NOMBRE = re.compile(r'-?\d+(?:[.,]\d+)?')
+
+
+def normaliser_nom(nom):
+    """'  Blé  Dur ' → 'ble dur' : clé de déduplication insensible à la casse et aux accents"""
+    decompose = unicodedata.normalize('NFKD', nom or '')
+    sans_accents = ''.join(c for c in decompose if not unicodedata.combining(c))
+    return ' '.join(re.sub(r'[^\w]+', ' ', sans_accents.lower()).split())
+
+
+def _cle_entete(entete):
+    return '_'.join(normaliser_nom(entete).split())
+
+
+def construire_correspondance(entetes, correspondance=None):
+    """Associe chaque champ Aliment à l'en-tête CSV correspondant (explicite ou reconnu)"""
+    resultat = dict(correspondance or {})
+    cles = {_cle_entete(entete): entete for entete in entetes}
+    for champ, alias in CORRESPONDANCES.items():
+        if champ in resultat:
+            continue
+        for nom in alias:
+            trouve = cles.get(nom) or next((e for c, e in cles.items() if c.startswith(nom + '_')), None)
+            if trouve is not None and trouve not in resultat.values():
+                resultat[champ] = trouve
+                break
+    if 'nom' not in resultat:
+        raise ValueError(f"Colonne du nom introuvable parmi : {', '.join(entetes)}")
+    return resultat
+
+
+def convertir_nombre(valeur):
+    """'12,5' → 12.5 ; 'traces', '-', '' → None ; '< 0,5' → 0.5"""
+    if valeur is None:
+        return None
+    correspondance = _NOMBRE.search(valeur)
+    if correspondance is None:
+        return None
+    return float(correspondance.group().replace(',', '.'))
+
+
+class ImportAliments:
+    """Import en flux d'un CSV d'aliments, dédupliqué par nom normalisé et écrit par lots.
+
+    Les noms existants sont chargés une fois dans un index {nom normalisé: id} :
+    chaque ligne est classée en insertion ou mise à jour sans requête SQL, puis
+    les lots partent en INSERT / UPDATE groupés (un commit par lot). Le catalogue
+    n'est notifié qu'une fois, en fin d'import, pour tous les lots validés.
+    """
+
+    def __init__(self, taille_lot=1000, mise_a_jour=True):
+        self.taille_lot = taille_lot
+        self.mise_a_jour = mise_a_jour
+        self.index = {}
+        self.categories = {}
+        self._insertions = {}
+        self._mises_a_jour = {}
+        self._inserees = []
+        self._modifiees = set()
+        self.rapport = {'lignes': 0, 'inserees': 0, 'mises_a_jour': 0, 'doublons': 0,
+                        'ignorees': 0, 'rejetees': 0, 'categories_creees': 0, 'erreurs': []}
+
+    def _charger_index(self):
+        for identifiant, nom in db.session.execute(select(Aliment.id, Aliment.nom)).yield_per(10000):
+            self.index.setdefault(normaliser_nom(nom), identifiant)
+        for identifiant, nom in db.session.execute(select(Categorie.id, Categorie.nom)):
+            self.categories[normaliser_nom(nom)] = identifiant
+
+    def _categorie_id(self, nom):
+        cle = normaliser_nom(nom)
+        if cle not in self.categories:
+            categorie = Categorie(nom=nom.strip()[:100])
+            db.session.add(categorie)
+            db.session.flush()
+            self.categories[cle] = categorie.id
+            self.rapport['categories_creees'] += 1
+        return self.categories[cle]
+
+    def _ligne_vers_valeurs(self, ligne, correspondance):
+        valeurs = {}
+        for champ, colonne in correspondance.items():
+            brut = (ligne.get(colonne) or '').strip()
+            if champ in CHAMPS_NUMERIQUES:
+                nombre = convertir_nombre(brut)
+                if nombre is not None:
+                    valeurs[champ] = nombre
+            elif champ == 'categorie':
+                if brut:
+                    valeurs['categorie_id'] = self._categorie_id(brut)
+            elif brut:
+                valeurs[champ] = brut[:100] if champ in ('nom', 'type_aliment') else brut
+        return valeurs
+
+    def _ajouter(self, valeurs):
+        cle = normaliser_nom(valeurs['nom'])
+        identifiant = self.index.get(cle)
+        if identifiant is None:
+            if cle in self._insertions:
+                self.rapport['doublons'] += 1
+            self._insertions[cle] = valeurs
+        elif not self.mise_a_jour:
+            self.rapport['ignorees'] += 1
+        else:
+            if identifiant in self._mises_a_jour:
+                self.rapport['doublons'] += 1
+            # Le nom stocké reste la référence : seules les autres colonnes sont mises à jour
+            self._mises_a_jour[identifiant] = dict(valeurs, id=identifiant)
+            del self._mises_a_jour[identifiant]['nom']
+
+    def _vider(self):
+        maintenant = datetime.utcnow()
+        inserees = []
+        if self._insertions:
+            lignes = [dict(valeurs, created_at=maintenant, updated_at=maintenant)
+                      for valeurs in self._insertions.values()]
+            # Colonnes homogènes pour un seul INSERT multi-lignes
+            colonnes = set().union(*lignes)
+            lignes = [{c: ligne.get(c, 0 if c in CHAMPS_NUMERIQUES else None) for c in colonnes} for ligne in lignes]
+            resultat = db.session.execute(insert(Aliment).returning(Aliment.id, Aliment.nom), lignes)
+            for identifiant, nom in resultat:
+                self.index.setdefault(normaliser_nom(nom), identifiant)
+                inserees.append(identifiant)
+            self.rapport['inserees'] += len(lignes)
+        if self._mises_a_jour:
+            lignes = [dict(valeurs, updated_at=maintenant) for valeurs in self._mises_a_jour.values()]
+            for colonnes in {frozenset(ligne) for ligne in lignes}:
+                db.session.execute(update(Aliment), [l for l in lignes if frozenset(l) == colonnes])
+            self.rapport['mises_a_jour'] += len(lignes)
+        db.session.commit()
+        self._inserees.extend(inserees)
+        self._modifiees.update(self._mises_a_jour)
+        self._insertions.clear()
+        self._mises_a_jour.clear()
+
+    def executer(self, flux, separateur=None, correspondance=None):
+        """Lit le flux texte ligne par ligne ; renvoie le rapport d'import"""
+        debut = time.perf_counter()
+        premiere = flux.readline()
+        if separateur is None:
+            separateur = max(';,\t|', key=premiere.count)
+        entetes = next(csv.reader([premiere], delimiter=separateur))
+        colonnes = construire_correspondance(entetes, correspondance)
+        lecteur = csv.DictReader(flux, fieldnames=entetes, delimiter=separateur)
+
+        self._charger_index()
+        try:
+            for numero, ligne in enumerate(lecteur, start=2):
+                self.rapport['lignes'] += 1
+                valeurs = self._ligne_vers_valeurs(ligne, colonnes)
+                if not normaliser_nom(valeurs.get('nom')):
+                    self.rapport['rejetees'] += 1
+                    if len(self.rapport['erreurs']) < 20:
+                        self.rapport['erreurs'].append(f'Ligne {numero} : nom manquant')
+                    continue
+                self._ajouter(valeurs)
+                if len(self._insertions) + len(self._mises_a_jour) >= self.taille_lot:
+                    self._vider()
+            self._vider()
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            # Un seul signal pour tout l'import (les lots déjà validés inclus en cas d'erreur)
+            notifier_catalogue('aliments', 'insert', self._inserees)
+            notifier_catalogue('aliments', 'update', self._modifiees)
+
+        duree = time.perf_counter() - debut
+        self.rapport['duree_s'] = round(duree, 3)
+        self.rapport['lignes_par_seconde'] = round(self.rapport['lignes'] / duree, 1) if duree > 0 else 0.0
+        return self.rapport
+
+
+def importer_aliments(flux, taille_lot=1000, separateur=None, correspondance=None, mise_a_jour=True):
+    """Importer un CSV d'aliments depuis un flux texte"""
+    return ImportAliments(taille_lot, mise_a_jour).executer(flux, separateur, correspondance)
@@ -0,0 +1,120 @@
+import time
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import case, select, update
+from app.db.db import db
+from app.db.backfill import TYPE_BACKFILL, traiter_backfill
+from app.db.detection import traiter_detections
+from app.model import Tache
+
+# Type de tâche → fonction recevant un lot de tâches de même clé, renvoyant {tache_id: résultat}
+GESTIONNAIRES = {
+    'detection_allergie': traiter_detections,
+    TYPE_BACKFILL: traiter_backfill,
+}
+
+
+def enfiler(type_tache, charge, cle=None):
+    """Ajoute une tâche à la session courante : elle est validée avec l'écriture qui la déclenche"""
+    tache = Tache(type=type_tache, charge=charge, cle=cle, statut='en_attente', tentatives=0)
+    db.session.add(tache)
+    return tache
+
+
+def reserver(jeton, limite=100, delai_reprise=300, ids=None, types=None, max_tentatives=3):
+    """Réserve jusqu'à `limite` tâches en attente pour le worker `jeton`.
+
+    Les tâches restées `en_cours` au-delà de `delai_reprise` secondes (worker arrêté)
+    sont remises en attente, ou passent en échec si leurs `max_tentatives` sont
+    épuisées (une tâche qui tue son worker n'est pas reprise indéfiniment). Sur PostgreSQL, SKIP LOCKED évite que deux workers se
+    disputent les mêmes lignes ; ailleurs, l'UPDATE conditionnel sur le statut suffit.
+    """
+    maintenant = datetime.utcnow()
+    db.session.execute(
+        update(Tache)
+        .where(Tache.statut == 'en_cours', Tache.demarree_at < maintenant - timedelta(seconds=delai_reprise))
+        .values(
+            statut=case((Tache.tentatives >= max_tentatives, 'echec'), else_='en_attente'),
+            erreur=case((Tache.tentatives >= max_tentatives, 'Abandonnée par son worker (délai de reprise dépassé)'),
+                        else_=Tache.erreur),
+            verrou=None
+        )
+    )
+    requete = select(Tache.id).where(Tache.statut == 'en_attente')
+    if ids is not None:
+        requete = requete.where(Tache.id.in_(ids))
+    if types is not None:
+        requete = requete.where(Tache.type.in_(types))
+    candidates = db.session.scalars(
+        requete.order_by(Tache.id).limit(limite).with_for_update(skip_locked=True)
+    ).all()
+    if candidates:
+        db.session.execute(
+            update(Tache)
+            .where(Tache.id.in_(candidates), Tache.statut == 'en_attente')
+            .values(statut='en_cours', verrou=jeton, demarree_at=maintenant, tentatives=Tache.tentatives + 1)
+        )
+    db.session.commit()
+    if not candidates:
+        return []
+    return db.session.scalars(
+        select(Tache).where(Tache.verrou == jeton, Tache.statut == 'en_cours').order_by(Tache.id)
+    ).all()
+
+
+def _echouer(ids, erreur, max_tentatives):
+    db.session.execute(
+        update(Tache).where(Tache.id.in_(ids)).values(
+            statut=case((Tache.tentatives >= max_tentatives, 'echec'), else_='en_attente'),
+            erreur=erreur[:2000],
+            verrou=None
+        )
+    )
+    db.session.commit()
+
+
+def traiter(limite=100, max_tentatives=3, delai_reprise=300, ids=None, types=None):
+    """Réserve un lot et le traite par groupes (type, clé) ; renvoie le nombre de tâches traitées"""
+    taches = reserver(uuid.uuid4().hex, limite, delai_reprise, ids, types, max_tentatives)
+
+    groupes = {}
+    for tache in taches:
+        groupes.setdefault((tache.type, tache.cle), []).append(tache)
+
+    for (type_tache, _), groupe in groupes.items():
+        ids_groupe = [tache.id for tache in groupe]
+        try:
+            gestionnaire = GESTIONNAIRES.get(type_tache)
+            if gestionnaire is None:
+                raise LookupError(f'Aucun gestionnaire pour le type de tâche « {type_tache} »')
+            resultats = gestionnaire(groupe)
+            maintenant = datetime.utcnow()
+            for tache in groupe:
+                tache.statut = 'terminee'
+                tache.resultat = resultats.get(tache.id)
+                tache.erreur = None
+                tache.verrou = None
+                tache.terminee_at = maintenant
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            _echouer(ids_groupe, f'{type(e).__name__}: {e}', max_tentatives)
+    return len(taches)
+
+
+def executer_worker(app, intervalle=1.0, limite=100, une_fois=False, types=None):
+    """Boucle d'un processus worker ; `une_fois` s'arrête quand la file est vide"""
+    total = 0
+    while True:
+        with app.app_context():
+            traitees = traiter(
+                limite,
+                app.config.get('TACHES_MAX_TENTATIVES', 3),
+                app.config.get('TACHES_DELAI_REPRISE', 300),
+                types=types
+            )
+        total += traitees
+        if not traitees:
+            if une_fois:
+                return total
+            time.sleep(intervalle)
@@ -0,0 +1,59 @@
+from functools import wraps
+from flask import current_app
+from sqlalchemy import text
+from app.db.db import db
+
+
+def _demarrer_lecture_seule(session):
+    """Ouvre la transaction courante en mode READ ONLY selon le dialecte (renvoie l'état à libérer)"""
+    dialecte = session.get_bind().dialect.name
+
+    if dialecte == 'postgresql':
+        # Les caractéristiques sont réinitialisées par SQLAlchemy au retour dans le pool
+        session.connection(execution_options={
+            'isolation_level': current_app.config.get('DB_READ_ONLY_ISOLATION', 'READ COMMITTED'),
+            'postgresql_readonly': True
+        })
+    elif dialecte == 'sqlite':
+        connexion = session.connection()
+        connexion.execute(text('PRAGMA query_only = ON'))
+        return dialecte, connexion.connection.dbapi_connection
+
+    return dialecte, None
+
+
+def _liberer_lecture_seule(session, etat):
+    """Termine la transaction et rend la connexion au pool"""
+    _, connexion_brute = etat
+
+    if connexion_brute is not None:
+        # Remettre le mode écriture tant que la connexion est encore réservée : après le
+        # rollback, elle retourne au pool et session.connection() pourrait en obtenir une autre
+        connexion_brute.execute('PRAGMA query_only = OFF')
+
+    session.rollback()
+
+
+def lecture_seule(f):
+    """Décorateur pour les handlers GET : transaction READ ONLY et libération anticipée.
+
+    La connexion est rendue au pool dès la fin du handler, avant la sérialisation
+    de la réponse et le teardown de la requête. Si une transaction est déjà ouverte
+    (requête imbriquée, fixtures de test), le handler s'exécute sans modification.
+    """
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        if not current_app.config.get('DB_READ_ONLY_GET', True):
+            return f(*args, **kwargs)
+
+        session = db.session()
+        if session.in_transaction():
+            return f(*args, **kwargs)
+
+        etat = _demarrer_lecture_seule(session)
+        try:
+            return f(*args, **kwargs)
+        finally:
+            _liberer_lecture_seule(session, etat)
+
+    return wrapper
@@ -0,0 +1,191 @@
+import math
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+from app.index_memoire import IndexMemoire, lire_paires, paires_distinctes
+from app.model import ReactionAllergique
+from app.monitoring.metrics import DESCRIPTIONS, registre
+from app.reactivite import paires_confirmees
+from app.signals import allergies_modifiees, catalogue_modifie
+
+DESCRIPTIONS.update({
+    'allergy_bloom_checks_total': ('counter', 'Vérifications passées par le filtre de Bloom, par résultat'),
+    'allergy_bloom_pairs': ('gauge', 'Paires (utilisateur, aliment) insérées dans le filtre de Bloom'),
+    'allergy_bloom_bytes': ('gauge', 'Taille du tableau de bits du filtre de Bloom'),
+    'allergy_bloom_rebuilds_total': ('counter', 'Reconstructions complètes du filtre de Bloom'),
+})
+
+_MASQUE = 0xFFFFFFFFFFFFFFFF
+
+
+def _melanger(x):
+    """splitmix64 sur un entier Python (doit rester identique à _melanger_tableau)"""
+    x = (x + 0x9E3779B97F4A7C15) & _MASQUE
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASQUE
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASQUE
+    return x ^ (x >> 31)
+
+
+def _melanger_tableau(x):
+    """splitmix64 vectorisé (uint64, dépassements modulo 2**64)"""
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+class FiltreBloom:
+    """Filtre de Bloom de paires (utilisateur, aliment) : « absent » est certain, « présent » probable.
+
+    Les k positions d'une paire viennent d'un double hachage h1 + i·h2 de la clé
+    (utilisateur << 32 | aliment). Taille et k sont calculés pour `capacite` paires
+    au taux de faux positifs `taux_faux_positifs`.
+    """
+
+    def __init__(self, capacite, taux_faux_positifs=0.01):
+        capacite = max(int(capacite), 1024)
+        self.capacite = capacite
+        self.bits = max(64, int(-capacite * math.log(taux_faux_positifs) / math.log(2) ** 2))
+        self.k = max(1, round(self.bits / capacite * math.log(2)))
+        self.tableau = np.zeros((self.bits + 7) // 8, dtype=np.uint8)
+        self.paires = 0
+
+    def _positions(self, utilisateurs, aliments):
+        cles = (utilisateurs.astype(np.uint64) << np.uint64(32)) | (aliments.astype(np.uint64) & np.uint64(0xFFFFFFFF))
+        h1 = _melanger_tableau(cles)
+        h2 = _melanger_tableau(h1) | np.uint64(1)
+        rangs = np.arange(self.k, dtype=np.uint64)
+        return ((h1[:, None] + rangs[None, :] * h2[:, None]) % np.uint64(self.bits)).ravel()
+
+    def ajouter(self, paires):
+        """Insère un tableau (N, 2) de paires"""
+        if not len(paires):
+            return
+        positions = self._positions(paires[:, 0], paires[:, 1])
+        np.bitwise_or.at(self.tableau, positions >> np.uint64(3),
+                         (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)))
+        self.paires += len(paires)
+
+    def contient(self, utilisateur_id, aliment_id):
+        h1 = _melanger((utilisateur_id << 32) | (aliment_id & 0xFFFFFFFF))
+        h2 = _melanger(h1) | 1
+        tableau, bits = self.tableau, self.bits
+        for i in range(self.k):
+            position = ((h1 + i * h2) & _MASQUE) % bits
+            if not (tableau[position >> 3] >> (position & 7)) & 1:
+                return False
+        return True
+
+    @property
+    def sature(self):
+        return self.paires > self.capacite
+
+
+def _requete_reactions(utilisateurs=None):
+    """Paires ayant une réaction (les allergies confirmées sont développées par le graphe)"""
+    reactions = select(ReactionAllergique.utilisateur_id, ReactionAllergique.aliment_id).where(
+        ReactionAllergique.aliment_id.isnot(None)
+    )
+    if utilisateurs is not None:
+        reactions = reactions.where(ReactionAllergique.utilisateur_id.in_(utilisateurs))
+    return reactions
+
+
+class FiltrePaires(IndexMemoire):
+    """Chemin négatif rapide des vérifications d'allergie, en mémoire du worker.
+
+    Une paire absente du filtre n'a ni réaction ni allergie confirmée : la
+    vérification répond sans base. Une paire présente (ou un faux positif) suit le
+    chemin complet. Le filtre ne fait que grossir : une paire retirée reste
+    « présente » jusqu'à la reconstruction suivante, ce qui ne coûte qu'une requête.
+    """
+
+    nom = 'filtre-bloom'
+
+    def __init__(self, app, intervalle=60, taux_faux_positifs=0.01, marge=1.5):
+        super().__init__(app, intervalle)
+        self.taux_faux_positifs = taux_faux_positifs
+        self.marge = marge
+        self._filtre = None
+
+    def _construire(self, utilisateurs=None):
+        paires = paires_distinctes(np.concatenate((
+            lire_paires(_requete_reactions(utilisateurs)), paires_confirmees(utilisateurs)
+        )))
+        if utilisateurs is not None:
+            return paires
+        # Marge pour les insertions entre deux reconstructions
+        filtre = FiltreBloom(len(paires) * self.marge, self.taux_faux_positifs)
+        filtre.ajouter(paires)
+        return filtre
+
+    def _installer(self, filtre):
+        self._filtre = filtre
+
+    def _fusionner(self, paires, utilisateurs):
+        self._filtre.ajouter(paires)
+        if self._filtre.sature:
+            self._perimer()
+
+    def peut_contenir(self, utilisateur_id, aliment_id):
+        """False : aucune réaction ni allergie connue pour la paire (certain) ; True : à vérifier"""
+        if not self.pret(utilisateur_id):
+            registre.incrementer('allergy_bloom_checks_total', resultat='contourne')
+            return True
+        present = self._filtre.contient(utilisateur_id, aliment_id)
+        registre.incrementer('allergy_bloom_checks_total', resultat='positif' if present else 'negatif')
+        return present
+
+    def statistiques(self):
+        filtre = self._filtre
+        if filtre is None:
+            return {'charge': False, **self._fraicheur()}
+        # Taux de faux positifs attendu au remplissage actuel
+        taux = (1 - math.exp(-filtre.k * filtre.paires / filtre.bits)) ** filtre.k
+        return {
+            'charge': True,
+            'paires': filtre.paires,
+            'capacite': filtre.capacite,
+            'bits': filtre.bits,
+            'fonctions_hachage': filtre.k,
+            'octets': int(filtre.tableau.nbytes),
+            'taux_faux_positifs_estime': round(taux, 5),
+            **self._fraicheur(),
+        }
+
+    def _publier(self, reconstruction=False):
+        if reconstruction:
+            registre.incrementer('allergy_bloom_rebuilds_total')
+        registre.definir('allergy_bloom_pairs', self._filtre.paires)
+        registre.definir('allergy_bloom_bytes', int(self._filtre.tableau.nbytes))
+
+
+def filtre_courant():
+    """Filtre de Bloom du worker courant, ou None s'il est désactivé"""
+    return current_app.extensions.get('filtre_bloom')
+
+
+def _allergies_modifiees(app, utilisateurs=None, **_):
+    filtre = app.extensions.get('filtre_bloom')
+    if filtre is not None:
+        filtre.invalider(utilisateurs)
+
+
+def _catalogue_modifie(app, entite=None, **_):
+    # Un aliment créé ou renommé peut porter le nom d'une allergie confirmée ; une arête ajoute des paires
+    filtre = app.extensions.get('filtre_bloom')
+    if filtre is not None and entite in ('aliments', 'allergies', 'reactivites_croisees'):
+        filtre.invalider()
+
+
+def init_filtre_bloom(app):
+    """Créer le filtre de Bloom du worker ; il se charge à la première vérification"""
+    if not app.config.get('ALLERGY_BLOOM_ENABLED', True):
+        return
+    app.extensions['filtre_bloom'] = FiltrePaires(
+        app,
+        app.config.get('ALLERGY_BLOOM_REFRESH_SECONDS', 60),
+        app.config.get('ALLERGY_BLOOM_FP_RATE', 0.01)
+    )
+    allergies_modifiees.connect(_allergies_modifiees, sender=app, weak=False)
+    catalogue_modifie.connect(_catalogue_modifie, sender=app, weak=False)
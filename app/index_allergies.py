@@ -0,0 +1,155 @@
+import itertools
+from array import array
+from bisect import bisect_left
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+from app.index_memoire import IndexMemoire, lire_paires
+from app.model import ReactionAllergique
+from app.monitoring.metrics import DESCRIPTIONS, registre
+from app.reactivite import paires_confirmees
+from app.signals import allergies_modifiees, catalogue_modifie
+
+DESCRIPTIONS.update({
+    'allergy_index_entries': ('gauge', "Paires (utilisateur, aliment) à éviter dans l'index en mémoire"),
+    'allergy_index_users': ('gauge', "Utilisateurs présents dans l'index en mémoire"),
+    'allergy_index_rebuilds_total': ('counter', "Reconstructions complètes de l'index des allergies"),
+})
+
+CONFIRMEE = 'confirmee'
+SEUIL = 'seuil'
+_VIDE = array('i')
+
+
+def _requete_au_dessus(utilisateurs=None):
+    """(utilisateur_id, aliment_id) des réactions au-dessus du seuil"""
+    au_dessus = (
+        select(ReactionAllergique.utilisateur_id, ReactionAllergique.aliment_id)
+        .where(ReactionAllergique.aliment_id.isnot(None), ReactionAllergique.est_allergique)
+    )
+    if utilisateurs is not None:
+        au_dessus = au_dessus.where(ReactionAllergique.utilisateur_id.in_(utilisateurs))
+    return au_dessus
+
+
+def _par_utilisateur(paires):
+    """{utilisateur_id: array('i') trié des aliments}"""
+    if not len(paires):
+        return {}
+    utilisateurs, debuts = np.unique(paires[:, 0], return_index=True)
+    aliments = paires[:, 1].astype(np.int32)
+    fins = itertools.chain(debuts[1:], [len(paires)])
+    return {
+        int(utilisateur): array('i', aliments[debut:fin].tobytes())
+        for utilisateur, debut, fin in zip(utilisateurs, debuts, fins)
+    }
+
+
+def _contient(tableau, valeur):
+    i = bisect_left(tableau, valeur)
+    return i < len(tableau) and tableau[i] == valeur
+
+
+class IndexAllergies(IndexMemoire):
+    """Aliments à éviter par utilisateur, en mémoire du worker.
+
+    Chaque utilisateur a deux tableaux triés d'ids d'aliments (array('i'), 4 octets
+    par entrée) : allergies confirmées et réactions au-dessus du seuil. Une
+    vérification est une bisection, sans requête SQL.
+    """
+
+    nom = 'index-allergies'
+
+    def __init__(self, app, intervalle=60):
+        super().__init__(app, intervalle)
+        self._entrees = {}           # utilisateur_id → (confirmées, au-dessus du seuil)
+
+    def _construire(self, utilisateurs=None):
+        # Allergies confirmées développées par la fermeture du graphe de réactivité croisée
+        confirmees = _par_utilisateur(paires_confirmees(utilisateurs))
+        au_dessus = _par_utilisateur(lire_paires(_requete_au_dessus(utilisateurs)))
+        return {
+            utilisateur: (confirmees.get(utilisateur, _VIDE), au_dessus.get(utilisateur, _VIDE))
+            for utilisateur in confirmees.keys() | au_dessus.keys()
+        }
+
+    def _installer(self, entrees):
+        self._entrees = entrees
+
+    def _fusionner(self, entrees, utilisateurs):
+        for utilisateur in utilisateurs:
+            if utilisateur in entrees:
+                self._entrees[utilisateur] = entrees[utilisateur]
+            else:
+                self._entrees.pop(utilisateur, None)
+
+    # ----- lectures -----
+
+    def entree(self, utilisateur_id):
+        """(allergies confirmées, réactions au-dessus du seuil) de l'utilisateur, tableaux triés"""
+        self.pret(utilisateur_id)
+        return self._entrees.get(utilisateur_id, (_VIDE, _VIDE))
+
+    def verifier(self, utilisateur_id, aliment_id):
+        """CONFIRMEE, SEUIL ou None (aucun risque connu)"""
+        confirmees, au_dessus = self.entree(utilisateur_id)
+        if _contient(confirmees, aliment_id):
+            return CONFIRMEE
+        if _contient(au_dessus, aliment_id):
+            return SEUIL
+        return None
+
+    def verifier_lot(self, utilisateur_id, aliment_ids):
+        """{aliment_id: CONFIRMEE | SEUIL | None} pour plusieurs aliments d'un même utilisateur"""
+        confirmees, au_dessus = self.entree(utilisateur_id)
+        return {
+            aliment_id: CONFIRMEE if _contient(confirmees, aliment_id)
+            else SEUIL if _contient(au_dessus, aliment_id) else None
+            for aliment_id in aliment_ids
+        }
+
+    def statistiques(self):
+        entrees = self._entrees
+        confirmees = sum(len(c) for c, _ in entrees.values())
+        au_dessus = sum(len(a) for _, a in entrees.values())
+        return {
+            'utilisateurs': len(entrees),
+            'allergies_confirmees': confirmees,
+            'reactions_au_dessus_du_seuil': au_dessus,
+            'octets': (confirmees + au_dessus) * 4,
+            **self._fraicheur(),
+        }
+
+    def _publier(self, reconstruction=False):
+        entrees = self._entrees
+        if reconstruction:
+            registre.incrementer('allergy_index_rebuilds_total')
+        registre.definir('allergy_index_users', len(entrees))
+        registre.definir('allergy_index_entries', sum(len(c) + len(a) for c, a in entrees.values()))
+
+
+def index_courant():
+    """Index du worker courant, ou None s'il est désactivé"""
+    return current_app.extensions.get('index_allergies')
+
+
+def _allergies_modifiees(app, utilisateurs=None, **_):
+    index = app.extensions.get('index_allergies')
+    if index is not None:
+        index.invalider(utilisateurs)
+
+
+def _catalogue_modifie(app, entite=None, **_):
+    # Nom ou seuil d'un aliment, graphe de réactivité croisée : tout l'index est concerné
+    index = app.extensions.get('index_allergies')
+    if index is not None and entite in ('aliments', 'allergies', 'reactivites_croisees'):
+        index.invalider()
+
+
+def init_index_allergies(app):
+    """Créer l'index des allergies du worker ; il se charge à la première vérification"""
+    if not app.config.get('ALLERGY_INDEX_ENABLED', True):
+        return
+    app.extensions['index_allergies'] = IndexAllergies(app, app.config.get('ALLERGY_INDEX_REFRESH_SECONDS', 60))
+    allergies_modifiees.connect(_allergies_modifiees, sender=app, weak=False)
+    catalogue_modifie.connect(_catalogue_modifie, sender=app, weak=False)
@@ -0,0 +1,160 @@
+import threading
+import time
+import numpy as np
+from app.db.db import db
+
+
+def lire_lignes(requete):
+    """Tuples bruts lus sur le curseur DBAPI (sans objets Row : chargements de plusieurs millions de lignes)"""
+    resultat = db.session.connection().execute(requete)
+    lignes = resultat.cursor.fetchall()
+    resultat.close()
+    return lignes
+
+
+def lire_paires(requete):
+    """Paires (utilisateur, aliment) triées et dédoublonnées, lues sur le curseur DBAPI"""
+    return paires_distinctes(np.array(lire_lignes(requete), dtype=np.int64).reshape(-1, 2))
+
+
+def paires_distinctes(paires):
+    """Tableau (N, 2) trié par (utilisateur, aliment), sans doublons (ids positifs sur 31 bits)"""
+    # Une seule clé int64 par paire : un tri simple au lieu d'un lexsort à deux colonnes
+    cles = np.sort((paires[:, 0].astype(np.int64) << 32) | paires[:, 1])
+    distinctes = np.ones(len(cles), dtype=bool)
+    distinctes[1:] = cles[1:] != cles[:-1]
+    cles = cles[distinctes]
+    return np.column_stack((cles >> 32, cles & 0xFFFFFFFF))
+
+
+class IndexMemoire:
+    """Structure en mémoire du worker, construite depuis la base et tenue à jour par utilisateur.
+
+    Les écritures de ce worker marquent leurs utilisateurs (`invalider`), rechargés à
+    leur prochaine lecture ; une écriture non attribuable rend la structure périmée.
+    Les écritures des autres processus sont couvertes par une reconstruction complète
+    en arrière-plan, au plus tard tous les `intervalle` secondes, pendant laquelle les
+    lectures continuent sur l'ancienne version. Avec `intervalle` = 0, pas de thread :
+    la structure périmée est reconstruite dans la lecture qui le constate.
+
+    Une structure périmée le reste (`pret` vaut False) jusqu'à l'installation d'une
+    construction commencée après la dernière invalidation complète : chacune avance
+    `_generation`, que la reconstruction relève à son début.
+
+    Les sous-classes fournissent `_construire(utilisateurs=None)`, `_installer(etat)`
+    et `_fusionner(etat, utilisateurs)` (appelées sous verrou pour les deux dernières) ;
+    sous verrou, elles périment la structure par `_perimer()`.
+    """
+
+    nom = 'index'
+
+    def __init__(self, app, intervalle=60):
+        self.app = app
+        self.intervalle = intervalle
+        self._a_recharger = {}       # utilisateur_id → numéro de l'écriture qui l'a marqué
+        self._sequence = 0
+        self._charge_a = None
+        self._perime = False
+        self._generation = 0          # numéro de la dernière invalidation complète
+        self._reconstruction = None
+        self._verrou = threading.Lock()
+
+    # ----- construction -----
+
+    def reconstruire(self):
+        """Recharge toute la structure (dans un contexte d'application)"""
+        with self._verrou:
+            sequence, generation = self._sequence, self._generation
+        etat = self._construire()  # en cas d'échec, l'ancienne version reste en place, périmée
+        with self._verrou:
+            self._installer(etat)
+            self._charge_a = time.monotonic()
+            # Les utilisateurs modifiés pendant le chargement restent à recharger, et une
+            # invalidation complète pendant le chargement laisse la structure périmée
+            self._a_recharger = {u: s for u, s in self._a_recharger.items() if s > sequence}
+            self._perime = self._generation != generation
+        self._publier(reconstruction=True)
+
+    def _recharger_utilisateurs(self, utilisateurs):
+        with self._verrou:
+            marques = {u: self._a_recharger[u] for u in utilisateurs if u in self._a_recharger}
+        if not marques:
+            return
+        etat = self._construire(list(marques))
+        with self._verrou:
+            self._fusionner(etat, marques)
+            for utilisateur, sequence in marques.items():
+                if self._a_recharger.get(utilisateur) == sequence:
+                    del self._a_recharger[utilisateur]
+        self._publier()
+
+    def _reconstruire_en_fond(self):
+        try:
+            with self.app.app_context():
+                try:
+                    self.reconstruire()
+                finally:
+                    db.session.remove()
+        except Exception as e:
+            self.app.logger.warning('Reconstruction de « %s » impossible : %s', self.nom, e)
+        finally:
+            self._reconstruction = None
+
+    def _a_jour(self):
+        """Premier chargement synchrone ; ensuite, reconstruction en arrière-plan sans bloquer les lectures"""
+        if self._charge_a is None or (self._perime and not self.intervalle):
+            self.reconstruire()
+            return
+        if not self._perime and (not self.intervalle or time.monotonic() - self._charge_a < self.intervalle):
+            return
+        with self._verrou:
+            if self._reconstruction is not None:
+                return
+            self._reconstruction = fil = threading.Thread(target=self._reconstruire_en_fond, daemon=True,
+                                                          name=self.nom)
+        fil.start()
+
+    def pret(self, utilisateur_id):
+        """Met la structure à jour pour cet utilisateur ; False tant qu'une reconstruction est attendue"""
+        self._a_jour()
+        if utilisateur_id in self._a_recharger:
+            self._recharger_utilisateurs([utilisateur_id])
+        return not self._perime
+
+    # ----- écritures -----
+
+    def invalider(self, utilisateurs=None):
+        """Marque des utilisateurs à recharger, ou toute la structure à reconstruire (utilisateurs=None)"""
+        with self._verrou:
+            if utilisateurs is None:
+                self._perimer()
+                return
+            self._sequence += 1
+            for utilisateur in utilisateurs:
+                self._a_recharger[utilisateur] = self._sequence
+
+    def _perimer(self):
+        """Reconstruction complète requise (sous verrou)"""
+        self._generation += 1
+        self._perime = True
+
+    # ----- à fournir -----
+
+    def _construire(self, utilisateurs=None):
+        raise NotImplementedError
+
+    def _installer(self, etat):
+        raise NotImplementedError
+
+    def _fusionner(self, etat, utilisateurs):
+        raise NotImplementedError
+
+    def _publier(self, reconstruction=False):
+        """Métriques après un chargement"""
+
+    def _fraicheur(self):
+        return {
+            'utilisateurs_a_recharger': len(self._a_recharger),
+            'perime': self._perime,
+            'age_s': round(time.monotonic() - self._charge_a, 1) if self._charge_a is not None else None,
+        }
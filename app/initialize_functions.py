@@ -1,5 +1,51 @@
 from flask import Blueprint
 
+def register_monitoring(app):
+    """Brancher l'instrumentation des performances sur l'application"""
+    from app.monitoring.sql_stats import init_sql_stats
+    from app.monitoring.metrics import init_metrics
+    from app.monitoring.profiler import init_profiler
+    from app.monitoring.sampler import init_sampler
+    
+    init_sql_stats(app)
+    init_metrics(app)
+    init_profiler(app)
+    init_sampler(app)
+
+
+def register_protections(app):
+    """Brancher les protections contre la surcharge (admission, échéances, pool de connexions)"""
+    from app.admission import init_admission
+    from app.db.concurrence import init_concurrence
+    from app.db.echeances import init_echeances
+
+    init_admission(app)
+    init_echeances(app)
+    init_concurrence(app)
+
+
+def register_index_memoire(app):
+    """Brancher les index en mémoire du worker (graphe de réactivité croisée, vérifications d'allergies, comptoir)"""
+    from app.comptoir import init_comptoir
+    from app.filtre_bloom import init_filtre_bloom
+    from app.index_allergies import init_index_allergies
+    from app.reactivite import init_reactivite
+
+    init_reactivite(app)
+    init_index_allergies(app)
+    init_filtre_bloom(app)
+    init_comptoir(app)
+
+
+def register_commands(app):
+    """Enregistrer les commandes CLI de l'application"""
+    from app.commands import backfill_allergies_command, import_aliments_command, taches_worker_command
+
+    app.cli.add_command(import_aliments_command)
+    app.cli.add_command(taches_worker_command)
+    app.cli.add_command(backfill_allergies_command)
+
+
 def register_blueprints(app, api=None):
     """Enregistrer tous les blueprints de l'application"""
     
@@ -15,6 +61,7 @@ def register_blueprints(app, api=None):
     from app.routes.menu_auto import menu_auto_bp
     from app.routes.planificateur import planificateur_bp
     from app.routes.allergies_advanced import allergies_bp
+    from app.routes.metrics import metrics_bp
     # Correction : importer le blueprint qui était manquant
     
 
@@ -30,6 +77,7 @@ def register_blueprints(app, api=None):
     app.register_blueprint(menu_auto_bp)
     app.register_blueprint(planificateur_bp)
     app.register_blueprint(allergies_bp)
+    app.register_blueprint(metrics_bp)
     
     # Si Swagger est activé, ajouter les namespaces (avec protection d'erreur)
     if api is not None:
@@ -98,5 +146,35 @@ def register_blueprints(app, api=None):
             api.add_namespace(allergies_ns, path='/allergies')
         except ImportError as e:
             print(f"⚠️ Namespace allergies non trouvé: {e}")
+        
+        try:
+            from app.routes.taches import taches_ns
+            api.add_namespace(taches_ns, path='/taches')
+        except ImportError as e:
+            print(f"⚠️ Namespace taches non trouvé: {e}")
+        
+        try:
+            from app.routes.admin import admin_ns
+            api.add_namespace(admin_ns, path='/admin')
+        except ImportError as e:
+            print(f"⚠️ Namespace admin non trouvé: {e}")
+        
+        try:
+            from app.routes.batch import batch_ns
+            api.add_namespace(batch_ns, path='/batch')
+        except ImportError as e:
+            print(f"⚠️ Namespace batch non trouvé: {e}")
+        
+        try:
+            from app.routes.comptoir import comptoir_ns
+            api.add_namespace(comptoir_ns, path='/comptoir')
+        except ImportError as e:
+            print(f"⚠️ Namespace comptoir non trouvé: {e}")
+        
+        try:
+            from app.routes.reactivite import reactivite_ns
+            api.add_namespace(reactivite_ns, path='/reactivites')
+        except ImportError as e:
+            print(f"⚠️ Namespace reactivites non trouvé: {e}")
     else:
         print("⚠️ API Swagger non initialisée, les namespaces ne seront pas ajoutés.")
\ No newline at end of file
@@ -1,6 +1,10 @@
+from flask import current_app, has_app_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_restx import fields
 from datetime import datetime
+from sqlalchemy import and_, case, func, literal_column, or_, select
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import column_property
 from werkzeug.security import generate_password_hash, check_password_hash
 from app.db.db import db
 
@@ -119,6 +123,7 @@ class Aliment(db.Model):
     glucides = db.Column(db.Float, default=0)
     fibres = db.Column(db.Float, default=0)
     type_aliment = db.Column(db.String(50))
+    seuil_allergie = db.Column(db.Float)  # Probabilité (%) de détection propre à l'aliment, sinon seuil global
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     categorie_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=True)
@@ -137,6 +142,7 @@ class Aliment(db.Model):
             'glucides': self.glucides,
             'fibres': self.fibres,
             'type_aliment': self.type_aliment,
+            'seuil_allergie': self.seuil_allergie,
             'categorie_id': self.categorie_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
@@ -154,6 +160,7 @@ class Aliment(db.Model):
             'glucides': fields.Float(description='Glucides en grammes pour 100g', example=14.0),
             'fibres': fields.Float(description='Fibres en grammes pour 100g', example=2.4),
             'type_aliment': fields.String(description='Type d\'aliment'),
+            'seuil_allergie': fields.Float(description='Seuil de détection d\'allergie (%), seuil global si vide'),
             'categorie_id': fields.Integer(description='ID de la catégorie'),
             'created_at': fields.DateTime(description='Date de création'),
             'updated_at': fields.DateTime(description='Date de dernière modification')
@@ -170,6 +177,7 @@ class Aliment(db.Model):
             'glucides': fields.Float(description='Glucides en grammes pour 100g', example=23.0),
             'fibres': fields.Float(description='Fibres en grammes pour 100g', example=2.6),
             'type_aliment': fields.String(description='Type d\'aliment'),
+            'seuil_allergie': fields.Float(description='Seuil de détection d\'allergie (%)', example=10.0),
             'categorie_id': fields.Integer(description='ID de la catégorie')
         })
 
@@ -235,6 +243,7 @@ class Allergie(db.Model):
     nom = db.Column(db.String(100), nullable=False, unique=True)
     description = db.Column(db.Text)
     gravite = db.Column(db.String(20), default='Modéré')  # Léger, Modéré, Sévère
+    seuil_detection = db.Column(db.Float)  # Probabilité (%) de détection des aliments qui la portent, sinon seuil global
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relations
@@ -246,6 +255,7 @@ class Allergie(db.Model):
             'nom': self.nom,
             'description': self.description,
             'gravite': self.gravite,
+            'seuil_detection': self.seuil_detection,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
     
@@ -256,6 +266,7 @@ class Allergie(db.Model):
             'nom': fields.String(required=True, description='Nom de l\'allergie', example='Arachides'),
             'description': fields.String(description='Description détaillée'),
             'gravite': fields.String(description='Niveau de gravité', enum=['Léger', 'Modéré', 'Sévère']),
+            'seuil_detection': fields.Float(description='Seuil de détection (%) des aliments porteurs, seuil global si vide'),
             'created_at': fields.DateTime(description='Date de création')
         })
     
@@ -264,11 +275,24 @@ class Allergie(db.Model):
         return api.model('AllergieInput', {
             'nom': fields.String(required=True, description='Nom de l\'allergie', example='Gluten'),
             'description': fields.String(description='Description détaillée'),
-            'gravite': fields.String(description='Niveau de gravité', enum=['Léger', 'Modéré', 'Sévère'], example='Modéré')
+            'gravite': fields.String(description='Niveau de gravité', enum=['Léger', 'Modéré', 'Sévère'], example='Modéré'),
+            'seuil_detection': fields.Float(description='Seuil de détection (%) des aliments porteurs', example=10.0)
         })
 
 # ============= NOUVELLES TABLES POUR GESTION ALLERGIES =============
 
+def seuil_allergie_defaut():
+    """Seuil global de détection (%), réglable par ALLERGY_THRESHOLD_DEFAULT"""
+    if has_app_context():
+        return current_app.config.get('ALLERGY_THRESHOLD_DEFAULT', 30)
+    return 30
+
+
+# Alias : le seuil de l'aliment reste une sous-requête corrélée à la seule réaction,
+# même dans une requête qui joint déjà la table aliments
+_aliment_seuil = Aliment.__table__.alias('aliment_seuil')
+
+
 class ReactionAllergique(db.Model):
     """
     Gère l'historique des réactions allergiques d'un utilisateur 
@@ -286,6 +310,55 @@ class ReactionAllergique(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Seuil propre à l'aliment, chargé avec la réaction (pas de requête supplémentaire)
+    seuil_aliment = column_property(
+        select(_aliment_seuil.c.seuil_allergie)
+        .where(_aliment_seuil.c.id == aliment_id)
+        .correlate_except(_aliment_seuil)
+        .scalar_subquery()
+    )
+    
+    # Index partiel des réactions candidates : une réaction allergique a forcément réagi
+    __table_args__ = (
+        db.Index('ix_reactions_candidates', 'utilisateur_id', 'aliment_id',
+                 postgresql_where=times_reacted > 0, sqlite_where=times_reacted > 0),
+    )
+    
+    @hybrid_property
+    def probabilite(self):
+        """Probabilité d'allergie (%) ; expression SQL utilisable dans les filtres et agrégats"""
+        if not self.times_eaten:
+            return 0.0
+        return (self.times_reacted / self.times_eaten) * 100
+    
+    @probabilite.expression
+    def probabilite(cls):
+        return case((cls.times_eaten > 0, cls.times_reacted * 100.0 / cls.times_eaten), else_=0.0)
+    
+    @hybrid_property
+    def seuil(self):
+        """Seuil de détection applicable : celui de l'aliment, sinon celui des allergies
+        qu'il porte, sinon le seuil global"""
+        for seuil in (self.seuil_aliment, self.seuil_allergies):
+            if seuil is not None:
+                return seuil
+        return seuil_allergie_defaut()
+    
+    @seuil.expression
+    def seuil(cls):
+        return func.coalesce(cls.seuil_aliment, cls.seuil_allergies, seuil_allergie_defaut())
+    
+    @hybrid_property
+    def est_allergique(self):
+        return self.probabilite > self.seuil
+    
+    @est_allergique.expression
+    def est_allergique(cls):
+        # Sans division : times_reacted * 100 > seuil * times_eaten, filtrable par l'index partiel
+        # (constante littérale : SQLite n'utilise un index partiel que si le prédicat est identique)
+        return and_(cls.times_reacted > literal_column('0'), cls.times_eaten > 0,
+                    cls.times_reacted * 100 > cls.seuil * cls.times_eaten)
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -295,6 +368,7 @@ class ReactionAllergique(db.Model):
             'times_eaten': self.times_eaten,
             'times_reacted': self.times_reacted,
             'probabilite_allergie': self.probabilite_allergie(),
+            'seuil_allergie': self.seuil,
             'is_allergic': self.is_allergic(),
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
@@ -302,13 +376,11 @@ class ReactionAllergique(db.Model):
     
     def probabilite_allergie(self):
         """Renvoie la probabilité d'allergie (en pourcentage)."""
-        if self.times_eaten == 0:
-            return 0.0
-        return (self.times_reacted / self.times_eaten) * 100
+        return self.probabilite
 
     def is_allergic(self):
-        """Renvoie True si la probabilité d'allergie dépasse 30%."""
-        return self.probabilite_allergie() > 30
+        """Renvoie True si la probabilité d'allergie dépasse le seuil (30% par défaut)."""
+        return self.est_allergique
     
     @staticmethod
     def get_swagger_model(api):
@@ -320,7 +392,8 @@ class ReactionAllergique(db.Model):
             'times_eaten': fields.Integer(description='Nombre de fois consommé'),
             'times_reacted': fields.Integer(description='Nombre de réactions allergiques'),
             'probabilite_allergie': fields.Float(description='Probabilité estimée (en %)'),
-            'is_allergic': fields.Boolean(description='True si probabilité > 30 %'),
+            'seuil_allergie': fields.Float(description='Seuil de détection appliqué (en %)'),
+            'is_allergic': fields.Boolean(description='True si probabilité > seuil (30 % par défaut)'),
             'created_at': fields.DateTime(description='Date de création'),
             'updated_at': fields.DateTime(description='Dernière modification')
         })
@@ -381,6 +454,82 @@ class AllergieUtilisateur(db.Model):
             'gravite_personnelle': fields.String(description='Gravité personnelle', enum=['Léger', 'Modéré', 'Sévère'], example='Modéré')
         })
 
+class ReactiviteCroisee(db.Model):
+    """
+    Arête du graphe de réactivité croisée : une allergie entraîne une allergie
+    liée (crevette → homard) ou désigne un aliment qui la porte (arachide → beurre
+    de cacahuète), en plus de la règle Allergie.nom == Aliment.nom.
+    """
+    __tablename__ = 'reactivites_croisees'
+
+    id = db.Column(db.Integer, primary_key=True)
+    allergie_id = db.Column(db.Integer, db.ForeignKey('allergies.id', ondelete='CASCADE'), nullable=False, index=True)
+    allergie_liee_id = db.Column(db.Integer, db.ForeignKey('allergies.id', ondelete='CASCADE'), nullable=True)
+    aliment_id = db.Column(db.Integer, db.ForeignKey('aliments.id', ondelete='CASCADE'), nullable=True)
+    bidirectionnelle = db.Column(db.Boolean, default=True)  # Entre deux allergies : la réaction vaut dans les deux sens
+    description = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Exactement une cible : une allergie liée ou un aliment
+    __table_args__ = (
+        db.CheckConstraint('(allergie_liee_id IS NULL) <> (aliment_id IS NULL)', name='ck_reactivite_cible'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'allergie_id': self.allergie_id,
+            'allergie_liee_id': self.allergie_liee_id,
+            'aliment_id': self.aliment_id,
+            'bidirectionnelle': self.bidirectionnelle,
+            'description': self.description,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    @staticmethod
+    def get_swagger_model(api):
+        return api.model('ReactiviteCroisee', {
+            'id': fields.Integer(readonly=True, description='ID unique'),
+            'allergie_id': fields.Integer(required=True, description='ID de l\'allergie source'),
+            'allergie_liee_id': fields.Integer(description='ID de l\'allergie liée'),
+            'aliment_id': fields.Integer(description='ID de l\'aliment porteur'),
+            'bidirectionnelle': fields.Boolean(description='Réactivité dans les deux sens (entre allergies)'),
+            'description': fields.String(description='Origine de la réactivité'),
+            'created_at': fields.DateTime(description='Date de création')
+        })
+
+    @staticmethod
+    def get_swagger_input_model(api):
+        return api.model('ReactiviteCroiseeInput', {
+            'allergie_id': fields.Integer(required=True, description='ID de l\'allergie source', example=1),
+            'allergie_liee_id': fields.Integer(description='ID de l\'allergie liée (ou aliment_id)', example=2),
+            'aliment_id': fields.Integer(description='ID de l\'aliment porteur (ou allergie_liee_id)'),
+            'bidirectionnelle': fields.Boolean(description='Réactivité dans les deux sens', example=True),
+            'description': fields.String(description='Origine de la réactivité', example='Tropomyosine des crustacés')
+        })
+
+
+# Seuil des allergies portées par l'aliment de la réaction (nom identique ou arête allergie → aliment),
+# le plus bas s'il y en a plusieurs ; déclaré ici, une fois les tables des allergies et des arêtes connues
+_allergie_seuil = Allergie.__table__.alias('allergie_seuil')
+_arete_seuil = ReactiviteCroisee.__table__.alias('arete_seuil')
+ReactionAllergique.seuil_allergies = column_property(
+    select(func.min(_allergie_seuil.c.seuil_detection))
+    .where(or_(
+        _allergie_seuil.c.nom == select(_aliment_seuil.c.nom)
+        .where(_aliment_seuil.c.id == ReactionAllergique.__table__.c.aliment_id)
+        .correlate_except(_aliment_seuil)
+        .scalar_subquery(),
+        _allergie_seuil.c.id.in_(
+            select(_arete_seuil.c.allergie_id)
+            .where(_arete_seuil.c.aliment_id == ReactionAllergique.__table__.c.aliment_id)
+            .correlate_except(_arete_seuil)
+        )
+    ))
+    .correlate_except(_allergie_seuil, _aliment_seuil, _arete_seuil)
+    .scalar_subquery()
+)
+
 # ============= AUTRES MODÈLES EXISTANTS =============
 
 class Recommandation(db.Model):
@@ -521,6 +670,41 @@ class Image(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class Tache(db.Model):
+    """
+    File de tâches de fond durable (détection d'allergies, ...).
+    Une tâche est insérée dans la même transaction que l'écriture qui la déclenche.
+    """
+    __tablename__ = 'taches'
+
+    id = db.Column(db.Integer, primary_key=True)
+    type = db.Column(db.String(50), nullable=False)
+    cle = db.Column(db.String(100))  # Regroupement des tâches traitées ensemble (ex. utilisateur)
+    charge = db.Column(db.JSON, default=dict)
+    statut = db.Column(db.String(20), nullable=False, default='en_attente')  # en_attente, en_cours, terminee, echec
+    tentatives = db.Column(db.Integer, nullable=False, default=0)
+    verrou = db.Column(db.String(32))  # Jeton du worker qui a réservé la tâche
+    resultat = db.Column(db.JSON)
+    erreur = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    demarree_at = db.Column(db.DateTime)
+    terminee_at = db.Column(db.DateTime)
+
+    __table_args__ = (db.Index('ix_taches_statut_id', 'statut', 'id'),)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.type,
+            'statut': self.statut,
+            'tentatives': self.tentatives,
+            'resultat': self.resultat,
+            'erreur': self.erreur,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'demarree_at': self.demarree_at.isoformat() if self.demarree_at else None,
+            'terminee_at': self.terminee_at.isoformat() if self.terminee_at else None
+        }
+
 # ============= FONCTION GLOBALE POUR CRÉER TOUS LES MODÈLES SWAGGER =============
 
 def create_swagger_models(api):
@@ -539,6 +723,20 @@ def create_swagger_models(api):
         'status_code': fields.Integer(description='Code de statut HTTP')
     })
     
+    operation_masse_model = api.model('OperationMasse', {
+        'ids': fields.List(fields.Integer, description='Identifiants ciblés', example=[1, 2, 3]),
+        'filtre': fields.Raw(description='Filtre colonne → valeur (liste = IN, nom_contient = recherche)',
+                             example={'categorie_id': 2}),
+        'valeurs': fields.Raw(description='Colonnes à modifier (PATCH uniquement)', example={'fibres': 0})
+    })
+    
+    resultat_masse_model = api.model('ResultatMasse', {
+        'operation': fields.String(description='update ou delete'),
+        'entite': fields.String(description='Table concernée'),
+        'lignes_affectees': fields.Integer(description='Nombre de lignes modifiées ou supprimées'),
+        'ids': fields.List(fields.Integer, description='Identifiants touchés')
+    })
+    
     return {
         # ============= MODÈLES DE SORTIE =============
         'utilisateur': Utilisateur.get_swagger_model(api),
@@ -566,5 +764,9 @@ def create_swagger_models(api):
         
         # ============= MODÈLES DE RÉPONSE =============
         'message': message_model,
-        'error': error_model
+        'error': error_model,
+        
+        # ============= OPÉRATIONS EN MASSE =============
+        'operation_masse': operation_masse_model,
+        'resultat_masse': resultat_masse_model
     }
\ No newline at end of file
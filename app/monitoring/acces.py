@@ -0,0 +1,9 @@
+import hmac
+from flask import current_app, request
+
+
+def requete_admin():
+    """True si la requête porte le jeton d'administration configuré (en-tête X-Admin-Token)"""
+    jeton = current_app.config.get('ADMIN_TOKEN')
+    fourni = request.headers.get('X-Admin-Token')
+    return bool(jeton) and fourni is not None and hmac.compare_digest(jeton, fourni)
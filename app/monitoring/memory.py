@@ -0,0 +1,116 @@
+import gc
+import threading
+import tracemalloc
+from collections import deque
+from datetime import datetime
+from app.db.db import db
+
+# Allocations internes à exclure des comparaisons
+_FILTRES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+class SuiviMemoire:
+    """Instantanés tracemalloc périodiques d'un worker, comparés par site d'allocation"""
+
+    def __init__(self, max_instantanes=10):
+        self._verrou = threading.Lock()
+        self._instantanes = deque(maxlen=max_instantanes)
+        self._arret = threading.Event()
+        self._thread = None
+        self.intervalle = None
+
+    @property
+    def actif(self):
+        return tracemalloc.is_tracing()
+
+    def demarrer(self, nframes=10, intervalle=60, max_instantanes=None):
+        """Active tracemalloc et prend un instantané de référence"""
+        if max_instantanes and max_instantanes != self._instantanes.maxlen:
+            with self._verrou:
+                self._instantanes = deque(self._instantanes, maxlen=max_instantanes)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(nframes)
+        self.prendre_instantane()
+
+        self.intervalle = intervalle
+        if intervalle and (self._thread is None or not self._thread.is_alive()):
+            self._arret.clear()
+            self._thread = threading.Thread(target=self._boucle, name='suivi-memoire', daemon=True)
+            self._thread.start()
+
+    def arreter(self):
+        self._arret.set()
+        self.intervalle = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        with self._verrou:
+            self._instantanes.clear()
+
+    def _boucle(self):
+        while not self._arret.wait(self.intervalle):
+            if not tracemalloc.is_tracing():
+                return
+            self.prendre_instantane()
+
+    def prendre_instantane(self):
+        instantane = tracemalloc.take_snapshot().filter_traces(_FILTRES)
+        with self._verrou:
+            self._instantanes.append((datetime.utcnow(), instantane))
+        return instantane
+
+    def comparer(self, base='premier', cle='lineno', limite=20):
+        """Plus fortes croissances entre une base (premier/précédent) et le dernier instantané"""
+        with self._verrou:
+            instantanes = list(self._instantanes)
+        if len(instantanes) < 2:
+            return None
+
+        date_base, reference = instantanes[0] if base == 'premier' else instantanes[-2]
+        date_fin, dernier = instantanes[-1]
+        ecarts = dernier.compare_to(reference, cle)
+
+        return {
+            'base': date_base.isoformat(),
+            'dernier': date_fin.isoformat(),
+            'croissances': [
+                {
+                    'site': ecart.traceback.format()[-1].strip() if cle != 'traceback' else ecart.traceback.format(),
+                    'taille_diff_ko': round(ecart.size_diff / 1024, 1),
+                    'taille_ko': round(ecart.size / 1024, 1),
+                    'nombre_diff': ecart.count_diff,
+                    'nombre': ecart.count
+                }
+                for ecart in ecarts[:limite] if ecart.size_diff > 0
+            ]
+        }
+
+    def statut(self):
+        courant, pic = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        with self._verrou:
+            dates = [date.isoformat() for date, _ in self._instantanes]
+        return {
+            'actif': self.actif,
+            'intervalle_s': self.intervalle,
+            'memoire_tracee_ko': round(courant / 1024, 1),
+            'pic_ko': round(pic / 1024, 1),
+            'instantanes': dates
+        }
+
+
+def compter_instances_orm():
+    """Nombre d'instances vivantes de chaque modèle (identity maps, caches qui retiennent des objets)"""
+    modeles = {mapper.class_ for mapper in db.Model.registry.mappers}
+    comptes = {}
+    for objet in gc.get_objects():
+        classe = type(objet)
+        if classe in modeles:
+            comptes[classe.__name__] = comptes.get(classe.__name__, 0) + 1
+    return dict(sorted(comptes.items(), key=lambda x: -x[1]))
+
+
+suivi = SuiviMemoire()
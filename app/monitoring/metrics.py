@@ -0,0 +1,271 @@
+import atexit
+import glob
+import json
+import math
+import os
+import threading
+import time
+from flask import current_app, g, request
+
+# Bornes des histogrammes de latence (en secondes)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+QUANTILES = (0.5, 0.95, 0.99)
+
+DESCRIPTIONS = {
+    'http_requests_total': ('counter', 'Nombre de requêtes HTTP traitées'),
+    'http_request_errors_total': ('counter', 'Nombre de requêtes HTTP en erreur (5xx)'),
+    'http_request_duration_seconds': ('histogram', 'Latence des requêtes HTTP'),
+}
+
+
+class RegistreMetriques:
+    """Compteurs et histogrammes d'un processus, fusionnables entre workers"""
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._compteurs = {}
+        self._jauges = {}
+        self._histogrammes = {}
+
+    @staticmethod
+    def _cle(nom, labels):
+        return (nom, tuple(sorted(labels.items())))
+
+    def incrementer(self, nom, valeur=1, **labels):
+        cle = self._cle(nom, labels)
+        with self._verrou:
+            self._compteurs[cle] = self._compteurs.get(cle, 0) + valeur
+
+    def definir(self, nom, valeur, **labels):
+        """Jauge instantanée (non cumulée entre workers, sommée à la fusion)"""
+        with self._verrou:
+            self._jauges[self._cle(nom, labels)] = valeur
+
+    def observer(self, nom, valeur, **labels):
+        cle = self._cle(nom, labels)
+        with self._verrou:
+            histo = self._histogrammes.get(cle)
+            if histo is None:
+                histo = self._histogrammes[cle] = {'buckets': [0] * len(BUCKETS), 'somme': 0.0, 'total': 0}
+            for i, borne in enumerate(BUCKETS):
+                if valeur <= borne:
+                    histo['buckets'][i] += 1
+                    break
+            histo['somme'] += valeur
+            histo['total'] += 1
+
+    def instantane(self):
+        """Copie sérialisable en JSON de l'état du registre"""
+        with self._verrou:
+            return {
+                'compteurs': [[nom, list(labels), v] for (nom, labels), v in self._compteurs.items()],
+                'jauges': [[nom, list(labels), v] for (nom, labels), v in self._jauges.items()],
+                'histogrammes': [
+                    [nom, list(labels), {'buckets': list(h['buckets']), 'somme': h['somme'], 'total': h['total']}]
+                    for (nom, labels), h in self._histogrammes.items()
+                ]
+            }
+
+    def reinitialiser(self):
+        with self._verrou:
+            self._compteurs.clear()
+            self._jauges.clear()
+            self._histogrammes.clear()
+
+
+registre = RegistreMetriques()
+
+
+def fusionner(instantanes):
+    """Additionne les instantanés de plusieurs workers"""
+    compteurs, jauges, histogrammes = {}, {}, {}
+    for inst in instantanes:
+        for nom, labels, v in inst.get('compteurs', []):
+            cle = (nom, tuple(tuple(l) for l in labels))
+            compteurs[cle] = compteurs.get(cle, 0) + v
+        for nom, labels, v in inst.get('jauges', []):
+            cle = (nom, tuple(tuple(l) for l in labels))
+            jauges[cle] = jauges.get(cle, 0) + v
+        for nom, labels, h in inst.get('histogrammes', []):
+            cle = (nom, tuple(tuple(l) for l in labels))
+            cumul = histogrammes.setdefault(cle, {'buckets': [0] * len(BUCKETS), 'somme': 0.0, 'total': 0})
+            cumul['buckets'] = [a + b for a, b in zip(cumul['buckets'], h['buckets'])]
+            cumul['somme'] += h['somme']
+            cumul['total'] += h['total']
+    return compteurs, jauges, histogrammes
+
+
+def quantile(buckets, q):
+    """Estime un quantile par interpolation linéaire dans les buckets"""
+    total = sum(buckets)
+    if total == 0:
+        return 0.0
+    rang = q * total
+    cumul = 0
+    borne_basse = 0.0
+    for borne, nombre in zip(BUCKETS, buckets):
+        if cumul + nombre >= rang and nombre > 0:
+            if math.isinf(borne):
+                return borne_basse
+            return borne_basse + (borne - borne_basse) * (rang - cumul) / nombre
+        cumul += nombre
+        if not math.isinf(borne):
+            borne_basse = borne
+    return borne_basse
+
+
+# ============= AGRÉGATION MULTI-PROCESSUS (GUNICORN) =============
+
+_dernier_flush = [0.0]
+
+
+def _fichier_worker(dossier, pid=None):
+    return os.path.join(dossier, f'metrics_{pid or os.getpid()}.json')
+
+
+def ecrire_instantane(dossier):
+    """Écrit l'instantané du worker courant de manière atomique"""
+    os.makedirs(dossier, exist_ok=True)
+    chemin = _fichier_worker(dossier)
+    temporaire = f'{chemin}.tmp'
+    with open(temporaire, 'w') as f:
+        json.dump(registre.instantane(), f)
+    os.replace(temporaire, chemin)
+    _dernier_flush[0] = time.monotonic()
+
+
+def _processus_vivant(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Processus d'un autre utilisateur : toujours en vie
+    return True
+
+
+def lire_instantanes(dossier):
+    """Instantanés de tous les workers vivants (le worker courant est lu en mémoire).
+
+    Le fichier d'un worker arrêté ou recyclé par gunicorn est supprimé : ses
+    jauges et compteurs ne sont plus additionnés.
+    """
+    instantanes = [registre.instantane()]
+    if not dossier:
+        return instantanes
+    propre = _fichier_worker(dossier)
+    for chemin in glob.glob(os.path.join(dossier, 'metrics_*.json')):
+        if chemin == propre:
+            continue
+        pid = os.path.basename(chemin)[len('metrics_'):-len('.json')]
+        if pid.isdigit() and not _processus_vivant(int(pid)):
+            try:
+                os.remove(chemin)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(chemin) as f:
+                instantanes.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return instantanes
+
+
+# ============= FORMAT TEXTE PROMETHEUS =============
+
+def _echapper(valeur):
+    return str(valeur).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, **extra):
+    paires = list(labels) + list(extra.items())
+    if not paires:
+        return ''
+    return '{' + ','.join(f'{k}="{_echapper(v)}"' for k, v in paires) + '}'
+
+
+def _format_borne(borne):
+    return '+Inf' if math.isinf(borne) else repr(borne)
+
+
+def rendre_prometheus(instantanes):
+    """Produit l'exposition texte Prometheus à partir des instantanés fusionnés"""
+    compteurs, jauges, histogrammes = fusionner(instantanes)
+    lignes = []
+    deja_decrits = set()
+
+    def entete(nom, type_defaut):
+        if nom in deja_decrits:
+            return
+        deja_decrits.add(nom)
+        type_metrique, aide = DESCRIPTIONS.get(nom, (type_defaut, nom))
+        lignes.append(f'# HELP {nom} {aide}')
+        lignes.append(f'# TYPE {nom} {type_metrique}')
+
+    for (nom, labels), valeur in sorted(compteurs.items()):
+        entete(nom, 'counter')
+        lignes.append(f'{nom}{_labels(labels)} {valeur}')
+
+    for (nom, labels), valeur in sorted(jauges.items()):
+        entete(nom, 'gauge')
+        lignes.append(f'{nom}{_labels(labels)} {valeur}')
+
+    quantiles = {}
+    for (nom, labels), h in sorted(histogrammes.items()):
+        entete(nom, 'histogram')
+        cumul = 0
+        for borne, nombre in zip(BUCKETS, h['buckets']):
+            cumul += nombre
+            lignes.append(f'{nom}_bucket{_labels(labels, le=_format_borne(borne))} {cumul}')
+        lignes.append(f'{nom}_sum{_labels(labels)} {h["somme"]}')
+        lignes.append(f'{nom}_count{_labels(labels)} {h["total"]}')
+        for q in QUANTILES:
+            quantiles.setdefault(nom, []).append(
+                f'{nom}_quantile{_labels(labels, quantile=q)} {quantile(h["buckets"], q)}'
+            )
+
+    # Quantiles p50/p95/p99 estimés à partir des buckets fusionnés
+    for nom, lignes_quantiles in quantiles.items():
+        lignes.append(f'# HELP {nom}_quantile Quantiles estimés de {nom}')
+        lignes.append(f'# TYPE {nom}_quantile gauge')
+        lignes.extend(lignes_quantiles)
+
+    return '\n'.join(lignes) + '\n'
+
+
+# ============= HOOKS FLASK =============
+
+def _debut_requete():
+    g.metrics_debut = time.perf_counter()
+
+
+def _fin_requete(response):
+    debut = g.pop('metrics_debut', None)
+    if debut is None:
+        return response
+
+    endpoint = request.endpoint or 'inconnu'
+    registre.incrementer('http_requests_total', endpoint=endpoint, method=request.method)
+    if response.status_code >= 500:
+        registre.incrementer('http_request_errors_total', endpoint=endpoint, method=request.method)
+    registre.observer('http_request_duration_seconds', time.perf_counter() - debut, endpoint=endpoint)
+
+    dossier = current_app.config.get('METRICS_MULTIPROC_DIR')
+    if dossier and time.monotonic() - _dernier_flush[0] >= current_app.config.get('METRICS_FLUSH_INTERVAL', 5):
+        ecrire_instantane(dossier)
+
+    return response
+
+
+def init_metrics(app):
+    """Brancher la collecte des métriques HTTP"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    app.before_request(_debut_requete)
+    app.after_request(_fin_requete)
+
+    dossier = app.config.get('METRICS_MULTIPROC_DIR')
+    if dossier:
+        atexit.register(ecrire_instantane, dossier)
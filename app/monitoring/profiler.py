@@ -0,0 +1,258 @@
+import cProfile
+import io
+import json
+import marshal
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from flask import current_app, g, request
+from app.monitoring.acces import requete_admin
+
+_ID_VALIDE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class MagasinProfils:
+    """Profils récents du worker, bornés en nombre (les plus anciens sont évincés)"""
+
+    def __init__(self, capacite=50):
+        self.capacite = capacite
+        self._verrou = threading.Lock()
+        self._profils = OrderedDict()
+
+    def ajouter(self, request_id, metadonnees, stats):
+        with self._verrou:
+            self._profils[request_id] = (metadonnees, stats)
+            self._profils.move_to_end(request_id)
+            while len(self._profils) > self.capacite:
+                self._profils.popitem(last=False)
+
+    def obtenir(self, request_id):
+        with self._verrou:
+            return self._profils.get(request_id)
+
+    def lister(self):
+        with self._verrou:
+            return [meta for meta, _ in reversed(self._profils.values())]
+
+
+magasin = MagasinProfils()
+
+
+def identifiant_requete():
+    """Identifiant de la requête courante (en-tête X-Request-ID ou généré)"""
+    if 'request_id' not in g:
+        fourni = request.headers.get('X-Request-ID', '')
+        g.request_id = fourni if _ID_VALIDE.match(fourni) else uuid.uuid4().hex
+    return g.request_id
+
+
+def identifiant_profil():
+    """Identifiant unique du profil : un X-Request-ID fourni par le client est suffixé
+    (un en-tête réutilisé n'écrase pas un profil existant)"""
+    fourni = request.headers.get('X-Request-ID', '')
+    if not _ID_VALIDE.match(fourni):
+        return uuid.uuid4().hex
+    return f'{fourni[:55]}-{uuid.uuid4().hex[:8]}'
+
+
+# ============= CONVERSIONS =============
+
+def _nom_fonction(fonction):
+    fichier, ligne, nom = fonction
+    if fichier == '~':
+        return nom
+    return f'{nom} ({os.path.basename(fichier)}:{ligne})'
+
+
+class _StatsBrutes:
+    """Adaptateur permettant à pstats.Stats de charger un dictionnaire de stats"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def format_texte(stats, limite=60):
+    """Rapport pstats trié par temps cumulé"""
+    sortie = io.StringIO()
+    rapport = pstats.Stats(_StatsBrutes(stats), stream=sortie)
+    rapport.sort_stats('cumulative').print_stats(limite)
+    return sortie.getvalue()
+
+
+def format_replie(stats, profondeur_max=64, seuil_us=1):
+    """Piles repliées (format flamegraph.pl / speedscope), en microsecondes.
+
+    cProfile ne conserve que les arêtes appelant → appelé : le temps d'une
+    fonction est réparti entre ses chemins au prorata des temps d'arête.
+    """
+    appeles = {}
+    racines = []
+    for fonction, (_, _, _, _, appelants) in stats.items():
+        connus = [a for a in appelants if a in stats]
+        if not connus:
+            racines.append(fonction)
+        for appelant in connus:
+            appeles.setdefault(appelant, []).append((fonction, appelants[appelant][3]))
+
+    lignes = {}
+
+    def deplier(fonction, pile, budget):
+        cumul = stats[fonction][3]
+        ratio = budget / cumul if cumul > 0 else 0
+        pile = pile + [_nom_fonction(fonction)]
+        propre = int(stats[fonction][2] * ratio * 1e6)
+        if propre >= seuil_us:
+            cle = ';'.join(pile)
+            lignes[cle] = lignes.get(cle, 0) + propre
+        if len(pile) >= profondeur_max:
+            return
+        for appele, temps_arete in appeles.get(fonction, []):
+            part = temps_arete * ratio
+            if part * 1e6 >= seuil_us and _nom_fonction(appele) not in pile:
+                deplier(appele, pile, part)
+
+    for racine in racines:
+        deplier(racine, [], stats[racine][3])
+
+    return '\n'.join(f'{pile} {valeur}' for pile, valeur in lignes.items()) + '\n'
+
+
+# ============= PERSISTANCE =============
+
+def _chemins(dossier, request_id):
+    return os.path.join(dossier, f'{request_id}.pstats'), os.path.join(dossier, f'{request_id}.json')
+
+
+def _persister(dossier, profil_id, metadonnees, stats):
+    os.makedirs(dossier, exist_ok=True)
+    chemin_stats, chemin_meta = _chemins(dossier, profil_id)
+    with open(chemin_stats, 'wb') as f:
+        marshal.dump(stats, f)
+    with open(chemin_meta, 'w') as f:
+        json.dump(metadonnees, f)
+
+
+def _elaguer(dossier, maximum):
+    """Ne garde que les `maximum` profils les plus récents du dossier partagé"""
+    profils = []
+    for nom in os.listdir(dossier):
+        if nom.endswith('.json'):
+            try:
+                profils.append((os.path.getmtime(os.path.join(dossier, nom)), nom[:-5]))
+            except OSError:
+                continue
+    profils.sort(reverse=True)
+    for _, profil_id in profils[maximum:]:
+        for chemin in _chemins(dossier, profil_id):
+            try:
+                os.remove(chemin)
+            except OSError:
+                pass
+
+
+def charger_profil(request_id):
+    """Renvoie (métadonnées, stats) depuis la mémoire du worker ou le dossier partagé"""
+    if not _ID_VALIDE.match(request_id):
+        return None
+    profil = magasin.obtenir(request_id)
+    if profil is not None:
+        return profil
+
+    dossier = current_app.config.get('PROFILER_DIR')
+    if not dossier:
+        return None
+    chemin_stats, chemin_meta = _chemins(dossier, request_id)
+    try:
+        with open(chemin_meta) as f:
+            metadonnees = json.load(f)
+        with open(chemin_stats, 'rb') as f:
+            stats = marshal.load(f)
+    except (OSError, ValueError, EOFError):
+        return None
+    return metadonnees, stats
+
+
+def lister_profils():
+    profils = {meta['profil_id']: meta for meta in magasin.lister()}
+    dossier = current_app.config.get('PROFILER_DIR')
+    if dossier and os.path.isdir(dossier):
+        for nom in os.listdir(dossier):
+            if nom.endswith('.json') and nom[:-5] not in profils:
+                try:
+                    with open(os.path.join(dossier, nom)) as f:
+                        meta = json.load(f)
+                    profils[meta.get('profil_id', meta['request_id'])] = meta
+                except (OSError, ValueError, KeyError):
+                    continue
+    return sorted(profils.values(), key=lambda m: m['date'], reverse=True)
+
+
+# ============= HOOKS FLASK =============
+
+def _doit_profiler():
+    if request.headers.get('X-Profile') == '1' and requete_admin():
+        return True
+    taux = current_app.config.get('PROFILER_SAMPLE_RATE', 0.0)
+    return taux > 0 and random.random() < taux
+
+
+def _debut_requete():
+    if not _doit_profiler():
+        return
+    g.profil_id = identifiant_profil()
+    g.profiler_debut = time.perf_counter()
+    g.profiler = cProfile.Profile()
+    g.profiler.enable()
+
+
+def _fin_requete(response):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+    profiler.disable()
+
+    profil_id = g.pop('profil_id')
+    metadonnees = {
+        'profil_id': profil_id,
+        'request_id': identifiant_requete(),
+        'endpoint': request.endpoint,
+        'methode': request.method,
+        'chemin': request.full_path.rstrip('?'),
+        'statut': response.status_code,
+        'duree_ms': round((time.perf_counter() - g.pop('profiler_debut')) * 1000, 2),
+        'date': datetime.utcnow().isoformat()
+    }
+    stats = pstats.Stats(profiler).stats
+
+    magasin.ajouter(profil_id, metadonnees, stats)
+    dossier = current_app.config.get('PROFILER_DIR')
+    if dossier:
+        _persister(dossier, profil_id, metadonnees, stats)
+        _elaguer(dossier, current_app.config.get('PROFILER_DIR_MAX_PROFILES', 200))
+
+    response.headers['X-Profile-Id'] = profil_id
+    return response
+
+
+def _nettoyage(exc):
+    # Requête interrompue avant after_request : ne pas laisser le profileur actif
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+
+
+def init_profiler(app):
+    """Brancher le profilage à la demande (en-tête X-Profile ou échantillonnage)"""
+    magasin.capacite = app.config.get('PROFILER_MAX_PROFILES', 50)
+    app.before_request(_debut_requete)
+    app.after_request(_fin_requete)
+    app.teardown_request(_nettoyage)
@@ -0,0 +1,171 @@
+import glob
+import os
+import sys
+import threading
+import time
+from flask import current_app, request
+
+DEBORDEMENT = '[piles supplémentaires tronquées]'
+
+
+class EchantillonneurPiles(threading.Thread):
+    """Thread d'arrière-plan qui échantillonne les piles des threads de requête.
+
+    Les piles sont agrégées en comptes repliés (format flame graph) avec un nombre
+    borné de piles distinctes ; au-delà, les échantillons sont comptés à part.
+    """
+
+    def __init__(self, intervalle=0.01, max_piles=10000, profondeur_max=128,
+                 dossier=None, rotation=300, max_fichiers=24):
+        super().__init__(name='echantillonneur-piles', daemon=True)
+        self.intervalle = intervalle
+        self.max_piles = max_piles
+        self.profondeur_max = profondeur_max
+        self.dossier = dossier
+        self.rotation = rotation
+        self.max_fichiers = max_fichiers
+
+        self._verrou = threading.Lock()
+        self._arret = threading.Event()
+        self._threads_requetes = {}
+        self._noms = {}
+        self._comptes = {}
+        self.echantillons = 0
+        self.temps_echantillonnage = 0.0
+        self.debut = time.monotonic()
+        self._derniere_rotation = self.debut
+
+    # ----- suivi des threads de requête -----
+
+    def entrer(self, endpoint):
+        self._threads_requetes[threading.get_ident()] = endpoint or 'inconnu'
+
+    def sortir(self):
+        self._threads_requetes.pop(threading.get_ident(), None)
+
+    # ----- échantillonnage -----
+
+    def _nom(self, code):
+        nom = self._noms.get(code)
+        if nom is None:
+            nom = self._noms[code] = f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+        return nom
+
+    def _pile(self, frame):
+        noms = []
+        while frame is not None and len(noms) < self.profondeur_max:
+            noms.append(self._nom(frame.f_code))
+            frame = frame.f_back
+        noms.reverse()
+        return ';'.join(noms)
+
+    def echantillonner(self):
+        debut = time.perf_counter()
+        frames = sys._current_frames()
+        piles = []
+        for ident, endpoint in list(self._threads_requetes.items()):
+            frame = frames.get(ident)
+            if frame is not None:
+                piles.append(f'{endpoint};{self._pile(frame)}')
+
+        with self._verrou:
+            for pile in piles:
+                if pile not in self._comptes and len(self._comptes) >= self.max_piles:
+                    pile = DEBORDEMENT
+                self._comptes[pile] = self._comptes.get(pile, 0) + 1
+            self.echantillons += len(piles)
+        self.temps_echantillonnage += time.perf_counter() - debut
+
+    def run(self):
+        while not self._arret.wait(self.intervalle):
+            self.echantillonner()
+            if self.dossier and time.monotonic() - self._derniere_rotation >= self.rotation:
+                self.pivoter()
+
+    def arreter(self):
+        self._arret.set()
+
+    # ----- exposition -----
+
+    def replie(self):
+        with self._verrou:
+            comptes = dict(self._comptes)
+        return ''.join(f'{pile} {nombre}\n' for pile, nombre in sorted(comptes.items(), key=lambda x: -x[1]))
+
+    def statistiques(self):
+        ecoule = time.monotonic() - self.debut
+        return {
+            'pid': os.getpid(),
+            'intervalle_ms': self.intervalle * 1000,
+            'echantillons': self.echantillons,
+            'piles_distinctes': len(self._comptes),
+            'threads_requetes_actifs': len(self._threads_requetes),
+            'duree_observation_s': round(ecoule, 1),
+            'surcout_pourcent': round(self.temps_echantillonnage / ecoule * 100, 3) if ecoule > 0 else 0.0
+        }
+
+    def pivoter(self):
+        """Écrit les comptes courants dans un fichier .folded puis les remet à zéro"""
+        with self._verrou:
+            comptes, self._comptes = self._comptes, {}
+        self._derniere_rotation = time.monotonic()
+        if not comptes or not self.dossier:
+            return None
+
+        os.makedirs(self.dossier, exist_ok=True)
+        chemin = os.path.join(self.dossier, f'piles_{os.getpid()}_{int(time.time())}.folded')
+        with open(chemin, 'w') as f:
+            for pile, nombre in comptes.items():
+                f.write(f'{pile} {nombre}\n')
+
+        anciens = sorted(glob.glob(os.path.join(self.dossier, f'piles_{os.getpid()}_*.folded')))
+        for ancien in anciens[:-self.max_fichiers]:
+            os.remove(ancien)
+        return chemin
+
+
+# Un échantillonneur par processus worker (recréé après un fork)
+_etat = {'pid': None, 'echantillonneur': None}
+_verrou_demarrage = threading.Lock()
+
+
+def echantillonneur_courant():
+    if _etat['pid'] != os.getpid():
+        return None
+    return _etat['echantillonneur']
+
+
+def _demarrer(config):
+    with _verrou_demarrage:
+        if _etat['pid'] == os.getpid():
+            return _etat['echantillonneur']
+        echantillonneur = EchantillonneurPiles(
+            intervalle=config.get('SAMPLER_INTERVAL_MS', 10) / 1000,
+            max_piles=config.get('SAMPLER_MAX_STACKS', 10000),
+            dossier=config.get('SAMPLER_DIR'),
+            rotation=config.get('SAMPLER_ROTATE_SECONDS', 300),
+            max_fichiers=config.get('SAMPLER_MAX_FILES', 24)
+        )
+        echantillonneur.start()
+        _etat.update(pid=os.getpid(), echantillonneur=echantillonneur)
+        return echantillonneur
+
+
+def _debut_requete():
+    # Démarrage paresseux : le thread ne survit pas au fork des workers gunicorn
+    echantillonneur = echantillonneur_courant() or _demarrer(current_app.config)
+    echantillonneur.entrer(request.endpoint)
+
+
+def _fin_requete(exc):
+    echantillonneur = echantillonneur_courant()
+    if echantillonneur is not None:
+        echantillonneur.sortir()
+
+
+def init_sampler(app):
+    """Brancher l'échantillonneur de piles continu (SAMPLER_ENABLED)"""
+    if not app.config.get('SAMPLER_ENABLED'):
+        return
+    app.before_request(_debut_requete)
+    app.teardown_request(_fin_requete)
@@ -0,0 +1,102 @@
+import logging
+import time
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from app.db.db import db
+
+logger = logging.getLogger('app.sql')
+
+
+class BudgetRequetesDepasse(AssertionError):
+    """Levée en mode test quand une requête HTTP dépasse le budget de requêtes SQL"""
+
+
+class StatistiquesSQL:
+    """Compteurs SQL d'une requête HTTP"""
+    __slots__ = ('requetes', 'duree')
+
+    def __init__(self):
+        self.requetes = 0
+        self.duree = 0.0
+
+    def enregistrer(self, duree):
+        self.requetes += 1
+        self.duree += duree
+
+
+def statistiques_courantes():
+    """Renvoie les statistiques SQL de la requête en cours (ou None hors requête)"""
+    if not has_app_context():
+        return None
+    return g.get('sql_stats')
+
+
+def _avant_execution(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('sql_debuts', []).append(time.perf_counter())
+
+
+def _apres_execution(conn, cursor, statement, parameters, context, executemany):
+    debuts = conn.info.get('sql_debuts')
+    if not debuts:
+        return
+    duree = time.perf_counter() - debuts.pop()
+
+    stats = statistiques_courantes()
+    if stats is not None:
+        stats.enregistrer(duree)
+
+    if not has_app_context():
+        return
+    seuil_ms = current_app.config.get('SQL_SLOW_QUERY_MS')
+    if seuil_ms is not None and duree * 1000 >= seuil_ms:
+        logger.warning(
+            "Requête SQL lente (%.1f ms) sur %s : %s | paramètres=%r",
+            duree * 1000,
+            request.endpoint if has_request_context() else None,
+            statement,
+            parameters
+        )
+
+
+def _erreur_execution(exception_context):
+    # Une requête en échec ne passe pas par after_cursor_execute
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('sql_debuts'):
+        conn.info['sql_debuts'].pop()
+
+
+def _debut_requete():
+    g.sql_stats = StatistiquesSQL()
+
+
+def _fin_requete(response):
+    stats = g.pop('sql_stats', None)
+    if stats is None:
+        return response
+
+    if current_app.config.get('APP_ENV') != 'production':
+        response.headers['X-DB-Queries'] = str(stats.requetes)
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={stats.duree * 1000:.2f};desc="{stats.requetes} queries"'
+        )
+
+    budget = current_app.config.get('SQL_QUERY_BUDGET')
+    if current_app.testing and budget is not None and stats.requetes > budget:
+        raise BudgetRequetesDepasse(
+            f"{request.endpoint} a exécuté {stats.requetes} requêtes SQL (budget: {budget})"
+        )
+
+    return response
+
+
+def init_sql_stats(app):
+    """Brancher le compteur de requêtes SQL sur les moteurs et le cycle de requête"""
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _avant_execution)
+            event.listen(engine, 'after_cursor_execute', _apres_execution)
+            event.listen(engine, 'handle_error', _erreur_execution)
+
+    app.before_request(_debut_requete)
+    app.after_request(_fin_requete)
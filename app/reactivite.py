@@ -0,0 +1,320 @@
+import threading
+import time
+import numpy as np
+from flask import current_app
+from app.db.db import db
+from sqlalchemy import select, union_all
+from app.index_memoire import lire_lignes, paires_distinctes
+from app.model import Aliment, Allergie, AllergieUtilisateur, ReactiviteCroisee
+from app.monitoring.metrics import DESCRIPTIONS, registre
+from app.signals import catalogue_modifie
+
+DESCRIPTIONS.update({
+    'cross_reactivity_allergens': ('gauge', 'Allergies (sommets) du graphe de réactivité croisée'),
+    'cross_reactivity_edges': ('gauge', 'Arêtes entre allergies du graphe de réactivité croisée'),
+    'cross_reactivity_linked': ('gauge', 'Allergies dont la fermeture dépasse la seule allergie'),
+    'cross_reactivity_rebuilds_total': ('counter', 'Rechargements du graphe de réactivité croisée'),
+})
+
+# Délai minimal entre deux rechargements provoqués par une allergie inconnue du graphe
+_DELAI_INCONNUES = 1.0
+
+
+def _bits(masque):
+    """Rangs des bits à 1 d'un masque, du plus faible au plus fort"""
+    while masque:
+        bas = masque & -masque
+        yield bas.bit_length() - 1
+        masque ^= bas
+
+
+class GrapheReactivite:
+    """Graphe de réactivité croisée avec sa fermeture transitive précalculée.
+
+    Chaque allergie a un bit (rang dans l'ordre alphabétique des noms). La
+    fermeture d'une allergie est le masque des allergies atteignables par les
+    arêtes (Warshall sur des lignes en entiers Python, restreint aux sommets
+    reliés) ; chaque aliment a le masque des allergies qu'il porte (nom identique
+    ou arête allergie → aliment). Un aliment est à risque pour un profil quand son
+    masque croise la fermeture du profil : un ET binaire, sans parcours du graphe.
+    Les aliments à risque par allergie sont aussi rangés à plat (CSR) pour
+    développer des paires (utilisateur, aliment) en masse.
+    """
+
+    def __init__(self, allergies, porteurs, aretes):
+        allergies = sorted(allergies, key=lambda ligne: ligne[1])
+        self.noms = [nom for _, nom in allergies]
+        self.rangs = {allergie_id: rang for rang, (allergie_id, _) in enumerate(allergies)}
+        self._par_nom = {nom.lower(): allergie_id for allergie_id, nom in allergies}
+        n = len(allergies)
+
+        # Lignes de la fermeture, seulement pour les sommets qui ont des successeurs
+        fermeture, nb_aretes = {}, 0
+        for source, cible, bidirectionnelle in aretes:
+            s, c = self.rangs.get(source), self.rangs.get(cible)
+            if s is None or c is None or s == c:
+                continue
+            nb_aretes += 1
+            fermeture[s] = fermeture.get(s, 1 << s) | 1 << c
+            if bidirectionnelle:
+                fermeture[c] = fermeture.get(c, 1 << c) | 1 << s
+        for k in list(fermeture):
+            ligne, bit = fermeture[k], 1 << k
+            for i in fermeture:
+                if fermeture[i] & bit:
+                    fermeture[i] |= ligne
+        self._fermeture = fermeture
+        self.aretes = nb_aretes
+
+        # Allergies portées par chaque aliment
+        self.plats = {}
+        par_rang = [[] for _ in range(n)]
+        for aliment_id, allergie_id in porteurs:
+            rang = self.rangs.get(allergie_id)
+            if rang is not None:
+                self.plats[aliment_id] = self.plats.get(aliment_id, 0) | 1 << rang
+                par_rang[rang].append(aliment_id)
+
+        # Aliments à risque de chaque allergie (fermeture comprise), à plat
+        listes = []
+        for rang in range(n):
+            atteints = _bits(fermeture[rang]) if rang in fermeture else (rang,)
+            listes.append(np.unique(np.array([a for r in atteints for a in par_rang[r]], dtype=np.int64)))
+        self._longueurs = np.array([len(liste) for liste in listes], dtype=np.int64)
+        self._debuts = np.concatenate(([0], np.cumsum(self._longueurs)[:-1])).astype(np.int64) if n else self._longueurs
+        self._cibles = np.concatenate(listes) if n else np.empty(0, dtype=np.int64)
+        # Rang par id d'allergie, pour les recherches vectorisées
+        self._ids = np.array(sorted(self.rangs), dtype=np.int64)
+        self._rang_par_id = np.array([self.rangs[i] for i in self._ids.tolist()], dtype=np.int64)
+
+    def connait(self, allergies):
+        return all(allergie_id in self.rangs for allergie_id in allergies)
+
+    def retrouver(self, noms):
+        """(ids, noms inconnus) d'allergies nommées, sans tenir compte de la casse"""
+        ids, inconnus = [], []
+        for nom in noms:
+            allergie_id = self._par_nom.get(nom.strip().lower())
+            if allergie_id is None:
+                inconnus.append(nom)
+            else:
+                ids.append(allergie_id)
+        return ids, inconnus
+
+    def masque(self, allergies):
+        """Masque des allergies (ids) elles-mêmes ; celles absentes du graphe sont ignorées"""
+        masque = 0
+        for allergie_id in allergies:
+            rang = self.rangs.get(allergie_id)
+            if rang is not None:
+                masque |= 1 << rang
+        return masque
+
+    def etendre(self, masque):
+        """Fermeture transitive d'un masque : OU des lignes précalculées de ses bits"""
+        fermeture = self._fermeture
+        etendu = masque
+        for rang in _bits(masque):
+            etendu |= fermeture.get(rang, 0)
+        return etendu
+
+    def masque_etendu(self, allergies):
+        return self.etendre(self.masque(allergies))
+
+    def allergenes(self, aliment_id):
+        """Masque des allergies portées par un aliment (0 s'il n'en porte aucune)"""
+        return self.plats.get(aliment_id, 0)
+
+    def decoder(self, masque):
+        return [self.noms[rang] for rang in _bits(masque)]
+
+    def aliments_a_risque(self, allergies):
+        """Tableau trié des aliments à éviter pour ces allergies, réactivité croisée comprise"""
+        rangs = [self.rangs[a] for a in allergies if a in self.rangs]
+        if not rangs:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate([
+            self._cibles[self._debuts[rang]:self._debuts[rang] + self._longueurs[rang]] for rang in rangs
+        ]))
+
+    def paires(self, lignes):
+        """Paires (utilisateur, aliment) à éviter, développées depuis un tableau (N, 2) (utilisateur, allergie)"""
+        if not len(lignes) or not len(self._ids):
+            return np.empty((0, 2), dtype=np.int64)
+        positions = np.searchsorted(self._ids, lignes[:, 1]).clip(max=len(self._ids) - 1)
+        connues = self._ids[positions] == lignes[:, 1]
+        rangs = self._rang_par_id[positions[connues]]
+        nombres = self._longueurs[rangs]
+        total = int(nombres.sum())
+        decalages = np.arange(total, dtype=np.int64) - np.repeat(np.cumsum(nombres) - nombres, nombres)
+        aliments = self._cibles[np.repeat(self._debuts[rangs], nombres) + decalages]
+        utilisateurs = np.repeat(lignes[connues, 0], nombres)
+        return paires_distinctes(np.column_stack((utilisateurs, aliments)))
+
+    def fermeture(self, allergie_id):
+        """(noms des allergies liées, aliments à risque) d'une allergie ; None si elle est inconnue"""
+        rang = self.rangs.get(allergie_id)
+        if rang is None:
+            return None
+        liees = self._fermeture.get(rang, 0) & ~(1 << rang)
+        return self.decoder(liees), self.aliments_a_risque([allergie_id]).tolist()
+
+    def statistiques(self):
+        return {
+            'allergies': len(self.noms),
+            'aretes': self.aretes,
+            'allergies_reliees': len(self._fermeture),
+            'aliments_porteurs': len(self.plats),
+            'paires_a_risque': int(self._longueurs.sum()),
+        }
+
+
+def lire_porteurs(aliments=None):
+    """Lignes (aliment, allergie portée), pour tous les aliments ou ceux de la liste"""
+    # Règle historique : l'aliment du même nom que l'allergie la porte
+    par_nom = select(Aliment.id, Allergie.id).join(Allergie, Allergie.nom == Aliment.nom)
+    par_arete = select(ReactiviteCroisee.aliment_id, ReactiviteCroisee.allergie_id).where(
+        ReactiviteCroisee.aliment_id.isnot(None)
+    )
+    if aliments is not None:
+        par_nom = par_nom.where(Aliment.id.in_(aliments))
+        par_arete = par_arete.where(ReactiviteCroisee.aliment_id.in_(aliments))
+    return lire_lignes(union_all(par_nom, par_arete))
+
+
+def charger_graphe():
+    """Graphe complet lu en trois requêtes (allergies, porteurs, arêtes entre allergies)"""
+    allergies = lire_lignes(select(Allergie.id, Allergie.nom))
+    porteurs = lire_porteurs()
+    aretes = lire_lignes(
+        select(ReactiviteCroisee.allergie_id, ReactiviteCroisee.allergie_liee_id,
+               ReactiviteCroisee.bidirectionnelle)
+        .where(ReactiviteCroisee.allergie_liee_id.isnot(None))
+    )
+    return GrapheReactivite(allergies, porteurs, aretes)
+
+
+class Reactivite:
+    """Graphe courant du worker, rechargé après une modification signalée, à la
+    rencontre d'une allergie qu'il ne connaît pas, ou au plus tard tous les
+    `intervalle` secondes pour les écritures des autres processus (0 = jamais).
+
+    Une écriture de ce worker ou une allergie inconnue rechargent sur place : la
+    lecture suivante voit le graphe modifié. Seul le rafraîchissement à l'échéance
+    a lieu en arrière-plan, les lectures gardant l'ancienne version en attendant.
+    """
+
+    def __init__(self, app, intervalle=60):
+        self.app = app
+        self.intervalle = intervalle
+        self._graphe = None
+        self._charge_a = None
+        self._perime = False
+        self._rechargement = None
+        self._verrou = threading.Lock()
+
+    def graphe(self, allergies=(), attendre=False):
+        """Graphe à jour (dans un contexte d'application) ; `allergies` : ids qu'il doit connaître,
+        `attendre` : recharger sur place aussi à l'échéance"""
+        graphe = self._graphe
+        if graphe is None or self._perime:
+            return self._recharger(graphe)
+        age = time.monotonic() - self._charge_a
+        if age >= _DELAI_INCONNUES and not graphe.connait(allergies):
+            return self._recharger(graphe)
+        if not self.intervalle or age < self.intervalle:
+            return graphe
+        if attendre:
+            return self._recharger(graphe)
+        with self._verrou:
+            if self._rechargement is None:
+                self._rechargement = fil = threading.Thread(target=self._recharger_en_fond, args=(graphe,),
+                                                            daemon=True, name='reactivite')
+                fil.start()
+        return graphe
+
+    def invalider(self):
+        self._perime = True
+
+    def statistiques(self):
+        graphe = self._graphe
+        return {
+            **(graphe.statistiques() if graphe is not None else {'charge': False}),
+            'perime': self._perime,
+            'age_s': round(time.monotonic() - self._charge_a, 1) if self._charge_a is not None else None,
+        }
+
+    def _recharger(self, graphe):
+        with self._verrou:
+            # Un autre thread a pu recharger pendant l'attente du verrou ; s'il a lu la base
+            # avant une écriture signalée depuis, le graphe est encore à recharger
+            if self._graphe is graphe or self._perime:
+                perime_avant, self._perime = self._perime, False
+                try:
+                    self._graphe = charger_graphe()
+                except Exception:
+                    # Échec : l'ancienne version reste en place, avec son état périmé
+                    self._perime = self._perime or perime_avant
+                    raise
+                self._charge_a = time.monotonic()
+                self._publier()
+            return self._graphe
+
+    def _recharger_en_fond(self, graphe):
+        try:
+            with self.app.app_context():
+                try:
+                    self._recharger(graphe)
+                finally:
+                    db.session.remove()
+        except Exception as e:
+            self.app.logger.warning('Rechargement du graphe de réactivité croisée impossible : %s', e)
+        finally:
+            self._rechargement = None
+
+    def _publier(self):
+        statistiques = self._graphe.statistiques()
+        registre.incrementer('cross_reactivity_rebuilds_total')
+        registre.definir('cross_reactivity_allergens', statistiques['allergies'])
+        registre.definir('cross_reactivity_edges', statistiques['aretes'])
+        registre.definir('cross_reactivity_linked', statistiques['allergies_reliees'])
+
+
+def reactivite_courante():
+    """Détenteur du graphe du worker courant (créé à la demande hors init_reactivite)"""
+    reactivite = current_app.extensions.get('reactivite')
+    if reactivite is None:
+        reactivite = current_app.extensions.setdefault('reactivite', Reactivite(current_app._get_current_object()))
+    return reactivite
+
+
+def graphe_courant(allergies=(), attendre=False):
+    """Graphe de réactivité croisée à jour ; `allergies` : ids qu'il doit connaître,
+    `attendre` : à l'échéance, recharger sur place plutôt que servir l'ancienne version"""
+    return reactivite_courante().graphe(allergies, attendre)
+
+
+def paires_confirmees(utilisateurs=None):
+    """Paires (utilisateur, aliment) des allergies confirmées, réactivité croisée comprise.
+
+    Une reconstruction complète attend le graphe rafraîchi à l'échéance ; le
+    rechargement de quelques utilisateurs se contente du graphe servi.
+    """
+    requete = select(AllergieUtilisateur.utilisateur_id, AllergieUtilisateur.allergie_id)
+    if utilisateurs is not None:
+        requete = requete.where(AllergieUtilisateur.utilisateur_id.in_(utilisateurs))
+    lignes = np.array(lire_lignes(requete), dtype=np.int64).reshape(-1, 2)
+    return graphe_courant(np.unique(lignes[:, 1]).tolist(), attendre=utilisateurs is None).paires(lignes)
+
+
+def _catalogue_modifie(app, entite=None, **_):
+    # Sommets (allergies), arêtes ou aliments porteurs (par leur nom) modifiés
+    reactivite = app.extensions.get('reactivite')
+    if reactivite is not None and entite in ('allergies', 'reactivites_croisees', 'aliments'):
+        reactivite.invalider()
+
+
+def init_reactivite(app):
+    """Créer le détenteur du graphe du worker ; il se charge à la première vérification"""
+    app.extensions['reactivite'] = Reactivite(app, app.config.get('CROSS_REACTIVITY_REFRESH_SECONDS', 60))
+    catalogue_modifie.connect(_catalogue_modifie, sender=app, weak=False)
@@ -0,0 +1,258 @@
+import marshal
+from flask import Response, current_app, request
+from flask_restx import Namespace, Resource
+from app.comptoir import comptoir_courant
+from app.filtre_bloom import filtre_courant
+from app.index_allergies import index_courant
+from app.monitoring.acces import requete_admin
+from app.monitoring.profiler import charger_profil, format_replie, format_texte, lister_profils
+from app.monitoring.sampler import echantillonneur_courant
+from app.monitoring.memory import suivi, compter_instances_orm
+from app.reactivite import reactivite_courante
+
+# Namespace Swagger pour les outils d'administration (jeton X-Admin-Token requis)
+admin_ns = Namespace(
+    "admin",
+    description="🛠️ Outils d'administration et de diagnostic des performances",
+    path='/admin'
+)
+
+
+def verifier_admin():
+    """Interrompt la requête si le jeton d'administration est absent ou invalide"""
+    if not requete_admin():
+        admin_ns.abort(403, "Accès administrateur requis (en-tête X-Admin-Token)")
+
+
+# ============= PROFILAGE À LA DEMANDE =============
+
+@admin_ns.route('/profils')
+class ProfilsList(Resource):
+    @admin_ns.doc('liste_profils')
+    def get(self):
+        """📋 Liste des requêtes profilées (les plus récentes d'abord)"""
+        verifier_admin()
+        profils = lister_profils()
+        return {'total': len(profils), 'profils': profils}, 200
+
+
+@admin_ns.route('/profils/<string:request_id>')
+@admin_ns.param('request_id', 'Identifiant de la requête (en-tête X-Profile-Id)')
+@admin_ns.param('format', 'texte (défaut), collapsed (flame graph) ou pstats (binaire)', _in='query')
+class ProfilDetail(Resource):
+    @admin_ns.doc('obtenir_profil')
+    def get(self, request_id):
+        """🔥 Profil cProfile d'une requête, prêt pour un rendu flame graph"""
+        verifier_admin()
+        profil = charger_profil(request_id)
+        if profil is None:
+            admin_ns.abort(404, f"Aucun profil pour la requête {request_id}")
+
+        metadonnees, stats = profil
+        format_demande = request.args.get('format', 'texte')
+
+        if format_demande == 'collapsed':
+            return Response(format_replie(stats), mimetype='text/plain')
+        if format_demande == 'pstats':
+            return Response(
+                marshal.dumps(stats),
+                mimetype='application/octet-stream',
+                headers={'Content-Disposition': f'attachment; filename={request_id}.pstats'}
+            )
+        if format_demande == 'texte':
+            return {'profil': metadonnees, 'rapport': format_texte(stats)}, 200
+
+        admin_ns.abort(400, "Format inconnu : texte, collapsed ou pstats")
+
+
+# ============= ÉCHANTILLONNEUR CONTINU =============
+
+def _echantillonneur_actif():
+    echantillonneur = echantillonneur_courant()
+    if echantillonneur is None:
+        admin_ns.abort(404, "Échantillonneur inactif dans ce worker (SAMPLER_ENABLED)")
+    return echantillonneur
+
+
+@admin_ns.route('/echantillonneur')
+class EchantillonneurStatut(Resource):
+    @admin_ns.doc('statut_echantillonneur')
+    def get(self):
+        """📈 Statut et surcoût de l'échantillonneur de piles du worker"""
+        verifier_admin()
+        return _echantillonneur_actif().statistiques(), 200
+
+
+@admin_ns.route('/echantillonneur/piles')
+class EchantillonneurPilesRepliees(Resource):
+    @admin_ns.doc('piles_echantillonneur')
+    def get(self):
+        """🔥 Piles repliées agrégées depuis la dernière rotation (format flame graph)"""
+        verifier_admin()
+        return Response(_echantillonneur_actif().replie(), mimetype='text/plain')
+
+
+@admin_ns.route('/echantillonneur/rotation')
+class EchantillonneurRotation(Resource):
+    @admin_ns.doc('rotation_echantillonneur')
+    def post(self):
+        """🔄 Écrit les piles courantes sur disque et remet les compteurs à zéro"""
+        verifier_admin()
+        chemin = _echantillonneur_actif().pivoter()
+        return {'fichier': chemin, 'message': 'Rotation effectuée'}, 200
+
+
+# ============= SUIVI MÉMOIRE (TRACEMALLOC) =============
+
+@admin_ns.route('/memoire')
+@admin_ns.param('base', 'Instantané de référence : premier (défaut) ou precedent', _in='query')
+@admin_ns.param('cle', 'Regroupement : lineno (défaut), filename ou traceback', _in='query')
+@admin_ns.param('limite', 'Nombre de sites renvoyés (défaut 20)', _in='query')
+@admin_ns.param('objets', '1 pour compter les instances ORM vivantes', _in='query')
+class MemoireRapport(Resource):
+    @admin_ns.doc('rapport_memoire')
+    def get(self):
+        """🧠 Plus fortes croissances mémoire par site d'allocation dans ce worker"""
+        verifier_admin()
+        cle = request.args.get('cle', 'lineno')
+        if cle not in ('lineno', 'filename', 'traceback'):
+            admin_ns.abort(400, "Clé inconnue : lineno, filename ou traceback")
+
+        rapport = suivi.statut()
+        rapport['comparaison'] = suivi.comparer(
+            base='precedent' if request.args.get('base') == 'precedent' else 'premier',
+            cle=cle,
+            limite=request.args.get('limite', 20, type=int)
+        )
+        if request.args.get('objets') == '1':
+            rapport['instances_orm'] = compter_instances_orm()
+        return rapport, 200
+
+
+@admin_ns.route('/memoire/demarrer')
+class MemoireDemarrer(Resource):
+    @admin_ns.doc('demarrer_suivi_memoire')
+    def post(self):
+        """▶️ Active tracemalloc et les instantanés périodiques"""
+        verifier_admin()
+        data = request.get_json(silent=True) or {}
+        suivi.demarrer(
+            nframes=data.get('nframes', 10),
+            intervalle=data.get('intervalle', current_app.config.get('MEMORY_SNAPSHOT_INTERVAL', 60)),
+            max_instantanes=current_app.config.get('MEMORY_MAX_SNAPSHOTS', 10)
+        )
+        return suivi.statut(), 200
+
+
+@admin_ns.route('/memoire/instantane')
+class MemoireInstantane(Resource):
+    @admin_ns.doc('instantane_memoire')
+    def post(self):
+        """📸 Prend immédiatement un instantané"""
+        verifier_admin()
+        if not suivi.actif:
+            admin_ns.abort(409, "Suivi mémoire inactif : appelez d'abord /admin/memoire/demarrer")
+        suivi.prendre_instantane()
+        return suivi.statut(), 200
+
+
+@admin_ns.route('/memoire/arreter')
+class MemoireArreter(Resource):
+    @admin_ns.doc('arreter_suivi_memoire')
+    def post(self):
+        """⏹️ Désactive tracemalloc et libère les instantanés"""
+        verifier_admin()
+        suivi.arreter()
+        return suivi.statut(), 200
+
+
+# ============= INDEX EN MÉMOIRE =============
+
+def _index_actif():
+    index = index_courant()
+    if index is None:
+        admin_ns.abort(409, "Index des allergies désactivé (ALLERGY_INDEX_ENABLED=false)")
+    return index
+
+
+@admin_ns.route('/index-allergies')
+class IndexAllergiesStatut(Resource):
+    @admin_ns.doc('statut_index_allergies')
+    def get(self):
+        """🗂️ Taille et fraîcheur de l'index des allergies du worker"""
+        verifier_admin()
+        return _index_actif().statistiques(), 200
+
+
+@admin_ns.route('/index-allergies/reconstruction')
+class IndexAllergiesReconstruction(Resource):
+    @admin_ns.doc('reconstruire_index_allergies')
+    def post(self):
+        """🔄 Reconstruit immédiatement l'index des allergies du worker"""
+        verifier_admin()
+        index = _index_actif()
+        index.reconstruire()
+        return index.statistiques(), 200
+
+
+def _filtre_actif():
+    filtre = filtre_courant()
+    if filtre is None:
+        admin_ns.abort(409, "Filtre de Bloom désactivé (ALLERGY_BLOOM_ENABLED=false)")
+    return filtre
+
+
+@admin_ns.route('/filtre-bloom')
+class FiltreBloomStatut(Resource):
+    @admin_ns.doc('statut_filtre_bloom')
+    def get(self):
+        """🌸 Remplissage et taux de faux positifs estimé du filtre de Bloom du worker"""
+        verifier_admin()
+        return _filtre_actif().statistiques(), 200
+
+
+@admin_ns.route('/filtre-bloom/reconstruction')
+class FiltreBloomReconstruction(Resource):
+    @admin_ns.doc('reconstruire_filtre_bloom')
+    def post(self):
+        """🔄 Reconstruit immédiatement le filtre de Bloom du worker"""
+        verifier_admin()
+        filtre = _filtre_actif()
+        filtre.reconstruire()
+        return filtre.statistiques(), 200
+
+
+def _comptoir_actif():
+    comptoir = comptoir_courant()
+    if comptoir is None:
+        admin_ns.abort(409, "Comptoir désactivé (COUNTER_ENABLED=false)")
+    return comptoir
+
+
+@admin_ns.route('/comptoir')
+class ComptoirStatut(Resource):
+    @admin_ns.doc('statut_comptoir')
+    def get(self):
+        """🍱 Profils, allergènes et plats chargés pour le comptoir du worker"""
+        verifier_admin()
+        return _comptoir_actif().statistiques(), 200
+
+
+@admin_ns.route('/comptoir/reconstruction')
+class ComptoirReconstruction(Resource):
+    @admin_ns.doc('reconstruire_comptoir')
+    def post(self):
+        """🔄 Recharge immédiatement la structure du comptoir du worker"""
+        verifier_admin()
+        comptoir = _comptoir_actif()
+        comptoir.reconstruire()
+        return comptoir.statistiques(), 200
+
+
+@admin_ns.route('/reactivite')
+class ReactiviteStatut(Resource):
+    @admin_ns.doc('statut_reactivite')
+    def get(self):
+        """🦐 Graphe de réactivité croisée chargé par le worker (allergies, arêtes, paires à risque)"""
+        verifier_admin()
+        return reactivite_courante().statistiques(), 200
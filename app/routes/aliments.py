@@ -1,8 +1,12 @@
+import csv
+import io
 from flask import Blueprint, request, jsonify
 from flask_restx import Namespace, Resource
 from app.db.db import db
 from app.model import Aliment
 from app.model import create_swagger_models
+from app.db.transactions import lecture_seule
+from app.db.bulk import ConflitMasse, OperationMasseInvalide, mettre_a_jour_en_masse, supprimer_en_masse
 
 # Blueprint Flask existant (garde la compatibilité)
 aliments_bp = Blueprint('aliments', __name__)
@@ -15,6 +19,11 @@ aliments_ns = Namespace('aliments',
 # Créer les modèles Swagger
 models = create_swagger_models(aliments_ns)
 
+# Opérations en masse : colonnes modifiables et filtres acceptés
+CHAMPS_MODIFIABLES = ('nom', 'description', 'calories', 'proteines', 'lipides', 'glucides', 'fibres',
+                      'type_aliment', 'seuil_allergie', 'categorie_id')
+FILTRES_MASSE = ('nom', 'type_aliment', 'categorie_id')
+
 # ============= ROUTES SWAGGER API (NOUVELLES) =============
 
 @aliments_ns.route('/')
@@ -25,6 +34,7 @@ class AlimentsList(Resource):
                         500: 'Erreur serveur'
                     })
     @aliments_ns.marshal_list_with(models['aliment'])
+    @lecture_seule
     def get(self):
         """📋 Récupérer la liste de tous les aliments
         
@@ -77,11 +87,98 @@ class AlimentsList(Resource):
             db.session.rollback()
             aliments_ns.abort(500, f"Erreur lors de la création: {str(e)}")
 
+@aliments_ns.route('/import')
+class AlimentsImport(Resource):
+    @aliments_ns.doc('importer_aliments',
+                    params={
+                        'separateur': 'Séparateur CSV (détecté si absent)',
+                        'encodage': 'Encodage du fichier (défaut utf-8-sig)',
+                        'lot': 'Lignes par lot INSERT/UPDATE (défaut 1000)',
+                        'mise_a_jour': 'Mettre à jour les aliments déjà présents (défaut true)'
+                    },
+                    responses={
+                        200: 'Import terminé, rapport renvoyé',
+                        400: 'Fichier CSV invalide',
+                        500: 'Erreur serveur'
+                    })
+    def post(self):
+        """📥 Importer en masse des aliments depuis un CSV
+
+        Accepte un corps text/csv ou un fichier multipart `fichier`. Le CSV est lu
+        en flux, dédupliqué par nom normalisé et écrit par lots.
+        """
+        from app.db.import_csv import importer_aliments
+
+        fichier = request.files.get('fichier')
+        binaire = fichier.stream if fichier else request.stream
+        flux = io.TextIOWrapper(binaire, encoding=request.args.get('encodage', 'utf-8-sig'), newline='')
+        try:
+            rapport = importer_aliments(
+                flux,
+                taille_lot=request.args.get('lot', 1000, type=int),
+                separateur=request.args.get('separateur'),
+                mise_a_jour=request.args.get('mise_a_jour', 'true').lower() != 'false'
+            )
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            aliments_ns.abort(400, f"CSV invalide: {str(e)}")
+        except Exception as e:
+            aliments_ns.abort(500, f"Erreur lors de l'import: {str(e)}")
+        return rapport, 200
+
+@aliments_ns.route('/masse')
+class AlimentsMasse(Resource):
+    @aliments_ns.doc('modifier_aliments_masse',
+                    responses={
+                        200: 'Lignes modifiées',
+                        400: 'Requête invalide',
+                        409: 'Nom déjà utilisé ou contrainte violée',
+                        500: 'Erreur serveur'
+                    })
+    @aliments_ns.expect(models['operation_masse'])
+    @aliments_ns.marshal_with(models['resultat_masse'])
+    def patch(self):
+        """✏️ Modifier en masse des aliments
+
+        Un seul UPDATE ensembliste sur les `ids` et/ou le `filtre` fournis.
+        """
+        try:
+            return mettre_a_jour_en_masse(Aliment, request.get_json() or {}, CHAMPS_MODIFIABLES, FILTRES_MASSE), 200
+        except OperationMasseInvalide as e:
+            aliments_ns.abort(400, str(e))
+        except ConflitMasse as e:
+            aliments_ns.abort(409, str(e))
+        except Exception as e:
+            aliments_ns.abort(500, f"Erreur lors de la modification en masse: {str(e)}")
+
+    @aliments_ns.doc('supprimer_aliments_masse',
+                    responses={
+                        200: 'Lignes supprimées',
+                        400: 'Requête invalide',
+                        409: 'Lignes encore référencées',
+                        500: 'Erreur serveur'
+                    })
+    @aliments_ns.expect(models['operation_masse'])
+    @aliments_ns.marshal_with(models['resultat_masse'])
+    def delete(self):
+        """🗑️ Supprimer en masse des aliments
+
+        Un seul DELETE ensembliste ; les références nullables sont remises à NULL.
+        """
+        try:
+            return supprimer_en_masse(Aliment, request.get_json() or {}, FILTRES_MASSE), 200
+        except OperationMasseInvalide as e:
+            aliments_ns.abort(400, str(e))
+        except ConflitMasse as e:
+            aliments_ns.abort(409, str(e))
+        except Exception as e:
+            aliments_ns.abort(500, f"Erreur lors de la suppression en masse: {str(e)}")
+
 @aliments_ns.route('/<int:aliment_id>')
 @aliments_ns.param('aliment_id', 'ID unique de l\'aliment')
 class AlimentDetail(Resource):
     @aliments_ns.doc('obtenir_aliment')
     @aliments_ns.marshal_with(models['aliment'])
+    @lecture_seule
     def get(self, aliment_id):
         """🔍 Obtenir un aliment par son ID"""
         aliment = Aliment.query.get_or_404(aliment_id)
@@ -127,6 +224,7 @@ class AlimentDetail(Resource):
 class AlimentsRecherche(Resource):
     @aliments_ns.doc('rechercher_aliments')
     @aliments_ns.marshal_list_with(models['aliment'])
+    @lecture_seule
     def get(self, terme):
         """🔎 Rechercher des aliments par nom"""
         if not terme or len(terme) < 2:
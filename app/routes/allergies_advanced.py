@@ -1,10 +1,19 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_restx import Namespace, Resource, fields
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, select
+from werkzeug.exceptions import NotFound
 from app.model import (db, ReactionAllergique, AllergieUtilisateur, 
                       Utilisateur, Aliment, Recette, Allergie)
 from app.model import create_swagger_models
+from app.db.transactions import lecture_seule
+from app.db.concurrence import en_parallele
+from app.db.taches import enfiler, traiter
+from app import analytique
+from app.filtre_bloom import filtre_courant
+from app.index_allergies import CONFIRMEE, SEUIL, index_courant
+from app.reactivite import graphe_courant
 from datetime import datetime, timedelta
+import time
 
 # Blueprint Flask pour les routes classiques
 allergies_bp = Blueprint('allergies_advanced', __name__)
@@ -21,82 +30,104 @@ allergies_ns = Namespace(
 @allergies_ns.route('/users/<int:user_id>/profile')
 @allergies_ns.param('user_id', 'ID unique de l\'utilisateur')
 class UserAllergyProfile(Resource):
+    @staticmethod
+    def requetes(user_id):
+        """Requêtes indépendantes du profil (partagées avec le mode ASGI asynchrone)"""
+        return {
+            'user': select(Utilisateur).where(Utilisateur.id == user_id),
+            # Réactions de l'utilisateur avec leur aliment (une seule requête)
+            'reactions': select(ReactionAllergique, Aliment).outerjoin(
+                Aliment, ReactionAllergique.aliment_id == Aliment.id
+            ).where(ReactionAllergique.utilisateur_id == user_id),
+            # Allergies confirmées (détectées automatiquement ou ajoutées manuellement)
+            'allergies_confirmees': select(AllergieUtilisateur, Allergie).join(Allergie).where(
+                AllergieUtilisateur.utilisateur_id == user_id
+            )
+        }
+    
     @allergies_ns.doc('get_user_allergy_profile')
+    @lecture_seule
     def get(self, user_id):
         """🩺 **Profil Allergique Complet** - Analyse détaillée des allergies d'un utilisateur"""
         try:
-            user = Utilisateur.query.get_or_404(user_id)
-            
-            # Récupérer toutes les réactions de l'utilisateur
-            reactions = ReactionAllergique.query.filter_by(utilisateur_id=user_id).all()
-            
-            # Allergies confirmées (détectées automatiquement ou ajoutées manuellement)
-            allergies_confirmees = db.session.query(
-                AllergieUtilisateur, Allergie
-            ).join(Allergie).filter(
-                AllergieUtilisateur.utilisateur_id == user_id
-            ).all()
-            
-            # Analyse des risques par aliment
-            risques_aliments = []
-            for reaction in reactions:
-                if reaction.aliment_id:
-                    aliment = Aliment.query.get(reaction.aliment_id)
-                    probabilite = reaction.probabilite_allergie()
-                    niveau_risque = self._get_risk_level(probabilite)
-                    
-                    risques_aliments.append({
-                        'aliment': aliment.to_dict() if aliment else None,
-                        'times_eaten': reaction.times_eaten,
-                        'times_reacted': reaction.times_reacted,
-                        'probabilite_allergie': round(probabilite, 2),
-                        'niveau_risque': niveau_risque,
-                        'is_allergic': reaction.is_allergic(),
-                        'derniere_reaction': reaction.updated_at.isoformat()
-                    })
-            
-            # Statistiques globales
-            total_aliments_testes = len(reactions)
-            allergies_detectees = len([r for r in reactions if r.is_allergic()])
-            pourcentage_allergies = (allergies_detectees / total_aliments_testes * 100) if total_aliments_testes > 0 else 0
-            
-            # Recommandations personnalisées
-            recommandations = self._generate_recommendations(user_id, reactions, allergies_confirmees)
-            
-            profile = {
-                'utilisateur': {
-                    'id': user.id,
-                    'nom_complet': f"{user.prenom} {user.nom}",
-                    'email': user.email
-                },
-                'resume_allergique': {
-                    'total_aliments_testes': total_aliments_testes,
-                    'allergies_detectees': allergies_detectees,
-                    'pourcentage_allergies': round(pourcentage_allergies, 2),
-                    'niveau_risque_global': self._get_global_risk_level(pourcentage_allergies)
-                },
-                'allergies_confirmees': [
-                    {
-                        'allergie': allergie_util[1].to_dict(),
-                        'gravite_personnelle': allergie_util[0].gravite_personnelle,
-                        'detectee_automatiquement': allergie_util[0].detectee_automatiquement,
-                        'date_detection': allergie_util[0].created_at.isoformat()
-                    }
-                    for allergie_util in allergies_confirmees
-                ],
-                'analyse_risques_aliments': sorted(risques_aliments, 
-                                                 key=lambda x: x['probabilite_allergie'], 
-                                                 reverse=True),
-                'recommandations': recommandations,
-                'derniere_analyse': datetime.utcnow().isoformat()
-            }
-            
-            return profile, 200
+            # Requêtes indépendantes exécutées en parallèle (connexions distinctes du pool)
+            resultats = en_parallele({
+                nom: (lambda requete=requete: db.session.execute(requete).all())
+                for nom, requete in self.requetes(user_id).items()
+            })
+            return self.construire(resultats), 200
             
+        except NotFound:
+            raise
         except Exception as e:
             return {'message': f'Erreur lors de l\'analyse: {str(e)}'}, 500
     
-    def _get_risk_level(self, probabilite):
+    @classmethod
+    def construire(cls, resultats):
+        """Assemble le profil à partir des lignes renvoyées par `requetes`"""
+        if not resultats['user']:
+            raise NotFound('Utilisateur non trouvé')
+        user = resultats['user'][0][0]
+        reactions = [reaction for reaction, _ in resultats['reactions']]
+        allergies_confirmees = resultats['allergies_confirmees']
+        
+        # Analyse des risques par aliment
+        risques_aliments = []
+        for reaction, aliment in resultats['reactions']:
+            if reaction.aliment_id:
+                probabilite = reaction.probabilite_allergie()
+                niveau_risque = cls._get_risk_level(probabilite)
+                
+                risques_aliments.append({
+                    'aliment': aliment.to_dict() if aliment else None,
+                    'times_eaten': reaction.times_eaten,
+                    'times_reacted': reaction.times_reacted,
+                    'probabilite_allergie': round(probabilite, 2),
+                    'niveau_risque': niveau_risque,
+                    'is_allergic': reaction.is_allergic(),
+                    'derniere_reaction': reaction.updated_at.isoformat()
+                })
+        
+        # Statistiques globales
+        total_aliments_testes = len(reactions)
+        allergies_detectees = len([r for r in reactions if r.is_allergic()])
+        pourcentage_allergies = (allergies_detectees / total_aliments_testes * 100) if total_aliments_testes > 0 else 0
+        
+        # Recommandations personnalisées
+        recommandations = cls._generate_recommendations(user.id, reactions, allergies_confirmees)
+        
+        profile = {
+            'utilisateur': {
+                'id': user.id,
+                'nom_complet': f"{user.prenom} {user.nom}",
+                'email': user.email
+            },
+            'resume_allergique': {
+                'total_aliments_testes': total_aliments_testes,
+                'allergies_detectees': allergies_detectees,
+                'pourcentage_allergies': round(pourcentage_allergies, 2),
+                'niveau_risque_global': cls._get_global_risk_level(pourcentage_allergies)
+            },
+            'allergies_confirmees': [
+                {
+                    'allergie': allergie_util[1].to_dict(),
+                    'gravite_personnelle': allergie_util[0].gravite_personnelle,
+                    'detectee_automatiquement': allergie_util[0].detectee_automatiquement,
+                    'date_detection': allergie_util[0].created_at.isoformat()
+                }
+                for allergie_util in allergies_confirmees
+            ],
+            'analyse_risques_aliments': sorted(risques_aliments, 
+                                             key=lambda x: x['probabilite_allergie'], 
+                                             reverse=True),
+            'recommandations': recommandations,
+            'derniere_analyse': datetime.utcnow().isoformat()
+        }
+        
+        return profile
+    
+    @staticmethod
+    def _get_risk_level(probabilite):
         """Détermine le niveau de risque basé sur la probabilité"""
         if probabilite >= 50:
             return 'TRÈS ÉLEVÉ'
@@ -109,7 +140,8 @@ class UserAllergyProfile(Resource):
         else:
             return 'AUCUN'
     
-    def _get_global_risk_level(self, pourcentage):
+    @staticmethod
+    def _get_global_risk_level(pourcentage):
         """Détermine le niveau de risque global de l'utilisateur"""
         if pourcentage >= 25:
             return 'PROFIL À HAUT RISQUE'
@@ -118,7 +150,8 @@ class UserAllergyProfile(Resource):
         else:
             return 'PROFIL FAIBLE RISQUE'
     
-    def _generate_recommendations(self, user_id, reactions, allergies_confirmees):
+    @staticmethod
+    def _generate_recommendations(user_id, reactions, allergies_confirmees):
         """Génère des recommandations personnalisées"""
         recommendations = []
         
@@ -208,78 +241,54 @@ class UserReactionsList(Resource):
                 db.session.add(reaction)
                 action = 'created'
             
+            # Détection d'allergie automatique : tâche de fond validée avec la réaction
+            tache = None
+            if reaction.aliment_id:
+                # Le flush charge le seuil propre à l'aliment de la réaction
+                db.session.flush()
+                if reaction.is_allergic():
+                    tache = enfiler('detection_allergie', {'reaction_id': reaction.id}, cle=str(user_id))
+            
             db.session.commit()
             
-            # Vérifier si cela déclenche une détection d'allergie automatique
-            allergie_detectee = self._check_auto_allergy_detection(reaction)
+            allergies_detectees = []
+            if tache is not None and current_app.config.get('TACHES_INLINE', False):
+                traiter(ids=[tache.id])
+                db.session.refresh(tache)
+                allergies_detectees = (tache.resultat or {}).get('allergies_ajoutees', [])
             
             response = {
                 'reaction': reaction.to_dict(),
                 'action': action,
-                'allergie_detectee_automatiquement': allergie_detectee is not None,
+                'allergie_detectee_automatiquement': bool(allergies_detectees),
                 'message': f'Réaction {action} avec succès'
             }
             
-            if allergie_detectee:
-                response['nouvelle_allergie'] = allergie_detectee
-                response['message'] += f'. ⚠️ ALLERGIE DÉTECTÉE automatiquement: {allergie_detectee["nom"]}'
+            if tache is not None:
+                response['detection'] = {
+                    'tache_id': tache.id,
+                    'statut': tache.statut,
+                    'suivi': f'/api/taches/{tache.id}'
+                }
+                if tache.statut == 'en_attente':
+                    response['message'] += f'. Détection d\'allergie en cours (tâche {tache.id})'
+            
+            if allergies_detectees:
+                response['nouvelle_allergie'] = allergies_detectees[0]
+                response['message'] += f'. ⚠️ ALLERGIE DÉTECTÉE automatiquement: {allergies_detectees[0]["nom"]}'
             
             return response, 201 if action == 'created' else 200
             
         except Exception as e:
             db.session.rollback()
             return {'message': f'Erreur lors de l\'enregistrement: {str(e)}'}, 500
-    
-    def _check_auto_allergy_detection(self, reaction):
-        """Vérifie si une allergie doit être détectée automatiquement"""
-        if not reaction.is_allergic():
-            return None
-        
-        # Si c'est un aliment, chercher/créer l'allergie correspondante
-        if reaction.aliment_id:
-            aliment = Aliment.query.get(reaction.aliment_id)
-            if not aliment:
-                return None
-            
-            # Chercher une allergie existante pour cet aliment
-            allergie = Allergie.query.filter_by(nom=aliment.nom).first()
-            
-            if not allergie:
-                # Créer une nouvelle allergie
-                allergie = Allergie(
-                    nom=aliment.nom,
-                    description=f'Allergie détectée automatiquement pour {aliment.nom}',
-                    gravite='Modéré'
-                )
-                db.session.add(allergie)
-                db.session.commit()
-            
-            # Vérifier si l'utilisateur a déjà cette allergie
-            allergie_user = AllergieUtilisateur.query.filter_by(
-                utilisateur_id=reaction.utilisateur_id,
-                allergie_id=allergie.id
-            ).first()
-            
-            if not allergie_user:
-                # Ajouter l'allergie à l'utilisateur
-                allergie_user = AllergieUtilisateur(
-                    utilisateur_id=reaction.utilisateur_id,
-                    allergie_id=allergie.id,
-                    gravite_personnelle='Modéré',
-                    detectee_automatiquement=True
-                )
-                db.session.add(allergie_user)
-                db.session.commit()
-                
-                return allergie.to_dict()
-        
-        return None
 
 
 @allergies_ns.route('/users/<int:user_id>/allergies')
 @allergies_ns.param('user_id', 'ID unique de l\'utilisateur')
 class UserAllergiesList(Resource):
     @allergies_ns.doc('get_user_allergies')
+    @lecture_seule
     def get(self, user_id):
         """🔍 **Liste des Allergies** - Toutes les allergies confirmées de l'utilisateur"""
         try:
@@ -316,118 +325,346 @@ class UserAllergiesList(Resource):
 @allergies_ns.param('user_id', 'ID de l\'utilisateur')
 @allergies_ns.param('aliment_id', 'ID de l\'aliment à vérifier')
 class AllergyCheck(Resource):
-    @allergies_ns.doc('check_allergy_risk')
+    @staticmethod
+    def requetes(user_id, aliment_id):
+        """Requêtes indépendantes de la vérification (partagées avec le mode ASGI asynchrone)"""
+        return {
+            'user': select(Utilisateur).where(Utilisateur.id == user_id),
+            'aliment': select(Aliment).where(Aliment.id == aliment_id),
+            # Réaction existante
+            'reaction': select(ReactionAllergique).where(
+                ReactionAllergique.utilisateur_id == user_id,
+                ReactionAllergique.aliment_id == aliment_id
+            ).limit(1),
+            # Allergies confirmées, confrontées à l'aliment par le graphe de réactivité croisée
+            'allergies_utilisateur': select(AllergieUtilisateur.allergie_id).where(
+                AllergieUtilisateur.utilisateur_id == user_id
+            )
+        }
+    
+    @allergies_ns.doc('check_allergy_risk', params={
+        'detail': 'false : verdict seul, lu dans l\'index en mémoire sans requête SQL'
+    })
+    @lecture_seule
     def get(self, user_id, aliment_id):
         """🚨 **Vérification de Risque** - Analyse instantanée du risque allergique"""
         try:
-            user = Utilisateur.query.get_or_404(user_id)
-            aliment = Aliment.query.get_or_404(aliment_id)
-            
-            # Chercher les réactions existantes
-            reaction = ReactionAllergique.query.filter_by(
-                utilisateur_id=user_id,
-                aliment_id=aliment_id
-            ).first()
-            
-            # Chercher les allergies confirmées
-            allergie = Allergie.query.filter_by(nom=aliment.nom).first()
-            allergie_confirmee = None
-            
-            if allergie:
-                allergie_confirmee = AllergieUtilisateur.query.filter_by(
-                    utilisateur_id=user_id,
-                    allergie_id=allergie.id
-                ).first()
-            
-            # Analyse du risque
-            if allergie_confirmee:
-                niveau_risque = 'ALLERGIE CONFIRMÉE'
-                recommandation = 'ÉVITEMENT TOTAL RECOMMANDÉ'
-                probabilite = 100.0
-            elif reaction and reaction.is_allergic():
-                niveau_risque = 'TRÈS ÉLEVÉ'
-                recommandation = 'ÉVITEMENT FORTEMENT RECOMMANDÉ'
-                probabilite = reaction.probabilite_allergie()
-            elif reaction:
-                probabilite = reaction.probabilite_allergie()
-                if probabilite >= 15:
-                    niveau_risque = 'MODÉRÉ'
-                    recommandation = 'CONSOMMATION AVEC PRUDENCE'
-                elif probabilite > 0:
-                    niveau_risque = 'FAIBLE'
-                    recommandation = 'SURVEILLANCE RECOMMANDÉE'
-                else:
-                    niveau_risque = 'AUCUN RISQUE CONNU'
-                    recommandation = 'CONSOMMATION NORMALE'
+            detail = request.args.get('detail', 'true').lower() != 'false'
+            # Chemin négatif : ni réaction ni allergie connue pour la paire, ni jointure ni graphe
+            filtre = filtre_courant()
+            if filtre is not None and not filtre.peut_contenir(user_id, aliment_id):
+                if not detail:
+                    return self.verdict(user_id, aliment_id, None, 'filtre_bloom'), 200
+                return self.sans_historique(user_id, aliment_id), 200
+
+            index = index_courant()
+            if index is not None and not index.pret(user_id):
+                index = None  # reconstruction attendue : la base fait foi
+            requetes = self.requetes(user_id, aliment_id)
+            if index is not None:
+                verdict = index.verifier(user_id, aliment_id)
+                if not detail:
+                    return self.verdict(user_id, aliment_id, verdict, 'index'), 200
+                # L'index contient déjà les allergies confirmées développées par le graphe
+                del requetes['allergies_utilisateur']
+            resultats = {nom: db.session.execute(requete).all() for nom, requete in requetes.items()}
+            if index is not None:
+                resultats['allergie_confirmee'] = verdict == CONFIRMEE
+            analyse = self.construire(resultats)
+            if not detail:
+                niveau = analyse['analyse_risque']['niveau_risque']
+                verdict = {'ALLERGIE CONFIRMÉE': CONFIRMEE, 'TRÈS ÉLEVÉ': SEUIL}.get(niveau)
+                return self.verdict(user_id, aliment_id, verdict, 'base'), 200
+            return analyse, 200
+            
+        except NotFound:
+            raise
+        except Exception as e:
+            return {'message': f'Erreur lors de la vérification: {str(e)}'}, 500
+    
+    @staticmethod
+    def verdict(user_id, aliment_id, verdict, source):
+        """Réponse compacte (?detail=false) : CONFIRMEE, SEUIL ou None"""
+        return {
+            'utilisateur_id': user_id,
+            'aliment_id': aliment_id,
+            'evitement': verdict is not None,
+            'allergie_confirmee': verdict == CONFIRMEE,
+            'au_dessus_du_seuil': verdict == SEUIL,
+            'source': source
+        }
+    
+    @staticmethod
+    def sans_historique(user_id, aliment_id):
+        """Analyse d'une paire absente du filtre de Bloom : ni réaction ni allergie, seuls
+        l'utilisateur et l'aliment sont lus (réponse complète, 404 si l'un d'eux n'existe pas)"""
+        requetes = AllergyCheck.requetes(user_id, aliment_id)
+        resultats = {nom: db.session.execute(requetes[nom]).all() for nom in ('user', 'aliment')}
+        resultats.update(reaction=[], allergie_confirmee=False)
+        return dict(AllergyCheck.construire(resultats), source='filtre_bloom')
+    
+    @staticmethod
+    def evaluer(reaction, allergie_confirmee):
+        """(niveau de risque, recommandation, probabilité) d'une réaction et d'une allergie confirmée"""
+        if allergie_confirmee:
+            niveau_risque = 'ALLERGIE CONFIRMÉE'
+            recommandation = 'ÉVITEMENT TOTAL RECOMMANDÉ'
+            probabilite = 100.0
+        elif reaction and reaction.is_allergic():
+            niveau_risque = 'TRÈS ÉLEVÉ'
+            recommandation = 'ÉVITEMENT FORTEMENT RECOMMANDÉ'
+            probabilite = reaction.probabilite_allergie()
+        elif reaction:
+            probabilite = reaction.probabilite_allergie()
+            if probabilite >= 15:
+                niveau_risque = 'MODÉRÉ'
+                recommandation = 'CONSOMMATION AVEC PRUDENCE'
+            elif probabilite > 0:
+                niveau_risque = 'FAIBLE'
+                recommandation = 'SURVEILLANCE RECOMMANDÉE'
             else:
-                niveau_risque = 'INCONNU'
-                recommandation = 'PREMIER TEST - CONSOMMATION PRUDENTE'
-                probabilite = 0.0
-            
-            return {
-                'utilisateur': {
-                    'id': user.id,
-                    'nom_complet': f"{user.prenom} {user.nom}"
-                },
-                'aliment': aliment.to_dict(),
-                'analyse_risque': {
-                    'niveau_risque': niveau_risque,
-                    'probabilite_allergie': round(probabilite, 2),
-                    'recommandation': recommandation,
-                    'allergie_confirmee': allergie_confirmee is not None,
-                    'historique_reactions': reaction.to_dict() if reaction else None
-                },
-                'timestamp': datetime.utcnow().isoformat()
-            }, 200
+                niveau_risque = 'AUCUN RISQUE CONNU'
+                recommandation = 'CONSOMMATION NORMALE'
+        else:
+            niveau_risque = 'INCONNU'
+            recommandation = 'PREMIER TEST - CONSOMMATION PRUDENTE'
+            probabilite = 0.0
+        return niveau_risque, recommandation, probabilite
+    
+    @staticmethod
+    def construire(resultats):
+        """Assemble l'analyse de risque à partir des lignes renvoyées par `requetes`"""
+        if not resultats['user'] or not resultats['aliment']:
+            raise NotFound('Utilisateur ou aliment non trouvé')
+        user = resultats['user'][0][0]
+        aliment = resultats['aliment'][0][0]
+        reaction = resultats['reaction'][0][0] if resultats['reaction'] else None
+        if 'allergie_confirmee' in resultats:
+            allergie_confirmee = resultats['allergie_confirmee']  # verdict de l'index
+        else:
+            allergies = [allergie_id for allergie_id, in resultats['allergies_utilisateur']]
+            graphe = graphe_courant(allergies)
+            allergie_confirmee = bool(graphe.masque_etendu(allergies) & graphe.allergenes(aliment.id))
+        
+        niveau_risque, recommandation, probabilite = AllergyCheck.evaluer(reaction, allergie_confirmee)
+        
+        return {
+            'utilisateur': {
+                'id': user.id,
+                'nom_complet': f"{user.prenom} {user.nom}"
+            },
+            'aliment': aliment.to_dict(),
+            'analyse_risque': {
+                'niveau_risque': niveau_risque,
+                'probabilite_allergie': round(probabilite, 2),
+                'recommandation': recommandation,
+                'allergie_confirmee': allergie_confirmee,
+                'historique_reactions': reaction.to_dict() if reaction else None
+            },
+            'timestamp': datetime.utcnow().isoformat()
+        }
+
+
+# Niveaux de risque du moins au plus grave (le verdict global d'un lot est le plus grave)
+GRAVITE = ['AUCUN RISQUE CONNU', 'INCONNU', 'FAIBLE', 'MODÉRÉ', 'TRÈS ÉLEVÉ', 'ALLERGIE CONFIRMÉE']
+NIVEAUX_EVITEMENT = ('TRÈS ÉLEVÉ', 'ALLERGIE CONFIRMÉE')
+
+verification_lot_model = allergies_ns.model('VerificationLot', {
+    'aliment_ids': fields.List(fields.Integer, description='Aliments à vérifier', example=[1, 2, 3]),
+    'recette_ids': fields.List(fields.Integer, description='Recettes à vérifier', example=[4])
+})
+
+
+@allergies_ns.route('/check/<int:user_id>')
+@allergies_ns.param('user_id', 'ID de l\'utilisateur')
+class AllergyBulkCheck(Resource):
+    @staticmethod
+    def requetes(user_id, aliment_ids, recette_ids, confirmees=True):
+        """Requêtes ensemblistes du lot : leur nombre ne dépend pas du nombre d'éléments"""
+        requetes = {'user': select(Utilisateur).where(Utilisateur.id == user_id)}
+        if aliment_ids:
+            requetes['aliments'] = select(Aliment).where(Aliment.id.in_(aliment_ids))
+        if recette_ids:
+            requetes['recettes'] = select(Recette).where(Recette.id.in_(recette_ids))
+        # Réactions de l'utilisateur aux aliments et aux recettes du lot, en une requête
+        cibles = []
+        if aliment_ids:
+            cibles.append(ReactionAllergique.aliment_id.in_(aliment_ids))
+        if recette_ids:
+            cibles.append(ReactionAllergique.recette_id.in_(recette_ids))
+        if cibles:
+            requetes['reactions'] = select(ReactionAllergique).where(
+                ReactionAllergique.utilisateur_id == user_id, or_(*cibles)
+            )
+        # Allergies confirmées, confrontées aux aliments du lot par le graphe de réactivité croisée
+        if confirmees and aliment_ids:
+            requetes['allergies_utilisateur'] = select(AllergieUtilisateur.allergie_id).where(
+                AllergieUtilisateur.utilisateur_id == user_id
+            )
+        return requetes
+    
+    @allergies_ns.doc('check_allergy_risk_bulk', responses={
+        200: 'Verdict par élément et verdict global',
+        400: 'Lot invalide',
+        404: 'Utilisateur introuvable'
+    })
+    @allergies_ns.expect(verification_lot_model)
+    @lecture_seule
+    def post(self, user_id):
+        """🍽️ **Vérification Groupée** - Risque de plusieurs aliments et recettes (une assiette, un menu) en un appel"""
+        data = request.get_json(silent=True) or {}
+        ids = {}
+        for cle in ('aliment_ids', 'recette_ids'):
+            valeurs = (data.get(cle) or []) if isinstance(data, dict) else None
+            if not isinstance(valeurs, list) or not all(isinstance(v, int) and not isinstance(v, bool) for v in valeurs):
+                return {'message': f"'{cle}' doit être une liste d'identifiants entiers"}, 400
+            # Doublons retirés, ordre de la demande conservé
+            ids[cle] = list(dict.fromkeys(valeurs))
+        aliment_ids, recette_ids = ids['aliment_ids'], ids['recette_ids']
+        if not aliment_ids and not recette_ids:
+            return {'message': 'Indiquez au moins un aliment ou une recette'}, 400
+        maximum = current_app.config.get('ALLERGY_CHECK_MAX_ITEMS', 500)
+        if len(aliment_ids) + len(recette_ids) > maximum:
+            return {'message': f'Au plus {maximum} éléments par vérification'}, 400
+        
+        try:
+            index = index_courant()
+            if index is not None and not index.pret(user_id):
+                index = None  # reconstruction attendue : la base fait foi
+            requetes = self.requetes(user_id, aliment_ids, recette_ids, confirmees=index is None)
+            resultats = {nom: db.session.execute(requete).all() for nom, requete in requetes.items()}
+            if not resultats['user']:
+                return {'message': f'Utilisateur {user_id} introuvable'}, 404
+            if index is not None:
+                # L'index contient déjà les allergies confirmées développées par le graphe
+                confirmees = {a for a, v in index.verifier_lot(user_id, aliment_ids).items() if v == CONFIRMEE}
+            else:
+                allergies = [allergie_id for allergie_id, in resultats.get('allergies_utilisateur', [])]
+                graphe = graphe_courant(allergies)
+                masque = graphe.masque_etendu(allergies)
+                confirmees = {a for a in aliment_ids if masque & graphe.allergenes(a)}
+            return self.construire(resultats, aliment_ids, recette_ids, confirmees,
+                                   'index' if index is not None else 'base'), 200
             
         except Exception as e:
             return {'message': f'Erreur lors de la vérification: {str(e)}'}, 500
+    
+    @staticmethod
+    def construire(resultats, aliment_ids, recette_ids, confirmees, source):
+        """Verdict par élément (dans l'ordre demandé) et verdict global du lot"""
+        user = resultats['user'][0][0]
+        aliments = {aliment.id: aliment for aliment, in resultats.get('aliments', [])}
+        recettes = {recette.id: recette for recette, in resultats.get('recettes', [])}
+        par_aliment, par_recette = {}, {}
+        for reaction, in resultats.get('reactions', []):
+            if reaction.aliment_id is not None:
+                par_aliment[reaction.aliment_id] = reaction
+            else:
+                par_recette[reaction.recette_id] = reaction
+        
+        def element(entite, reaction, allergie_confirmee):
+            niveau_risque, recommandation, probabilite = AllergyCheck.evaluer(reaction, allergie_confirmee)
+            return {
+                'id': entite.id,
+                'nom': entite.nom,
+                'niveau_risque': niveau_risque,
+                'probabilite_allergie': round(probabilite, 2),
+                'recommandation': recommandation,
+                'allergie_confirmee': allergie_confirmee,
+                'evitement': niveau_risque in NIVEAUX_EVITEMENT
+            }
+        
+        # Pas de composition des recettes en base : le risque d'une recette vient de ses propres réactions
+        verdicts_aliments = [element(aliments[i], par_aliment.get(i), i in confirmees)
+                             for i in aliment_ids if i in aliments]
+        verdicts_recettes = [element(recettes[i], par_recette.get(i), False)
+                             for i in recette_ids if i in recettes]
+        verdicts = verdicts_aliments + verdicts_recettes
+        
+        return {
+            'utilisateur': {
+                'id': user.id,
+                'nom_complet': f"{user.prenom} {user.nom}"
+            },
+            'verdict_global': {
+                'niveau_risque': max((v['niveau_risque'] for v in verdicts), key=GRAVITE.index, default=None),
+                'evitement': any(v['evitement'] for v in verdicts),
+                'aliments_a_eviter': [v['id'] for v in verdicts_aliments if v['evitement']],
+                'recettes_a_eviter': [v['id'] for v in verdicts_recettes if v['evitement']],
+                'elements_verifies': len(verdicts)
+            },
+            'aliments': verdicts_aliments,
+            'recettes': verdicts_recettes,
+            'introuvables': {
+                'aliments': [i for i in aliment_ids if i not in aliments],
+                'recettes': [i for i in recette_ids if i not in recettes]
+            },
+            'source': source,
+            'timestamp': datetime.utcnow().isoformat()
+        }
 
 
 @allergies_ns.route('/statistics')
 class AllergyStatistics(Resource):
     @allergies_ns.doc('get_allergy_statistics')
+    @lecture_seule
     def get(self):
         """📊 **Statistiques Globales** - Analyse des tendances allergiques"""
         try:
-            # Statistiques générales
-            total_users = Utilisateur.query.count()
-            total_reactions = ReactionAllergique.query.count()
-            total_allergies = AllergieUtilisateur.query.count()
-            
-            # Allergies les plus fréquentes
-            allergies_frequentes = db.session.query(
-                Allergie.nom,
-                func.count(AllergieUtilisateur.id).label('count')
-            ).join(AllergieUtilisateur).group_by(
-                Allergie.nom
-            ).order_by(
-                func.count(AllergieUtilisateur.id).desc()
-            ).limit(10).all()
-            
-            # Aliments les plus problématiques
-            aliments_problematiques = db.session.query(
-                Aliment.nom,
-                func.avg(ReactionAllergique.times_reacted * 100.0 / ReactionAllergique.times_eaten).label('avg_reaction_rate')
-            ).join(ReactionAllergique).filter(
-                ReactionAllergique.times_eaten > 0
-            ).group_by(
-                Aliment.nom
-            ).order_by(
-                func.avg(ReactionAllergique.times_reacted * 100.0 / ReactionAllergique.times_eaten).desc()
-            ).limit(10).all()
-            
-            # Détections automatiques récentes
-            detections_auto = AllergieUtilisateur.query.filter_by(
-                detectee_automatiquement=True
-            ).filter(
-                AllergieUtilisateur.created_at >= datetime.utcnow() - timedelta(days=30)
-            ).count()
+            # Requêtes indépendantes exécutées en parallèle (connexions distinctes du pool)
+            resultats = en_parallele({
+                # Statistiques générales
+                'total_users': lambda: Utilisateur.query.count(),
+                'total_reactions': lambda: ReactionAllergique.query.count(),
+                'total_allergies': lambda: AllergieUtilisateur.query.count(),
+                
+                # Allergies les plus fréquentes
+                'allergies_frequentes': lambda: db.session.query(
+                    Allergie.nom,
+                    func.count(AllergieUtilisateur.id).label('count')
+                ).join(AllergieUtilisateur).group_by(
+                    Allergie.nom
+                ).order_by(
+                    func.count(AllergieUtilisateur.id).desc()
+                ).limit(10).all(),
+                
+                # Aliments les plus problématiques
+                'aliments_problematiques': lambda: db.session.query(
+                    Aliment.nom,
+                    func.avg(ReactionAllergique.probabilite).label('avg_reaction_rate')
+                ).join(ReactionAllergique).filter(
+                    ReactionAllergique.times_eaten > 0
+                ).group_by(
+                    Aliment.nom
+                ).order_by(
+                    func.avg(ReactionAllergique.probabilite).desc()
+                ).limit(10).all(),
+                
+                # Réactions au-dessus de leur seuil, comptées par la base
+                'reactions_allergiques': lambda: db.session.query(
+                    func.count(ReactionAllergique.id)
+                ).filter(ReactionAllergique.est_allergique).scalar(),
+                
+                # Détections automatiques récentes
+                'detections_auto': lambda: AllergieUtilisateur.query.filter_by(
+                    detectee_automatiquement=True
+                ).filter(
+                    AllergieUtilisateur.created_at >= datetime.utcnow() - timedelta(days=30)
+                ).count()
+            })
+            total_users = resultats['total_users']
+            total_reactions = resultats['total_reactions']
+            total_allergies = resultats['total_allergies']
+            allergies_frequentes = resultats['allergies_frequentes']
+            aliments_problematiques = resultats['aliments_problematiques']
+            detections_auto = resultats['detections_auto']
+            reactions_allergiques = resultats['reactions_allergiques']
             
             return {
                 'resume_global': {
                     'total_utilisateurs': total_users,
                     'total_reactions_enregistrees': total_reactions,
+                    'reactions_au_dessus_du_seuil': reactions_allergiques,
                     'total_allergies_confirmees': total_allergies,
                     'detections_automatiques_30j': detections_auto,
                     'taux_detection_auto': round((detections_auto / total_allergies * 100) if total_allergies > 0 else 0, 2)
@@ -447,6 +684,32 @@ class AllergyStatistics(Resource):
             return {'message': f'Erreur lors du calcul des statistiques: {str(e)}'}, 500
 
 
+@allergies_ns.route('/analytics')
+class AllergyAnalytics(Resource):
+    @allergies_ns.doc('get_allergy_analytics', params={
+        'top': 'Nombre d\'aliments à risque renvoyés (défaut 10)',
+        'min_consommations': 'Consommations minimales pour classer un aliment (défaut 20)'
+    })
+    @lecture_seule
+    def get(self):
+        """🧮 **Analytique de Population** - Taux, intervalles de confiance et agrégats calculés en colonnes NumPy"""
+        try:
+            top = max(1, min(request.args.get('top', 10, type=int), 100))
+            min_consommations = max(0, request.args.get('min_consommations', 20, type=int))
+            debut = time.perf_counter()
+            tableau, age = analytique.tableau_courant(current_app.config.get('ANALYTICS_CACHE_SECONDS', 60))
+            resultat = analytique.analyser(tableau, top, min_consommations)
+            resultat['calcul'] = {
+                'duree_ms': round((time.perf_counter() - debut) * 1000, 2),
+                'age_donnees_s': round(age, 1)
+            }
+            resultat['timestamp'] = datetime.utcnow().isoformat()
+            return resultat, 200
+
+        except Exception as e:
+            return {'message': f'Erreur lors du calcul analytique: {str(e)}'}, 500
+
+
 # ============= ROUTES FLASK CLASSIQUES =============
 
 @allergies_bp.route('/allergies/check/<int:user_id>/<int:aliment_id>')
@@ -0,0 +1,127 @@
+from flask import current_app, request
+from flask_restx import Namespace, Resource, fields
+from werkzeug.test import EnvironBuilder
+from app.db.concurrence import executeur, parallelisme_possible
+
+# Namespace Swagger pour le multiplexage de sous-requêtes
+batch_ns = Namespace(
+    "batch",
+    description="📦 Plusieurs appels API en une seule requête HTTP",
+    path='/batch'
+)
+
+sous_requete_model = batch_ns.model('SousRequete', {
+    'id': fields.String(description='Identifiant libre renvoyé dans la réponse', example='profil'),
+    'method': fields.String(description='Méthode HTTP (défaut GET)', example='GET'),
+    'path': fields.String(required=True, description='Chemin avec query string', example='/api/allergies/users/1/profile'),
+    'body': fields.Raw(description='Corps JSON'),
+    'headers': fields.Raw(description='En-têtes supplémentaires')
+})
+
+batch_model = batch_ns.model('Batch', {
+    'requetes': fields.List(fields.Nested(sous_requete_model), required=True),
+    'parallele': fields.Boolean(description='Exécuter en parallèle les lectures consécutives', default=False)
+})
+
+METHODES_LECTURE = ('GET', 'HEAD', 'OPTIONS')
+# En-têtes de la requête englobante transmis aux sous-requêtes
+ENTETES_TRANSMIS = ('Authorization', 'Cookie', 'X-Admin-Token', 'Accept-Language')
+
+
+def _executer(app, sous_requete, entetes, base_url):
+    """Dispatch interne d'une sous-requête, dans son propre contexte (g et session distincts)"""
+    methode = sous_requete.get('method') or 'GET'
+    chemin = sous_requete.get('path') or ''
+    en_tetes = sous_requete.get('headers') or {}
+    resultat = {'id': sous_requete.get('id'), 'method': methode, 'path': chemin}
+
+    if not isinstance(methode, str) or not isinstance(chemin, str):
+        return dict(resultat, status=400, body={'message': "'method' et 'path' doivent être des chaînes"})
+    if not isinstance(en_tetes, dict) or not all(isinstance(v, str) for v in en_tetes.values()):
+        return dict(resultat, status=400, body={'message': "'headers' doit être un objet de chaînes"})
+    methode = resultat['method'] = methode.upper()
+    if not chemin.startswith('/') or chemin.split('?')[0].rstrip('/').endswith('/api/batch'):
+        return dict(resultat, status=400, body={'message': 'Chemin invalide ou batch imbriqué'})
+
+    environ = EnvironBuilder(
+        path=chemin, method=methode, base_url=base_url,
+        headers=dict(entetes, **en_tetes),
+        json=sous_requete.get('body') if sous_requete.get('body') is not None else None
+    ).get_environ()
+
+    with app.app_context(), app.request_context(environ):
+        try:
+            response = app.full_dispatch_request()
+        except Exception as e:
+            try:
+                response = app.make_response(app.handle_exception(e))
+            except Exception:
+                # PROPAGATE_EXCEPTIONS (tests, debug) : ne pas faire échouer tout le batch
+                response = app.make_response(({'message': f'Erreur interne: {e}'}, 500))
+        corps = response.get_json(silent=True)
+        if corps is None:
+            corps = response.get_data(as_text=True)
+        return dict(resultat, status=response.status_code, body=corps, headers={
+            cle: valeur for cle, valeur in response.headers.items() if cle not in ('Content-Length', 'Set-Cookie')
+        })
+
+
+def _segments(requetes):
+    """Regroupe les lectures consécutives ; chaque écriture forme une barrière"""
+    segment = []
+    for index, sous_requete in enumerate(requetes):
+        methode = sous_requete.get('method') or 'GET'
+        if isinstance(methode, str) and methode.upper() in METHODES_LECTURE:
+            segment.append(index)
+        else:
+            if segment:
+                yield segment
+            segment = []
+            yield [index]
+    if segment:
+        yield segment
+
+
+@batch_ns.route('')
+class Batch(Resource):
+    @batch_ns.doc('batch',
+                 responses={
+                     200: 'Résultats des sous-requêtes, dans l\'ordre',
+                     400: 'Requête invalide'
+                 })
+    @batch_ns.expect(batch_model)
+    def post(self):
+        """📦 Exécuter plusieurs appels API en une requête
+
+        Les sous-requêtes sont dispatchées en interne via la table de routage Flask,
+        sans aller-retour HTTP. Avec `parallele`, les lectures consécutives s'exécutent
+        en parallèle ; les écritures restent séquentielles et dans l'ordre.
+        """
+        data = request.get_json(silent=True) or {}
+        requetes = data.get('requetes') if isinstance(data, dict) else data
+        if not isinstance(requetes, list) or not requetes:
+            batch_ns.abort(400, "'requetes' doit être une liste non vide")
+        maximum = current_app.config.get('BATCH_MAX_REQUESTS', 20)
+        if len(requetes) > maximum:
+            batch_ns.abort(400, f"Au plus {maximum} sous-requêtes par batch")
+        if not all(isinstance(r, dict) for r in requetes):
+            batch_ns.abort(400, "Chaque sous-requête doit être un objet")
+
+        app = current_app._get_current_object()
+        entetes = {nom: request.headers[nom] for nom in ENTETES_TRANSMIS if nom in request.headers}
+        base_url = request.host_url.rstrip('/')
+        parallele = bool(data.get('parallele')) if isinstance(data, dict) else False
+        parallele = parallele and parallelisme_possible()
+
+        resultats = [None] * len(requetes)
+        pool = executeur('batch', current_app.config.get('BATCH_MAX_WORKERS', 4)) if parallele else None
+        for segment in _segments(requetes):
+            if pool is not None and len(segment) > 1:
+                futurs = {i: pool.submit(_executer, app, requetes[i], entetes, base_url) for i in segment}
+                for i, futur in futurs.items():
+                    resultats[i] = futur.result()
+            else:
+                for i in segment:
+                    resultats[i] = _executer(app, requetes[i], entetes, base_url)
+
+        return {'parallele': parallele, 'resultats': resultats}, 200
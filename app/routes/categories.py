@@ -2,6 +2,8 @@ from flask import Blueprint, jsonify, request
 from flask_restx import Namespace, Resource
 from app.db.db import db
 from app.model import Categorie, create_swagger_models  # ← Import unifié
+from app.db.transactions import lecture_seule
+from app.db.bulk import ConflitMasse, OperationMasseInvalide, mettre_a_jour_en_masse, supprimer_en_masse
 
 categories_bp = Blueprint("categories", __name__)
 
@@ -14,9 +16,14 @@ categories_ns = Namespace(
 # Utiliser la fonction centralisée du model.py
 models = create_swagger_models(categories_ns)
 
+# Opérations en masse : colonnes modifiables et filtres acceptés
+CHAMPS_MODIFIABLES = ('nom', 'description')
+FILTRES_MASSE = ('nom',)
+
 @categories_ns.route('/')
 class CategoriesList(Resource):
     @categories_ns.marshal_list_with(models['categorie'])
+    @lecture_seule
     def get(self):
         """📋 Liste toutes les catégories"""
         try:
@@ -49,10 +56,59 @@ class CategoriesList(Resource):
             db.session.rollback()
             categories_ns.abort(500, f"Erreur lors de la création: {str(e)}")
 
+@categories_ns.route('/masse')
+class CategoriesMasse(Resource):
+    @categories_ns.doc('modifier_categories_masse',
+                      responses={
+                          200: 'Lignes modifiées',
+                          400: 'Requête invalide',
+                          409: 'Nom déjà utilisé ou contrainte violée',
+                          500: 'Erreur serveur'
+                      })
+    @categories_ns.expect(models['operation_masse'])
+    @categories_ns.marshal_with(models['resultat_masse'])
+    def patch(self):
+        """✏️ Modifier en masse des catégories
+
+        Un seul UPDATE ensembliste sur les `ids` et/ou le `filtre` fournis.
+        """
+        try:
+            return mettre_a_jour_en_masse(Categorie, request.get_json() or {}, CHAMPS_MODIFIABLES, FILTRES_MASSE), 200
+        except OperationMasseInvalide as e:
+            categories_ns.abort(400, str(e))
+        except ConflitMasse as e:
+            categories_ns.abort(409, str(e))
+        except Exception as e:
+            categories_ns.abort(500, f"Erreur lors de la modification en masse: {str(e)}")
+
+    @categories_ns.doc('supprimer_categories_masse',
+                      responses={
+                          200: 'Lignes supprimées',
+                          400: 'Requête invalide',
+                          409: 'Lignes encore référencées',
+                          500: 'Erreur serveur'
+                      })
+    @categories_ns.expect(models['operation_masse'])
+    @categories_ns.marshal_with(models['resultat_masse'])
+    def delete(self):
+        """🗑️ Supprimer en masse des catégories
+
+        Un seul DELETE ensembliste ; les références nullables sont remises à NULL.
+        """
+        try:
+            return supprimer_en_masse(Categorie, request.get_json() or {}, FILTRES_MASSE), 200
+        except OperationMasseInvalide as e:
+            categories_ns.abort(400, str(e))
+        except ConflitMasse as e:
+            categories_ns.abort(409, str(e))
+        except Exception as e:
+            categories_ns.abort(500, f"Erreur lors de la suppression en masse: {str(e)}")
+
 @categories_ns.route('/<int:categorie_id>')
 @categories_ns.param('categorie_id', 'ID de la catégorie')
 class CategoriesDetail(Resource):
     @categories_ns.marshal_with(models['categorie'])
+    @lecture_seule
     def get(self, categorie_id):
         """🔍 Obtenir une catégorie par ID"""
         categorie = Categorie.query.get_or_404(categorie_id)
@@ -0,0 +1,72 @@
+from flask_restx import Namespace, Resource
+from app.comptoir import AUTORISE, UtilisateurInconnu, comptoir_courant, verifier_en_base
+from app.db.transactions import lecture_seule
+from app.monitoring.metrics import registre
+
+# Namespace Swagger des bornes de cafétéria (hors limite d'admission des allergies)
+comptoir_ns = Namespace(
+    "comptoir",
+    description="🍱 Vérifications à faible latence au comptoir de la cafétéria (badge + plat)",
+    path='/comptoir'
+)
+
+
+@lecture_seule
+def _verdict_en_base(user_id, aliment_id=None, recette_id=None):
+    return verifier_en_base(user_id, aliment_id, recette_id)
+
+
+def repondre(user_id, aliment_id=None, recette_id=None):
+    """Verdict depuis la mémoire du worker ; la base ne sert qu'en attente d'une reconstruction"""
+    comptoir = comptoir_courant()
+    source, absent = 'base', False
+    if comptoir is not None and comptoir.pret(user_id):
+        try:
+            resultat, source = comptoir.verifier(user_id, aliment_id, recette_id), 'memoire'
+        except UtilisateurInconnu:
+            absent = True  # badge absent de la structure : la base tranche
+    if source == 'base':
+        try:
+            resultat = _verdict_en_base(user_id, aliment_id, recette_id)
+        except UtilisateurInconnu:
+            comptoir_ns.abort(404, f'Utilisateur {user_id} introuvable')
+        if absent:
+            # Utilisateur créé depuis le chargement : ajouté à la structure à sa prochaine lecture
+            comptoir.invalider([user_id])
+    if resultat is None:
+        plat = f'Aliment {aliment_id}' if aliment_id is not None else f'Recette {recette_id}'
+        comptoir_ns.abort(404, f'{plat} introuvable')
+    statut, allergenes = resultat
+    registre.incrementer('counter_checks_total', statut=statut, source=source)
+    reponse = {
+        'utilisateur_id': user_id,
+        'peut_manger': statut == AUTORISE,
+        'statut': statut,
+        'allergenes': allergenes,
+        'source': source
+    }
+    if aliment_id is not None:
+        reponse['aliment_id'] = aliment_id
+    else:
+        reponse['recette_id'] = recette_id
+    return reponse, 200
+
+
+@comptoir_ns.route('/<int:user_id>/aliments/<int:aliment_id>')
+@comptoir_ns.param('user_id', 'ID de l\'utilisateur (badge)')
+@comptoir_ns.param('aliment_id', 'ID de l\'aliment servi')
+class ComptoirAliment(Resource):
+    @comptoir_ns.doc('comptoir_aliment', responses={200: 'Verdict', 404: 'Aliment introuvable'})
+    def get(self, user_id, aliment_id):
+        """🍱 **Comptoir** - L'utilisateur peut-il manger cet aliment ? (sans requête SQL)"""
+        return repondre(user_id, aliment_id=aliment_id)
+
+
+@comptoir_ns.route('/<int:user_id>/recettes/<int:recette_id>')
+@comptoir_ns.param('user_id', 'ID de l\'utilisateur (badge)')
+@comptoir_ns.param('recette_id', 'ID de la recette servie')
+class ComptoirRecette(Resource):
+    @comptoir_ns.doc('comptoir_recette', responses={200: 'Verdict', 404: 'Recette introuvable'})
+    def get(self, user_id, recette_id):
+        """🍱 **Comptoir** - L'utilisateur peut-il manger cette recette ? (sans requête SQL)"""
+        return repondre(user_id, recette_id=recette_id)
@@ -0,0 +1,12 @@
+from flask import Blueprint, Response, current_app
+from app.monitoring.metrics import lire_instantanes, rendre_prometheus
+
+# Blueprint Flask pour l'exposition Prometheus (hors préfixe /api)
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Exposition des métriques au format texte Prometheus (tous workers confondus)"""
+    instantanes = lire_instantanes(current_app.config.get('METRICS_MULTIPROC_DIR'))
+    return Response(rendre_prometheus(instantanes), mimetype='text/plain; version=0.0.4')
@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from flask_restx import Namespace, Resource, fields
 from app.db.db import db
 from app.model import Aliment, Recette, create_swagger_models
+from app.reactivite import graphe_courant
 
 planificateur_bp = Blueprint('planificateur', __name__)
 
@@ -30,6 +31,7 @@ def create_planificateur_models(api):
         'recettes_recommandes': fields.List(fields.Raw, description='Recettes recommandées'),
         'total_aliments': fields.Integer(description='Nombre d\'aliments trouvés'),
         'total_recettes': fields.Integer(description='Nombre de recettes trouvées'),
+        'aliments_exclus': fields.Integer(description='Aliments écartés par les allergènes (réactivité croisée comprise)'),
         'criteres_appliques': fields.Raw(description='Critères de filtrage appliqués'),
         'message': fields.String(description='Message de résultat')
     })
@@ -79,6 +81,14 @@ class PlanificateurFiltrer(Resource):
             
             aliments_filtres = query_aliments.all()
             
+            # Allergènes : aliments qui les portent, réactivité croisée comprise (fermeture précalculée)
+            graphe = graphe_courant()
+            allergie_ids, allergenes_inconnus = graphe.retrouver(allergenes)
+            masque = graphe.masque_etendu(allergie_ids)
+            nombre_aliments = len(aliments_filtres)
+            if masque:
+                aliments_filtres = [a for a in aliments_filtres if not masque & graphe.allergenes(a.id)]
+            
             # Filtrage des recettes
             query_recettes = Recette.query
             
@@ -96,17 +106,16 @@ class PlanificateurFiltrer(Resource):
                 # Filtrer les aliments/recettes végétariennes
                 pass
             
-            if 'gluten' in [a.lower() for a in allergenes]:
-                # Exclure les aliments contenant du gluten
-                pass
-            
             return {
                 'aliments_recommandes': [aliment.to_dict() for aliment in aliments_filtres[:10]],  # Limiter à 10
                 'recettes_recommandes': [recette.to_dict() for recette in recettes_filtrees[:10]],  # Limiter à 10
                 'total_aliments': len(aliments_filtres),
                 'total_recettes': len(recettes_filtrees),
+                'aliments_exclus': nombre_aliments - len(aliments_filtres),
                 'criteres_appliques': {
                     'allergenes': allergenes,
+                    'allergenes_exclus': graphe.decoder(masque),
+                    'allergenes_inconnus': allergenes_inconnus,
                     'preferences': preferences,
                     'calories_max': calories_max,
                     'type_regime': type_regime,
@@ -0,0 +1,97 @@
+from flask import request
+from flask_restx import Namespace, Resource
+from app.db.db import db
+from app.db.transactions import lecture_seule
+from app.model import Aliment, Allergie, ReactiviteCroisee
+from app.reactivite import graphe_courant
+
+# Namespace Swagger du graphe de réactivité croisée entre allergies et aliments
+reactivite_ns = Namespace(
+    "reactivites",
+    description="🦐 Graphe de réactivité croisée (familles d'allergènes, aliments porteurs)",
+    path='/reactivites'
+)
+
+reactivite_model = ReactiviteCroisee.get_swagger_model(reactivite_ns)
+reactivite_input_model = ReactiviteCroisee.get_swagger_input_model(reactivite_ns)
+
+
+@reactivite_ns.route('/')
+class ReactivitesList(Resource):
+    @reactivite_ns.marshal_list_with(reactivite_model)
+    @lecture_seule
+    def get(self):
+        """📋 Liste les arêtes du graphe de réactivité croisée"""
+        return [arete.to_dict() for arete in ReactiviteCroisee.query.order_by(ReactiviteCroisee.id).all()], 200
+
+    @reactivite_ns.doc('creer_reactivite', responses={
+        201: 'Arête créée',
+        400: 'Arête invalide',
+        404: 'Allergie ou aliment introuvable'
+    })
+    @reactivite_ns.expect(reactivite_input_model)
+    def post(self):
+        """➕ Relier une allergie à une allergie liée ou à un aliment porteur"""
+        data = request.get_json(silent=True) or {}
+        allergie_id, allergie_liee_id, aliment_id = (data.get(cle) for cle in ('allergie_id', 'allergie_liee_id', 'aliment_id'))
+        if not isinstance(allergie_id, int) or (allergie_liee_id is None) == (aliment_id is None):
+            return {'message': "Indiquez 'allergie_id' et exactement une cible : 'allergie_liee_id' ou 'aliment_id'"}, 400
+        if allergie_liee_id == allergie_id:
+            return {'message': 'Une allergie ne peut pas être reliée à elle-même'}, 400
+        if db.session.get(Allergie, allergie_id) is None:
+            return {'message': f'Allergie {allergie_id} introuvable'}, 404
+        if allergie_liee_id is not None and db.session.get(Allergie, allergie_liee_id) is None:
+            return {'message': f'Allergie {allergie_liee_id} introuvable'}, 404
+        if aliment_id is not None and db.session.get(Aliment, aliment_id) is None:
+            return {'message': f'Aliment {aliment_id} introuvable'}, 404
+
+        try:
+            arete = ReactiviteCroisee(
+                allergie_id=allergie_id,
+                allergie_liee_id=allergie_liee_id,
+                aliment_id=aliment_id,
+                bidirectionnelle=bool(data.get('bidirectionnelle', True)),
+                description=data.get('description')
+            )
+            db.session.add(arete)
+            # Le commit émet catalogue_modifie : graphe et index du worker sont rechargés
+            db.session.commit()
+            return arete.to_dict(), 201
+        except Exception as e:
+            db.session.rollback()
+            return {'message': f'Erreur lors de la création: {str(e)}'}, 500
+
+
+@reactivite_ns.route('/<int:reactivite_id>')
+@reactivite_ns.param('reactivite_id', 'ID de l\'arête')
+class ReactiviteResource(Resource):
+    @reactivite_ns.doc('supprimer_reactivite', responses={204: 'Arête supprimée', 404: 'Arête introuvable'})
+    def delete(self, reactivite_id):
+        """🗑️ Supprimer une arête du graphe"""
+        arete = db.session.get(ReactiviteCroisee, reactivite_id)
+        if arete is None:
+            return {'message': f'Arête {reactivite_id} introuvable'}, 404
+        db.session.delete(arete)
+        db.session.commit()
+        return '', 204
+
+
+@reactivite_ns.route('/fermeture/<int:allergie_id>')
+@reactivite_ns.param('allergie_id', 'ID de l\'allergie')
+class ReactiviteFermeture(Resource):
+    @reactivite_ns.doc('fermeture_reactivite', responses={200: 'Fermeture', 404: 'Allergie introuvable'})
+    @lecture_seule
+    def get(self, allergie_id):
+        """🔗 Allergies liées et aliments à éviter pour une allergie (fermeture transitive précalculée)"""
+        graphe = graphe_courant([allergie_id])
+        fermeture = graphe.fermeture(allergie_id)
+        if fermeture is None:
+            return {'message': f'Allergie {allergie_id} introuvable'}, 404
+        allergies_liees, aliments = fermeture
+        return {
+            'allergie_id': allergie_id,
+            'allergie': graphe.noms[graphe.rangs[allergie_id]],
+            'allergies_liees': allergies_liees,
+            'aliments_a_eviter': aliments,
+            'total_aliments': len(aliments)
+        }, 200
@@ -3,6 +3,8 @@ from flask_restx import Namespace, Resource
 from app.db.db import db
 from app.model import Recette
 from app.model import create_swagger_models
+from app.db.transactions import lecture_seule
+from app.db.bulk import ConflitMasse, OperationMasseInvalide, mettre_a_jour_en_masse, supprimer_en_masse
 
 # Blueprint Flask existant
 recettes_bp = Blueprint('recettes', __name__)
@@ -15,12 +17,17 @@ recettes_ns = Namespace('recettes',
 # Créer les modèles Swagger
 models = create_swagger_models(recettes_ns)
 
+# Opérations en masse : colonnes modifiables et filtres acceptés
+CHAMPS_MODIFIABLES = ('nom', 'description', 'instructions', 'temps_preparation', 'difficulte', 'portions')
+FILTRES_MASSE = ('nom', 'difficulte', 'portions')
+
 # ============= ROUTES SWAGGER API (NOUVELLES) =============
 
 @recettes_ns.route('/')
 class RecettesList(Resource):
     @recettes_ns.doc('liste_recettes')
     @recettes_ns.marshal_list_with(models['recette'])
+    @lecture_seule
     def get(self):
         """📋 Récupérer toutes les recettes"""
         try:
@@ -61,11 +68,60 @@ class RecettesList(Resource):
             db.session.rollback()
             recettes_ns.abort(500, f"Erreur lors de la création: {str(e)}")
 
+@recettes_ns.route('/masse')
+class RecettesMasse(Resource):
+    @recettes_ns.doc('modifier_recettes_masse',
+                    responses={
+                        200: 'Lignes modifiées',
+                        400: 'Requête invalide',
+                        409: 'Nom déjà utilisé ou contrainte violée',
+                        500: 'Erreur serveur'
+                    })
+    @recettes_ns.expect(models['operation_masse'])
+    @recettes_ns.marshal_with(models['resultat_masse'])
+    def patch(self):
+        """✏️ Modifier en masse des recettes
+
+        Un seul UPDATE ensembliste sur les `ids` et/ou le `filtre` fournis.
+        """
+        try:
+            return mettre_a_jour_en_masse(Recette, request.get_json() or {}, CHAMPS_MODIFIABLES, FILTRES_MASSE), 200
+        except OperationMasseInvalide as e:
+            recettes_ns.abort(400, str(e))
+        except ConflitMasse as e:
+            recettes_ns.abort(409, str(e))
+        except Exception as e:
+            recettes_ns.abort(500, f"Erreur lors de la modification en masse: {str(e)}")
+
+    @recettes_ns.doc('supprimer_recettes_masse',
+                    responses={
+                        200: 'Lignes supprimées',
+                        400: 'Requête invalide',
+                        409: 'Lignes encore référencées',
+                        500: 'Erreur serveur'
+                    })
+    @recettes_ns.expect(models['operation_masse'])
+    @recettes_ns.marshal_with(models['resultat_masse'])
+    def delete(self):
+        """🗑️ Supprimer en masse des recettes
+
+        Un seul DELETE ensembliste ; les références nullables sont remises à NULL.
+        """
+        try:
+            return supprimer_en_masse(Recette, request.get_json() or {}, FILTRES_MASSE), 200
+        except OperationMasseInvalide as e:
+            recettes_ns.abort(400, str(e))
+        except ConflitMasse as e:
+            recettes_ns.abort(409, str(e))
+        except Exception as e:
+            recettes_ns.abort(500, f"Erreur lors de la suppression en masse: {str(e)}")
+
 @recettes_ns.route('/<int:recette_id>')
 @recettes_ns.param('recette_id', 'ID unique de la recette')
 class RecetteDetail(Resource):
     @recettes_ns.doc('obtenir_recette')
     @recettes_ns.marshal_with(models['recette'])
+    @lecture_seule
     def get(self, recette_id):
         """🔍 Obtenir une recette par son ID"""
         recette = Recette.query.get_or_404(recette_id)
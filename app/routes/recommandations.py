@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_restx import Namespace, Resource
+from sqlalchemy import select
+from werkzeug.exceptions import NotFound
 from app.db.db import db
 from app.model import Recommandation
 from app.model import Utilisateur
@@ -137,14 +139,31 @@ class RecommandationsByUser(Resource):
         Retourne toutes les recommandations personnalisées pour un utilisateur.
         """
         try:
-            # Vérifier que l'utilisateur existe
-            utilisateur = Utilisateur.query.get_or_404(utilisateur_id)
-            
-            recommandations = Recommandation.query.filter_by(utilisateur_id=utilisateur_id).all()
-            return [recommandation.to_dict() for recommandation in recommandations], 200
+            resultats = {
+                nom: db.session.execute(requete).all()
+                for nom, requete in self.requetes(utilisateur_id).items()
+            }
+            return self.construire(resultats), 200
             
+        except NotFound:
+            raise
         except Exception as e:
             recommandations_ns.abort(500, f"Erreur lors de la récupération: {str(e)}")
+    
+    @staticmethod
+    def requetes(utilisateur_id):
+        """Requêtes de l'endpoint (partagées avec le mode ASGI asynchrone)"""
+        return {
+            # Vérifier que l'utilisateur existe
+            'utilisateur': select(Utilisateur.id).where(Utilisateur.id == utilisateur_id),
+            'recommandations': select(Recommandation).where(Recommandation.utilisateur_id == utilisateur_id)
+        }
+    
+    @staticmethod
+    def construire(resultats):
+        if not resultats['utilisateur']:
+            raise NotFound()
+        return [recommandation.to_dict() for recommandation, in resultats['recommandations']]
 
 @recommandations_ns.route('/top/<int:limite>')
 @recommandations_ns.param('limite', 'Nombre de recommandations à retourner')
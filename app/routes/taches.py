@@ -0,0 +1,40 @@
+from flask_restx import Namespace, Resource
+from sqlalchemy import func, select
+from app.db.db import db
+from app.db.transactions import lecture_seule
+from app.model import Tache
+
+# Namespace Swagger pour le suivi des tâches de fond
+taches_ns = Namespace(
+    "taches",
+    description="⏳ Suivi des tâches de fond (détection automatique d'allergies, ...)",
+    path='/taches'
+)
+
+
+@taches_ns.route('/')
+class TachesResume(Resource):
+    @taches_ns.doc('resume_taches')
+    @lecture_seule
+    def get(self):
+        """📊 État de la file : nombre de tâches par type et par statut"""
+        lignes = db.session.execute(
+            select(Tache.type, Tache.statut, func.count(Tache.id)).group_by(Tache.type, Tache.statut)
+        ).all()
+        resume = {}
+        for type_tache, statut, nombre in lignes:
+            resume.setdefault(type_tache, {})[statut] = nombre
+        return {'taches': resume}, 200
+
+
+@taches_ns.route('/<int:tache_id>')
+@taches_ns.param('tache_id', 'ID de la tâche renvoyé à sa création')
+class TacheDetail(Resource):
+    @taches_ns.doc('obtenir_tache', responses={200: 'État de la tâche', 404: 'Tâche introuvable'})
+    @lecture_seule
+    def get(self, tache_id):
+        """🔍 Suivre une tâche : statut, tentatives et résultat une fois terminée"""
+        tache = db.session.get(Tache, tache_id)
+        if tache is None:
+            taches_ns.abort(404, f"Tâche {tache_id} introuvable")
+        return tache.to_dict(), 200
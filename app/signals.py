@@ -0,0 +1,82 @@
+from blinker import Namespace
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from app.db.db import db
+
+# Signaux internes de l'application (blinker, déjà utilisé par Flask)
+signaux = Namespace()
+
+# Émis après le commit d'une écriture sur le catalogue (aliments, recettes, catégories, allergies,
+# arêtes de réactivité croisée).
+# Arguments : entite (nom de table), operation ('insert' | 'update' | 'delete'), ids (lignes touchées).
+# Les caches et index en mémoire s'y abonnent pour s'invalider.
+catalogue_modifie = signaux.signal('catalogue-modifie')
+
+TABLES_CATALOGUE = ('aliments', 'recettes', 'categories', 'allergies', 'reactivites_croisees')
+
+# Émis après le commit d'une écriture touchant les allergies d'utilisateurs (réactions, allergies confirmées).
+# Argument : utilisateurs (ids touchés, ou None si l'écriture ne peut pas leur être attribuée).
+allergies_modifiees = signaux.signal('allergies-modifiees')
+
+TABLES_ALLERGIES_UTILISATEUR = ('reactions_allergiques', 'allergies_utilisateur')
+
+
+def notifier_catalogue(entite, operation, ids):
+    """Envoyer catalogue_modifie (appelé après commit)"""
+    if ids and has_app_context():
+        catalogue_modifie.send(current_app._get_current_object(), entite=entite, operation=operation, ids=list(ids))
+
+
+def signaler_catalogue(session, entite, operation, ids):
+    """Écriture hors ORM sur le catalogue : catalogue_modifie partira au commit"""
+    session.info.setdefault('catalogue_modifie', {}).setdefault((entite, operation), set()).update(ids)
+
+
+def signaler_allergies(session, utilisateurs=None):
+    """Écriture hors ORM (insert en masse, INSERT … SELECT) : allergies_modifiees partira au commit"""
+    if utilisateurs is None:
+        session.info['allergies_toutes'] = True
+    else:
+        session.info.setdefault('allergies_modifiees', set()).update(utilisateurs)
+
+
+# ----- écritures ORM unitaires : collectées au flush, notifiées au commit -----
+
+def _collecter(session, contexte):
+    # Après le flush, new/dirty/deleted reflètent encore l'état d'avant et les ids sont attribués
+    changements = session.info.setdefault('catalogue_modifie', {})
+    for operation, objets in (('insert', session.new), ('update', session.dirty), ('delete', session.deleted)):
+        for objet in objets:
+            table = getattr(objet, '__tablename__', None)
+            if table in TABLES_CATALOGUE:
+                changements.setdefault((table, operation), set()).add(objet.id)
+            elif table in TABLES_ALLERGIES_UTILISATEUR:
+                signaler_allergies(session, [objet.utilisateur_id])
+            elif table == 'utilisateurs' and operation == 'delete':
+                # Profil supprimé : retiré des structures en mémoire (badge refusé au comptoir)
+                signaler_allergies(session, [objet.id])
+            if table == 'allergies' and operation != 'insert':
+                # Renommer une allergie change les aliments qu'elle désigne, pour tous ses porteurs
+                signaler_allergies(session)
+
+
+def _notifier(session):
+    changements = session.info.pop('catalogue_modifie', None)
+    for (entite, operation), ids in (changements or {}).items():
+        notifier_catalogue(entite, operation, sorted(ids))
+    toutes = session.info.pop('allergies_toutes', False)
+    utilisateurs = session.info.pop('allergies_modifiees', None)
+    if (toutes or utilisateurs) and has_app_context():
+        allergies_modifiees.send(current_app._get_current_object(),
+                                 utilisateurs=None if toutes else sorted(utilisateurs))
+
+
+def _oublier(session):
+    session.info.pop('catalogue_modifie', None)
+    session.info.pop('allergies_modifiees', None)
+    session.info.pop('allergies_toutes', None)
+
+
+event.listen(db.session, 'after_flush', _collecter)
+event.listen(db.session, 'after_commit', _notifier)
+event.listen(db.session, 'after_soft_rollback', lambda session, transaction: _oublier(session))
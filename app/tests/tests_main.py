@@ -2,7 +2,7 @@ import pytest
 from datetime import date, datetime
 from app.model import (
     db, Utilisateur, Aliment, Categorie, Recette, Menu, Buffet, 
-    Recommandation, Allergie, ReactionAllergique, AllergieUtilisateur
+    Recommandation, Allergie, ReactionAllergique, AllergieUtilisateur, ReactiviteCroisee
 )
 
 # ============= TESTS DES MODÈLES DE BASE =============
@@ -541,4 +541,1199 @@ def test_stats_allergies_utilisateur(db_session):
     assert total_reactions == 3
     assert len(allergies_detectees) == 2  # Aliment 1 et 3
     assert allergies_detectees[0].probabilite_allergie() == 50.0
-    assert allergies_detectees[1].probabilite_allergie() == 40.0
\ No newline at end of file
+    assert allergies_detectees[1].probabilite_allergie() == 40.0
+
+# ============= TESTS DES TRANSACTIONS EN LECTURE SEULE =============
+
+def test_lecture_seule_bloque_ecriture(app):
+    """Une écriture dans un handler décoré doit échouer puis la session redevient utilisable"""
+    from app.db.transactions import lecture_seule
+
+    @lecture_seule
+    def handler():
+        db.session.add(Categorie(nom='Interdite', description='Test'))
+        db.session.flush()
+
+    with app.test_request_context():
+        with pytest.raises(Exception):
+            handler()
+
+    assert not db.session().in_transaction()
+    db.session.add(Categorie(nom='Autorisée', description='Test'))
+    db.session.commit()
+    assert Categorie.query.filter_by(nom='Autorisée').count() == 1
+
+def test_lecture_seule_libere_connexion(test_client):
+    """Les GET décorés rendent la connexion avant la fin de la requête"""
+    response = test_client.get('/api/aliments')
+    assert response.status_code == 200
+    assert not db.session().in_transaction()
+
+# ============= TESTS DE L'INSTRUMENTATION SQL =============
+
+def test_entetes_requetes_sql(test_client):
+    """Les réponses exposent le nombre de requêtes SQL hors production"""
+    response = test_client.get('/api/categories')
+    assert response.status_code == 200
+    assert int(response.headers['X-DB-Queries']) >= 1
+    assert response.headers['Server-Timing'].startswith('db;dur=')
+
+def test_budget_requetes_sql_depasse(app, test_client):
+    """En mode test, une requête qui dépasse le budget SQL échoue"""
+    from app.monitoring.sql_stats import BudgetRequetesDepasse
+
+    app.config['SQL_QUERY_BUDGET'] = 0
+    with pytest.raises(BudgetRequetesDepasse):
+        test_client.get('/api/categories')
+
+# ============= TESTS DES MÉTRIQUES =============
+
+def test_metrics_prometheus(test_client):
+    """L'endpoint /metrics expose compteurs et histogrammes par endpoint"""
+    test_client.get('/api/categories')
+    response = test_client.get('/metrics')
+    assert response.status_code == 200
+
+    texte = response.get_data(as_text=True)
+    assert '# TYPE http_requests_total counter' in texte
+    assert 'http_request_duration_seconds_bucket{endpoint="categories_categories_list",le="+Inf"}' in texte
+    assert 'quantile="0.99"' in texte
+
+def test_metrics_fusion_workers(tmp_path):
+    """Les instantanés de plusieurs workers sont additionnés"""
+    from app.monitoring.metrics import RegistreMetriques, fusionner, quantile
+
+    workers = [RegistreMetriques(), RegistreMetriques()]
+    for worker in workers:
+        worker.incrementer('http_requests_total', endpoint='test')
+        worker.observer('http_request_duration_seconds', 0.02, endpoint='test')
+
+    compteurs, _, histogrammes = fusionner([w.instantane() for w in workers])
+    assert compteurs[('http_requests_total', (('endpoint', 'test'),))] == 2
+    histo = histogrammes[('http_request_duration_seconds', (('endpoint', 'test'),))]
+    assert histo['total'] == 2
+    assert 0.01 < quantile(histo['buckets'], 0.5) <= 0.025
+
+def test_metrics_workers_arretes(tmp_path):
+    """Le fichier d'un worker arrêté n'est plus additionné et il est supprimé"""
+    import json, os, subprocess, sys
+    from app.monitoring.metrics import RegistreMetriques, lire_instantanes
+
+    instantane = RegistreMetriques()
+    instantane.definir('allergy_index_users', 7)
+    mort = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                          capture_output=True, text=True).stdout.strip()
+    for pid in (mort, os.getppid()):
+        (tmp_path / f'metrics_{pid}.json').write_text(json.dumps(instantane.instantane()))
+
+    assert len(lire_instantanes(str(tmp_path))) == 2  # worker courant + parent vivant
+    assert not (tmp_path / f'metrics_{mort}.json').exists()
+
+# ============= TESTS DU PROFILAGE À LA DEMANDE =============
+
+def test_profilage_a_la_demande(app, test_client):
+    """Une requête admin avec X-Profile est profilée et consultable"""
+    app.config['ADMIN_TOKEN'] = 'jeton-test'
+    admin = {'X-Admin-Token': 'jeton-test'}
+
+    response = test_client.get('/api/aliments', headers={**admin, 'X-Profile': '1', 'X-Request-ID': 'req-42'})
+    assert response.status_code == 200
+    profil_id = response.headers['X-Profile-Id']
+    assert profil_id.startswith('req-42-')
+
+    rapport = test_client.get(f'/api/admin/profils/{profil_id}', headers=admin)
+    assert rapport.status_code == 200
+    assert rapport.get_json()['profil']['endpoint'] == 'aliments_aliments_list'
+    assert rapport.get_json()['profil']['request_id'] == 'req-42'
+
+    replie = test_client.get(f'/api/admin/profils/{profil_id}?format=collapsed', headers=admin)
+    assert replie.status_code == 200
+    assert ';' in replie.get_data(as_text=True)
+
+    # Un X-Request-ID réutilisé n'écrase pas le profil précédent
+    autre = test_client.get('/api/aliments', headers={**admin, 'X-Profile': '1', 'X-Request-ID': 'req-42'})
+    assert autre.headers['X-Profile-Id'] != profil_id
+    assert test_client.get(f'/api/admin/profils/{profil_id}', headers=admin).status_code == 200
+
+def test_profils_persistes_bornes(app, test_client, tmp_path):
+    """PROFILER_DIR ne conserve que les profils les plus récents"""
+    app.config.update(ADMIN_TOKEN='jeton-test', PROFILER_DIR=str(tmp_path), PROFILER_DIR_MAX_PROFILES=2)
+    admin = {'X-Admin-Token': 'jeton-test', 'X-Profile': '1'}
+    for _ in range(4):
+        assert test_client.get('/api/aliments', headers=admin).status_code == 200
+    assert len(list(tmp_path.glob('*.json'))) == 2
+    assert len(list(tmp_path.glob('*.pstats'))) == 2
+
+def test_profilage_refuse_sans_jeton(app, test_client):
+    """Sans jeton valide, pas de profilage ni d'accès admin"""
+    app.config['ADMIN_TOKEN'] = 'jeton-test'
+    response = test_client.get('/api/aliments', headers={'X-Profile': '1'})
+    assert 'X-Profile-Id' not in response.headers
+    assert test_client.get('/api/admin/profils').status_code == 403
+
+# ============= TESTS DE L'ÉCHANTILLONNEUR DE PILES =============
+
+def test_echantillonneur_piles_bornees(tmp_path):
+    """Les piles des threads de requête sont comptées avec une mémoire bornée"""
+    import threading
+    from app.monitoring.sampler import EchantillonneurPiles, DEBORDEMENT
+
+    echantillonneur = EchantillonneurPiles(max_piles=1, dossier=str(tmp_path))
+    pret, fin = threading.Event(), threading.Event()
+
+    def requete(endpoint):
+        echantillonneur.entrer(endpoint)
+        pret.set()
+        fin.wait(5)
+        echantillonneur.sortir()
+
+    threads = [threading.Thread(target=requete, args=(nom,)) for nom in ('a', 'b')]
+    for thread in threads:
+        thread.start()
+        pret.wait(5)
+        pret.clear()
+
+    echantillonneur.echantillonner()
+    fin.set()
+    for thread in threads:
+        thread.join()
+
+    replie = echantillonneur.replie()
+    assert echantillonneur.echantillons == 2
+    assert DEBORDEMENT in replie
+    assert echantillonneur.statistiques()['piles_distinctes'] == 2
+
+    chemin = echantillonneur.pivoter()
+    assert chemin.endswith('.folded')
+    assert echantillonneur.replie() == ''
+
+# ============= TESTS DU SUIVI MÉMOIRE =============
+
+def test_suivi_memoire_croissances(app, test_client):
+    """Le suivi tracemalloc rapporte les sites d'allocation en croissance"""
+    app.config['ADMIN_TOKEN'] = 'jeton-test'
+    admin = {'X-Admin-Token': 'jeton-test'}
+
+    response = test_client.post('/api/admin/memoire/demarrer', json={'intervalle': 0}, headers=admin)
+    assert response.status_code == 200
+    assert response.get_json()['actif'] is True
+
+    try:
+        fuite = [bytearray(1024) for _ in range(200)]
+        assert test_client.post('/api/admin/memoire/instantane', headers=admin).status_code == 200
+
+        rapport = test_client.get('/api/admin/memoire?objets=1', headers=admin).get_json()
+        assert len(rapport['instantanes']) == 2
+        assert any(c['taille_diff_ko'] >= 200 for c in rapport['comparaison']['croissances'])
+        assert 'instances_orm' in rapport
+    finally:
+        del fuite
+        test_client.post('/api/admin/memoire/arreter', headers=admin)
+
+# ============= TESTS DU BENCHMARK =============
+
+def test_benchmark_endpoints_petite_echelle(app):
+    """Le benchmark s'exécute sur un petit jeu de données et détecte les régressions"""
+    from benchmarks.bench_endpoints import executer, comparer
+
+    rapport = executer(app, db, {'utilisateurs': 5, 'aliments': 10, 'reactions_par_utilisateur': 3, 'recettes': 5},
+                       iterations=3, echauffement=1)
+    assert rapport['echelle']['reactions'] == 15
+    assert all(r['erreurs'] == 0 for r in rapport['resultats'].values())
+
+    reference = {'resultats': {nom: {'p50_ms': r['p50_ms'] / 10, 'p95_ms': r['p95_ms']}
+                               for nom, r in rapport['resultats'].items()}}
+    regressions = comparer(rapport, reference, tolerance=0.2)
+    assert {r['scenario'] for r in regressions} == set(rapport['resultats'])
+
+def test_generateur_charge_correction_omission():
+    """La latence corrigée inclut l'attente depuis l'instant prévu d'envoi"""
+    from benchmarks.load_generator import parser_mix, resumer
+
+    assert parser_mix('check=60,profil=40') == {'check': 60.0, 'profil': 40.0}
+
+    # (type, prévu, envoi, fin, statut) : la 2e requête a attendu 1 s avant l'envoi
+    mesures = [('check', 0.0, 0.0, 0.01, 200), ('check', 0.1, 1.1, 1.11, 200), ('check', 0.2, 1.11, 1.12, 503)]
+    rapport = resumer(mesures, 2.0, 1.5)
+    global_ = rapport['global']
+    assert global_['latence_service_ms']['p999'] < 20
+    assert global_['latence_corrigee_ms']['p999'] > 900
+    assert global_['taux_erreur_pourcent'] == 33.33
+
+# ============= TESTS DU MODE VOLUME DU SEEDER =============
+
+def test_seeder_volume_ecriture_par_lots():
+    """Les lots executemany sont tous écrits et le format COPY échappe les valeurs spéciales"""
+    import sqlite3
+    from seeder import _ecrire_lots, _valeur_copy
+
+    connexion = sqlite3.connect(':memory:')
+    connexion.execute('CREATE TABLE t (id INTEGER, nom TEXT)')
+    total = _ecrire_lots(connexion, 'sqlite', 't', ('id', 'nom'), ((i, f'n{i}') for i in range(25)), 10)
+    assert total == 25
+    assert connexion.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 25
+
+    assert _valeur_copy(None) == '\\N'
+    assert _valeur_copy(True) == 't'
+    assert _valeur_copy('a\tb\\c\nd') == 'a\\tb\\\\c\\nd'
+
+# ============= TESTS DE L'IMPORT CSV =============
+
+def test_import_csv_aliments_deduplication(test_client):
+    """L'import en flux déduplique par nom normalisé, crée les catégories et met à jour l'existant"""
+    import io as _io
+    from app.signals import catalogue_modifie
+
+    contenu = (
+        "Nom;Energie (kcal/100g);Proteines (g/100g);Lipides;Glucides;Fibres;Groupe\n"
+        "Blé dur;339,5;12,7;2,5;68;traces;Céréales\n"
+        "  ble  DUR ;340;13;2,5;68;-;Céréales\n"
+        "Lentille;116;9;0,4;20;< 8;Légumineuses\n"
+        ";10;1;1;1;1;Céréales\n"
+    )
+    recus = []
+    def abonne(sender, entite, operation, ids):
+        if entite == 'aliments':
+            recus.append((operation, sorted(ids)))
+    catalogue_modifie.connect(abonne)
+    try:
+        response = test_client.post('/api/aliments/import?lot=1', data={
+            'fichier': (_io.BytesIO(contenu.encode('utf-8')), 'ciqual.csv')
+        }, content_type='multipart/form-data')
+    finally:
+        catalogue_modifie.disconnect(abonne)
+    assert response.status_code == 200
+    # Plusieurs lots, mais un seul signal par opération en fin d'import
+    assert [operation for operation, _ in recus] == ['insert', 'update']
+    assert len(recus[0][1]) == 2
+    rapport = response.get_json()
+    assert rapport['lignes'] == 4
+    assert rapport['inserees'] == 2
+    assert rapport['mises_a_jour'] == 1
+    assert rapport['rejetees'] == 1
+    assert rapport['categories_creees'] == 2
+    assert rapport['lignes_par_seconde'] > 0
+
+    aliments = {a['nom']: a for a in test_client.get('/api/aliments/').get_json()}
+    assert set(aliments) == {'Blé dur', 'Lentille'}
+    assert aliments['Blé dur']['calories'] == 340.0
+    assert aliments['Lentille']['fibres'] == 8.0
+
+    # Réimport sans mise à jour : tout est ignoré
+    response = test_client.post('/api/aliments/import?mise_a_jour=false', data=contenu.encode('utf-8'),
+                                content_type='text/csv')
+    assert response.get_json()['ignorees'] == 3
+
+# ============= TESTS DES OPÉRATIONS EN MASSE =============
+
+def test_operations_masse_aliments(test_client, app):
+    """PATCH/DELETE ensemblistes : lignes affectées, signal d'invalidation, références remises à NULL"""
+    from app.signals import allergies_modifiees, catalogue_modifie
+
+    categorie, legumes = Categorie(nom='Fruits masse'), Categorie(nom='Legumes masse')
+    db.session.add_all([categorie, legumes])
+    db.session.flush()
+    aliments = [Aliment(nom=f'Fruit {i}', calories=10, categorie_id=categorie.id) for i in range(3)]
+    autre = Aliment(nom='Legume', calories=20)
+    db.session.add_all(aliments + [autre])
+    utilisateur = Utilisateur(nom='Masse', prenom='Test', email='masse@test.com', mot_de_passe_hash='x')
+    db.session.add(utilisateur)
+    db.session.flush()
+    db.session.add(ReactionAllergique(utilisateur_id=utilisateur.id, aliment_id=aliments[0].id,
+                                      times_eaten=3, times_reacted=1))
+    db.session.commit()
+    ids = [a.id for a in aliments]
+
+    recus = []
+    def abonne(sender, **extra):
+        recus.append(extra)
+    profils = []
+    def abonne_allergies(sender, utilisateurs):
+        profils.append(utilisateurs)
+    catalogue_modifie.connect(abonne)
+    allergies_modifiees.connect(abonne_allergies)
+    try:
+        response = test_client.patch('/api/aliments/masse', json={
+            'filtre': {'categorie_id': categorie.id}, 'valeurs': {'fibres': 2.5}
+        })
+        assert response.status_code == 200
+        assert response.get_json()['lignes_affectees'] == 3
+        assert db.session.get(Aliment, ids[1]).fibres == 2.5
+        assert db.session.get(Aliment, autre.id).fibres == 0
+
+        assert test_client.patch('/api/aliments/masse', json={'valeurs': {'fibres': 1}}).status_code == 400
+        assert test_client.patch('/api/aliments/masse', json={'ids': [autre.id], 'valeurs': {'id': 9}}).status_code == 400
+        assert test_client.patch('/api/aliments/masse', json={
+            'filtre': {'nom': {'a': 1}}, 'valeurs': {'fibres': 1}
+        }).status_code == 400
+        # Nom déjà pris ou attribué à plusieurs lignes : conflit, comme en écriture unitaire
+        assert test_client.patch('/api/aliments/masse', json={'ids': [ids[2]], 'valeurs': {'nom': 'Legume'}}).status_code == 409
+        assert test_client.patch('/api/aliments/masse', json={'ids': ids, 'valeurs': {'nom': 'Fruit'}}).status_code == 409
+        response = test_client.patch('/api/categories/masse', json={'ids': [legumes.id], 'valeurs': {'nom': 'Fruits masse'}})
+        assert response.status_code == 409
+        assert db.session.get(Aliment, ids[2]).nom == 'Fruit 2'
+
+        response = test_client.delete('/api/aliments/masse', json={'ids': ids[:2]})
+        assert response.get_json()['lignes_affectees'] == 2
+        assert ReactionAllergique.query.one().aliment_id is None
+        # La réaction détachée change le profil de son utilisateur
+        assert profils == [[utilisateur.id]]
+
+        # Les écritures unitaires via l'ORM sont aussi notifiées, au commit
+        test_client.put(f'/api/aliments/{autre.id}', json={'nom': 'Legume vert'})
+
+        assert [(r['entite'], r['operation'], r['ids']) for r in recus] == [
+            ('aliments', 'update', ids),
+            ('aliments', 'delete', ids[:2]),
+            ('aliments', 'update', [autre.id])
+        ]
+    finally:
+        catalogue_modifie.disconnect(abonne)
+        allergies_modifiees.disconnect(abonne_allergies)
+
+# ============= TESTS DE L'ENDPOINT BATCH =============
+
+def test_batch_sous_requetes(test_client):
+    """Les sous-requêtes sont dispatchées en interne, dans l'ordre, écritures comprises"""
+    utilisateur = Utilisateur(nom='Batch', prenom='Test', email='batch@test.com', mot_de_passe_hash='x')
+    aliment = Aliment(nom='Noisette batch')
+    db.session.add_all([utilisateur, aliment])
+    db.session.commit()
+
+    response = test_client.post('/api/batch', json={'parallele': True, 'requetes': [
+        {'id': 'aliments', 'path': '/api/aliments/'},
+        {'id': 'profil', 'path': f'/api/allergies/users/{utilisateur.id}/profile'},
+        {'id': 'reaction', 'method': 'POST', 'path': f'/api/allergies/users/{utilisateur.id}/reactions',
+         'body': {'aliment_id': aliment.id, 'times_eaten': 4, 'times_reacted': 3}},
+        {'id': 'check', 'path': f'/api/allergies/check/{utilisateur.id}/{aliment.id}'},
+        {'id': 'inconnu', 'path': '/api/inexistant'},
+        {'id': 'imbrique', 'method': 'POST', 'path': '/api/batch'},
+        {'id': 'entetes', 'path': '/api/aliments/', 'headers': ['X-Test']}
+    ]})
+    assert response.status_code == 200
+    resultats = {r['id']: r for r in response.get_json()['resultats']}
+    assert [r['id'] for r in response.get_json()['resultats']][:2] == ['aliments', 'profil']
+    assert resultats['aliments']['status'] == 200
+    assert resultats['aliments']['body'][0]['nom'] == 'Noisette batch'
+    assert resultats['profil']['status'] == 200
+    assert resultats['reaction']['status'] in (200, 201)
+    # La lecture suivante voit l'écriture qui la précède
+    assert resultats['check']['status'] == 200
+    assert resultats['inconnu']['status'] == 404
+    assert resultats['imbrique']['status'] == 400
+    # Une sous-requête mal formée échoue seule, sans faire tomber le batch
+    assert resultats['entetes']['status'] == 400
+
+    assert test_client.post('/api/batch', json={'requetes': []}).status_code == 400
+
+# ============= TESTS DES REQUÊTES PARALLÈLES =============
+
+def test_requetes_independantes_en_parallele(tmp_path):
+    """Sur un vrai pool de connexions, chaque requête part dans son thread et les stats SQL sont cumulées"""
+    import threading
+    from flask import Flask, g
+    from app.db.concurrence import en_parallele
+    from app.monitoring.sql_stats import StatistiquesSQL, init_sql_stats
+
+    application = Flask(__name__)
+    application.config.from_object('app.config.config.Config')
+    application.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'parallele.db'}"
+    db.init_app(application)
+    init_sql_stats(application)
+
+    with application.app_context():
+        db.create_all()
+        db.session.add_all([Utilisateur(nom='P', prenom=str(i), email=f'p{i}@test.com', mot_de_passe_hash='x')
+                            for i in range(3)])
+        db.session.commit()
+
+        g.sql_stats = StatistiquesSQL()
+        principal = threading.get_ident()
+        resultats = en_parallele({
+            'appelant': lambda: threading.get_ident(),
+            'total': lambda: Utilisateur.query.count(),
+            'premier': lambda: Utilisateur.query.order_by(Utilisateur.id).first(),
+            'thread': lambda: threading.get_ident()
+        })
+        assert resultats['total'] == 3
+        assert resultats['premier'].prenom == '0'
+        assert resultats['thread'] != principal
+        # La première requête reste sur la connexion déjà tenue par le thread appelant
+        assert resultats['appelant'] == principal
+        assert g.sql_stats.requetes >= 2
+
+        # Pool trop petit pour les threads de requête : parallélisme réduit au démarrage
+        from sqlalchemy.pool import QueuePool
+        from app.db.concurrence import borner_fanout
+        pool = QueuePool(lambda: None, pool_size=5, max_overflow=10)
+        application.config.update(WEB_THREADS=8, BATCH_MAX_WORKERS=4, DB_FANOUT_WORKERS=4)
+        assert borner_fanout(application, pool) == 3
+        assert application.config['DB_FANOUT_WORKERS'] == 3
+        application.config['WEB_THREADS'] = 4
+        assert borner_fanout(application, pool) == 3
+
+        application.config['DB_FANOUT_WORKERS'] = 1
+        assert en_parallele({'thread': threading.get_ident, 'autre': lambda: 0})['thread'] == principal
+        db.session.remove()
+        db.drop_all()
+
+# ============= TESTS DU MODE ASGI =============
+
+def test_asgi_lectures_asynchrones(app, tmp_path):
+    """Les lectures critiques passent par le moteur asynchrone, le reste est délégué à Flask"""
+    import asyncio
+    import json as _json
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from app.asgi import creer_application_asgi
+    from app.db.async_engine import LecturesAsync, url_async
+
+    assert str(url_async('postgres://u:p@h/base')).startswith('postgresql+asyncpg://')
+
+    chemin = tmp_path / 'asgi.db'
+    moteur = create_engine(f'sqlite:///{chemin}')
+    db.metadata.create_all(moteur)
+    with Session(moteur) as session:
+        utilisateur = Utilisateur(nom='Async', prenom='Test', email='async@test.com', mot_de_passe_hash='x')
+        aliment = Aliment(nom='Arachide async')
+        session.add_all([utilisateur, aliment])
+        session.flush()
+        session.add(ReactionAllergique(utilisateur_id=utilisateur.id, aliment_id=aliment.id,
+                                       times_eaten=4, times_reacted=3))
+        session.commit()
+        ids = (utilisateur.id, aliment.id)
+    moteur.dispose()
+
+    application = creer_application_asgi(app)
+
+    async def appeler(chemin_http, query_string=b''):
+        messages = []
+        async def recevoir():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        async def envoyer(message):
+            messages.append(message)
+        await application({'type': 'http', 'method': 'GET', 'path': chemin_http, 'raw_path': chemin_http.encode(),
+                           'query_string': query_string, 'headers': [], 'root_path': '', 'scheme': 'http',
+                           'server': ('test', 80), 'http_version': '1.1', 'asgi': {'version': '3.0'}},
+                          recevoir, envoyer)
+        corps = b''.join(m.get('body', b'') for m in messages if m['type'] == 'http.response.body')
+        return messages[0]['status'], _json.loads(corps)
+
+    async def scenario():
+        application.lectures = LecturesAsync(f'sqlite:///{chemin}')
+        try:
+            profil = await appeler(f'/api/allergies/users/{ids[0]}/profile')
+            check = await appeler(f'/api/allergies/check/{ids[0]}/{ids[1]}')
+            absent = await appeler('/api/allergies/users/999/profile')
+            # Avec query string, la route asynchrone passe par Flask (mêmes paramètres qu'en WSGI)
+            compact = await appeler(f'/api/allergies/check/{ids[0]}/{ids[1]}', b'detail=false')
+            # Route non asynchrone : servie par Flask (base du test, vide)
+            flask = await appeler('/api/aliments/')
+        finally:
+            await application.lectures.fermer()
+        return profil, check, absent, flask, compact
+
+    profil, check, absent, flask, compact = asyncio.run(scenario())
+    assert profil[0] == 200
+    assert profil[1]['resume_allergique']['allergies_detectees'] == 1
+    assert profil[1]['analyse_risques_aliments'][0]['aliment']['nom'] == 'Arachide async'
+    assert check[0] == 200 and check[1]['analyse_risque']['niveau_risque'] == 'TRÈS ÉLEVÉ'
+    assert absent[0] == 404
+    assert flask == (200, [])
+    assert compact[0] == 200 and 'evitement' in compact[1]
+
+
+def test_controle_admission(app, test_client):
+    """Limites par route et par namespace, file bornée puis 503 avec Retry-After"""
+    import threading
+    from app.admission import AdmissionRefusee, ControleAdmission, liberer
+
+    controle = ControleAdmission({'allergies': 2, 'allergies_allergy_statistics': 1}, file_max=1, attente_max=0.05)
+    assert [l.nom for l in controle.limiteurs_pour('allergies_allergy_statistics')] == \
+        ['allergies_allergy_statistics', 'allergies']
+    assert controle.limiteurs_pour('aliments_aliments_list') == []
+
+    statistiques = controle.admettre('allergies_allergy_statistics')
+    with pytest.raises(AdmissionRefusee) as refus:
+        controle.admettre('allergies_allergy_statistics')
+    assert refus.value.limite == 'allergies_allergy_statistics'
+
+    # La route est saturée mais il reste une place dans le namespace
+    verification = controle.admettre('allergies_allergy_check')
+    with pytest.raises(AdmissionRefusee) as refus:
+        controle.admettre('allergies_user_allergy_profile')
+    assert refus.value.limite == 'allergies'
+    liberer(verification)
+    assert controle.limiteurs['allergies'].actives == 1
+
+    # Une place libérée pendant l'attente est attribuée à la requête en file
+    threading.Timer(0.02, liberer, [statistiques]).start()
+    statistiques = controle.admettre('allergies_allergy_statistics', attente=2)
+
+    precedent = app.extensions.get('admission')
+    app.extensions['admission'] = controle
+    try:
+        response = test_client.get('/api/allergies/statistics')
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+        assert 'allergies_allergy_statistics' in response.get_json()['message']
+        assert test_client.get('/api/aliments/').status_code == 200
+        assert controle.limiteurs['allergies'].actives == 1
+    finally:
+        app.extensions['admission'] = precedent
+        liberer(statistiques)
+
+    metriques = test_client.get('/metrics').get_data(as_text=True)
+    assert 'admission_rejected_total{limite="allergies_allergy_statistics"}' in metriques
+    assert 'admission_limit{limite="allergies"}' in metriques
+
+
+def test_echeances_requetes(app, test_client):
+    """Échéance par namespace ou en-tête, interruption SQLite et réponse 504"""
+    import time
+    from flask import g
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+    from app.db.echeances import Echeance, delai_requete
+
+    assert delai_requete(app, 'allergies_allergy_statistics') == 10
+    assert delai_requete(app, 'allergies_allergy_check') == 5
+    assert delai_requete(app, 'aliments_aliments_list') == 30
+    assert delai_requete(app, 'allergies_allergy_check', '250') == 0.25
+    assert delai_requete(app, 'allergies_allergy_check', '9999999') == 60
+    assert delai_requete(app, 'allergies_allergy_check', 'abc') == 5
+
+    # Une requête SQLite sans fin est interrompue à l'échéance
+    with app.test_request_context('/'):
+        g.echeance = Echeance(0.05)
+        debut = time.monotonic()
+        with pytest.raises(OperationalError):
+            db.session.execute(text(
+                'WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT count(*) FROM c'
+            )).scalar()
+        assert time.monotonic() - debut < 2
+        assert g.echeance.depassee
+        db.session.rollback()
+        del g.echeance
+        # L'interruption ne survit pas à l'échéance
+        assert db.session.execute(text('SELECT 1')).scalar() == 1
+
+    # Échéance déjà dépassée : l'erreur 500 du handler devient un 504
+    response = test_client.get('/api/allergies/statistics', headers={'X-Request-Timeout': '0.000001'})
+    assert response.status_code == 504
+    assert 'Délai de la requête dépassé' in response.get_json()['message']
+    assert test_client.get('/api/allergies/statistics').status_code == 200
+
+    metriques = test_client.get('/metrics').get_data(as_text=True)
+    assert 'http_request_timeouts_total{endpoint="allergies_allergy_statistics"} 1' in metriques
+
+# ============= TESTS DE LA FILE DE TÂCHES =============
+
+def test_file_taches_detection_allergies(test_client):
+    """La réaction est enregistrée sans détection inline ; le worker traite la tâche, consultable par son id"""
+    from app.db import taches
+    from app.model import Tache
+
+    utilisateur = Utilisateur(nom='File', prenom='Test', email='file@test.com', mot_de_passe_hash='x')
+    arachide, lait = Aliment(nom='Arachide file'), Aliment(nom='Lait file')
+    db.session.add_all([utilisateur, arachide, lait])
+    db.session.commit()
+
+    url = f'/api/allergies/users/{utilisateur.id}/reactions'
+    response = test_client.post(url, json={'aliment_id': arachide.id, 'times_eaten': 4, 'times_reacted': 3})
+    assert response.status_code == 201
+    corps = response.get_json()
+    assert corps['allergie_detectee_automatiquement'] is False
+    tache_id = corps['detection']['tache_id']
+    assert AllergieUtilisateur.query.count() == 0
+    # Réaction non allergique : aucune tâche
+    response = test_client.post(url, json={'aliment_id': lait.id, 'times_eaten': 10, 'times_reacted': 1})
+    assert 'detection' not in response.get_json()
+    test_client.post(url, json={'aliment_id': lait.id, 'times_eaten': 10, 'times_reacted': 5})
+
+    assert test_client.get(f'/api/taches/{tache_id}').get_json()['statut'] == 'en_attente'
+    assert taches.traiter() == 2
+    suivi = test_client.get(f'/api/taches/{tache_id}').get_json()
+    assert suivi['statut'] == 'terminee' and suivi['tentatives'] == 1
+    assert suivi['resultat']['allergies_ajoutees'][0]['nom'] == 'Arachide file'
+    assert {a.allergie.nom for a in AllergieUtilisateur.query.all()} == {'Arachide file', 'Lait file'}
+    assert all(a.detectee_automatiquement for a in AllergieUtilisateur.query.all())
+
+    # Nouvelle tâche pour une allergie déjà connue : rien n'est dupliqué
+    test_client.post(url, json={'aliment_id': arachide.id, 'times_eaten': 5, 'times_reacted': 4})
+    assert taches.traiter() == 1
+    assert AllergieUtilisateur.query.count() == 2
+    assert taches.traiter() == 0
+
+    # Un gestionnaire en erreur est retenté puis marqué en échec
+    taches.enfiler('inconnu', {}, cle='x')
+    db.session.commit()
+    for _ in range(3):
+        taches.traiter(max_tentatives=3)
+    echec = Tache.query.filter_by(type='inconnu').one()
+    assert echec.statut == 'echec' and echec.tentatives == 3 and 'inconnu' in echec.erreur
+
+    # Une tâche abandonnée en cours (worker tué) n'est pas reprise au-delà de ses tentatives
+    bloquee = taches.enfiler('inconnu', {}, cle='y')
+    db.session.commit()
+    bloquee.statut, bloquee.tentatives, bloquee.demarree_at = 'en_cours', 3, datetime(2000, 1, 1)
+    db.session.commit()
+    assert taches.traiter(max_tentatives=3) == 0
+    db.session.refresh(bloquee)
+    assert bloquee.statut == 'echec' and bloquee.verrou is None
+    assert test_client.get('/api/taches/').get_json()['taches']['detection_allergie'] == {'terminee': 3}
+    assert test_client.get('/api/taches/999').status_code == 404
+
+
+def test_backfill_allergies_par_tranches(app):
+    """Les réactions insérées hors API produisent leurs AllergieUtilisateur, tranche par tranche, avec reprise"""
+    from app.db import taches
+    from app.db.backfill import TYPE_BACKFILL, etat_backfill, executer_backfill, planifier_backfill
+
+    utilisateurs = [Utilisateur(nom=f'Bf{i}', prenom='Test', email=f'bf{i}@test.com', mot_de_passe_hash='x')
+                    for i in range(3)]
+    aliments = [Aliment(nom=nom) for nom in ('Sésame bf', 'Soja bf', 'Riz bf')]
+    db.session.add_all(utilisateurs + aliments)
+    db.session.flush()
+    # (utilisateur, aliment, consommations, réactions) : seules les probabilités > 30 % comptent
+    for u, a, mange, reagi in [(0, 0, 4, 3), (0, 1, 10, 3), (1, 0, 2, 1), (1, 2, 0, 0), (2, 1, 3, 2), (2, 2, 10, 4)]:
+        db.session.add(ReactionAllergique(utilisateur_id=utilisateurs[u].id, aliment_id=aliments[a].id,
+                                          times_eaten=mange, times_reacted=reagi))
+    # Allergie déjà connue : pas de doublon
+    db.session.add(Allergie(nom='Sésame bf'))
+    db.session.flush()
+    db.session.add(AllergieUtilisateur(utilisateur_id=utilisateurs[0].id,
+                                       allergie_id=Allergie.query.filter_by(nom='Sésame bf').one().id))
+    db.session.commit()
+
+    campagne, creee = planifier_backfill(tranche=2)
+    assert creee and etat_backfill()['tranches'] == {'en_attente': 3}
+    # Interruption après une tranche : la campagne reprend là où elle s'est arrêtée
+    assert taches.traiter(limite=1, types=[TYPE_BACKFILL]) == 1
+    assert planifier_backfill(tranche=2) == (campagne, False)
+    executer_backfill(app, processus=0)
+
+    etat = etat_backfill()
+    assert etat['tranches'] == {'terminee': 3}
+    attendues = {(utilisateurs[1].id, 'Sésame bf'), (utilisateurs[2].id, 'Soja bf'), (utilisateurs[2].id, 'Riz bf')}
+    ajoutees = {(a.utilisateur_id, a.allergie.nom) for a in AllergieUtilisateur.query.filter_by(detectee_automatiquement=True)}
+    assert ajoutees == attendues and etat['allergies_ajoutees'] == 3
+    assert AllergieUtilisateur.query.count() == 4
+
+    # Campagne suivante : rien à ajouter
+    planifier_backfill(tranche=2)
+    executer_backfill(app, processus=0)
+    assert etat_backfill()['allergies_ajoutees'] == 0
+
+    # Lignes insérées par un worker concurrent entre la lecture et l'INSERT : ignorées, sans erreur
+    from app.db.detection import allergies_par_nom, insert_sans_doublon
+    lien = {'utilisateur_id': utilisateurs[1].id, 'allergie_id': allergies_par_nom(['Sésame bf'])['Sésame bf']}
+    assert db.session.execute(insert_sans_doublon(AllergieUtilisateur, list(lien)).values(**lien)).rowcount == 0
+    assert db.session.execute(insert_sans_doublon(Allergie, ['nom']).values(nom='Sésame bf')).rowcount == 0
+    db.session.commit()
+    assert AllergieUtilisateur.query.count() == 4
+
+# ============= TESTS DES SEUILS DE DÉTECTION =============
+
+def test_seuils_allergie_par_aliment(app, test_client):
+    """Seuil propre à l'aliment ou seuil global, évalué à l'identique en Python et en SQL"""
+    from sqlalchemy import func, inspect, select, text
+
+    utilisateur = Utilisateur(nom='Seuil', prenom='Test', email='seuil@test.com', mot_de_passe_hash='x')
+    sensible, ordinaire = Aliment(nom='Crevette seuil', seuil_allergie=10), Aliment(nom='Pain seuil')
+    db.session.add_all([utilisateur, sensible, ordinaire])
+    db.session.flush()
+    reactions = [
+        ReactionAllergique(utilisateur_id=utilisateur.id, aliment_id=sensible.id, times_eaten=5, times_reacted=1),
+        ReactionAllergique(utilisateur_id=utilisateur.id, aliment_id=ordinaire.id, times_eaten=5, times_reacted=1),
+        ReactionAllergique(utilisateur_id=utilisateur.id, aliment_id=ordinaire.id, times_eaten=10, times_reacted=4),
+        ReactionAllergique(utilisateur_id=utilisateur.id, aliment_id=ordinaire.id, times_eaten=0, times_reacted=0),
+    ]
+    db.session.add_all(reactions)
+    db.session.commit()
+    db.session.expire_all()
+
+    assert [r.is_allergic() for r in reactions] == [True, False, True, False]
+    assert [r.seuil for r in reactions] == [10, 30, 30, 30]
+    assert reactions[0].probabilite_allergie() == 20.0 and reactions[3].probabilite_allergie() == 0.0
+
+    allergiques = db.session.scalars(
+        select(ReactionAllergique.id).where(ReactionAllergique.est_allergique).order_by(ReactionAllergique.id)
+    ).all()
+    assert allergiques == [reactions[0].id, reactions[2].id]
+    moyenne = db.session.scalar(select(func.avg(ReactionAllergique.probabilite)).where(ReactionAllergique.times_eaten > 0))
+    assert round(moyenne, 2) == round((20 + 20 + 40) / 3, 2)
+
+    # Seuil global plus strict : seule la réaction de l'aliment sensible reste allergique
+    app.config['ALLERGY_THRESHOLD_DEFAULT'] = 50
+    try:
+        assert db.session.scalar(select(func.count()).where(ReactionAllergique.est_allergique)) == 1
+        assert not reactions[2].is_allergic()
+    finally:
+        app.config['ALLERGY_THRESHOLD_DEFAULT'] = 30
+
+    resume = test_client.get('/api/allergies/statistics').get_json()['resume_global']
+    assert resume['reactions_au_dessus_du_seuil'] == 2
+    assert test_client.get(f'/api/aliments/{sensible.id}').get_json()['seuil_allergie'] == 10
+
+    index = {i['name']: i for i in inspect(db.engine).get_indexes('reactions_allergiques')}
+    assert 'ix_reactions_candidates' in index
+    definition = db.session.execute(text(
+        "SELECT sql FROM sqlite_master WHERE name = 'ix_reactions_candidates'"
+    )).scalar()
+    assert 'WHERE times_reacted > 0' in definition
+
+    # Seuil de l'allergie portée (par le nom ou par une arête), après celui de l'aliment
+    from app import analytique
+    sauce = Aliment(nom='Sauce seuil')
+    pain = Allergie(nom='Pain seuil', seuil_detection=15)
+    db.session.add_all([sauce, pain, Allergie(nom='Crevette seuil', seuil_detection=50)])
+    db.session.flush()
+    db.session.add_all([
+        ReactiviteCroisee(allergie_id=pain.id, aliment_id=sauce.id),
+        ReactionAllergique(utilisateur_id=utilisateur.id, aliment_id=sauce.id, times_eaten=5, times_reacted=1),
+    ])
+    db.session.commit()
+    db.session.expire_all()
+    reactions = ReactionAllergique.query.order_by(ReactionAllergique.id).all()
+    assert [r.seuil for r in reactions] == [10, 15, 15, 15, 15]
+    assert [r.is_allergic() for r in reactions] == [True, True, True, False, True]
+    assert db.session.scalar(select(func.count()).where(ReactionAllergique.est_allergique)) == 4
+    analytique.invalider()
+    resume = test_client.get('/api/allergies/analytics').get_json()['global']
+    assert resume['reactions_allergiques'] == 4
+
+# ============= TESTS DU MOTEUR ANALYTIQUE =============
+
+def test_analytique_vectorisee(app, test_client):
+    """Agrégats NumPy identiques au calcul ligne à ligne et à la règle SQL"""
+    import numpy as np
+    from sqlalchemy import func, select
+    from app import analytique
+
+    categorie = Categorie(nom='Crustacés analytique')
+    db.session.add(categorie)
+    db.session.flush()
+    crevette = Aliment(nom='Crevette analytique', categorie_id=categorie.id, seuil_allergie=10)
+    pain = Aliment(nom='Pain analytique')
+    utilisateurs = [Utilisateur(nom=f'A{i}', prenom='Test', email=f'analytique{i}@test.com', mot_de_passe_hash='x')
+                    for i in range(3)]
+    db.session.add_all([crevette, pain, *utilisateurs])
+    db.session.flush()
+    for u, aliment, mange, reagi in [(0, crevette, 10, 2), (1, crevette, 30, 1), (2, crevette, 0, 0),
+                                     (0, pain, 20, 8), (1, pain, 5, 1)]:
+        db.session.add(ReactionAllergique(utilisateur_id=utilisateurs[u].id, aliment_id=aliment.id,
+                                          times_eaten=mange, times_reacted=reagi))
+    db.session.commit()
+
+    # Intervalle de Wilson : valeur de référence 2/10 → [5.67 %, 50.98 %]
+    basse, haute = analytique.intervalle_wilson(np.array([2, 0]), np.array([10, 0]))
+    assert (round(basse[0], 2), round(haute[0], 2)) == (5.67, 50.98) and np.isnan(basse[1])
+
+    analytique.invalider()
+    corps = test_client.get('/api/allergies/analytics?min_consommations=30').get_json()
+    resume = corps['global']
+    assert resume['reactions'] == 5 and resume['utilisateurs'] == 3 and resume['aliments'] == 2
+    # Crevette 2/10 (> 10 %) et pain 8/20 (> 30 %) ; 1/30 et 1/5 restent sous leur seuil
+    assert resume['reactions_allergiques'] == 2 == db.session.scalar(
+        select(func.count()).where(ReactionAllergique.est_allergique))
+    assert resume['utilisateurs_avec_allergie'] == 1
+    assert resume['taux_global'] == round(12 / 65 * 100, 2)
+
+    # Pain (25 consommations) sous le minimum demandé : seule la crevette (3/40) est classée
+    aliments = {a['aliment']: a for a in corps['aliments_a_risque']}
+    assert [a['aliment'] for a in corps['aliments_a_risque']] == ['Crevette analytique']
+    assert aliments['Crevette analytique']['taux_global'] == 7.5
+    assert aliments['Crevette analytique']['taux_moyen_par_utilisateur'] == round((20 + 100 / 30) / 2, 2)
+    assert aliments['Crevette analytique']['seuil_allergie'] == 10.0
+    categories = {c['categorie']: c for c in corps['categories']}
+    assert categories['Crustacés analytique']['reactions'] == 3
+    assert categories['Sans catégorie']['reactions_allergiques'] == 1
+    assert sum(tranche['reactions'] for tranche in corps['distribution_taux']) == 4
+    assert corps['calcul']['duree_ms'] >= 0
+
+    # Données servies depuis le cache du worker jusqu'à invalidation
+    db.session.add(ReactionAllergique(utilisateur_id=utilisateurs[2].id, aliment_id=pain.id,
+                                      times_eaten=2, times_reacted=2))
+    db.session.commit()
+    assert test_client.get('/api/allergies/analytics').get_json()['global']['reactions'] == 5
+    analytique.invalider()
+    assert test_client.get('/api/allergies/analytics').get_json()['global']['reactions'] == 6
+
+# ============= TESTS DE L'INDEX DES ALLERGIES EN MÉMOIRE =============
+
+def test_index_allergies_memoire(app, test_client):
+    """Verdicts servis sans SQL, tenus à jour par les écritures ORM, en masse et du catalogue"""
+    from app.db import taches
+    from app.index_allergies import CONFIRMEE, SEUIL
+
+    index = app.extensions['index_allergies']
+    index.intervalle = app.extensions['filtre_bloom'].intervalle = 0
+    utilisateur = Utilisateur(nom='Index', prenom='Test', email='index@test.com', mot_de_passe_hash='x')
+    arachide, kiwi, lait = Aliment(nom='Arachide index'), Aliment(nom='Kiwi index'), Aliment(nom='Lait index')
+    allergie = Allergie(nom='Arachide index')
+    db.session.add_all([utilisateur, arachide, kiwi, lait, allergie])
+    db.session.flush()
+    db.session.add_all([
+        AllergieUtilisateur(utilisateur_id=utilisateur.id, allergie_id=allergie.id),
+        ReactionAllergique(utilisateur_id=utilisateur.id, aliment_id=kiwi.id, times_eaten=10, times_reacted=4),
+        ReactionAllergique(utilisateur_id=utilisateur.id, aliment_id=lait.id, times_eaten=10, times_reacted=1),
+    ])
+    db.session.commit()
+
+    def verdict(aliment):
+        response = test_client.get(f'/api/allergies/check/{utilisateur.id}/{aliment.id}?detail=false')
+        return response.get_json(), int(response.headers['X-DB-Queries'])
+
+    verdict(lait)
+    corps, requetes = verdict(arachide)
+    assert corps['evitement'] and corps['allergie_confirmee'] and requetes == 0
+    assert verdict(kiwi)[0]['au_dessus_du_seuil'] and not verdict(lait)[0]['evitement']
+    assert index.verifier_lot(utilisateur.id, [arachide.id, kiwi.id, lait.id, 999]) == {
+        arachide.id: CONFIRMEE, kiwi.id: SEUIL, lait.id: None, 999: None}
+
+    # Vérification détaillée : la jointure des allergies confirmées n'est plus exécutée
+    response = test_client.get(f'/api/allergies/check/{utilisateur.id}/{arachide.id}')
+    assert response.get_json()['analyse_risque']['niveau_risque'] == 'ALLERGIE CONFIRMÉE'
+    assert int(response.headers['X-DB-Queries']) == 3
+
+    # Écriture ORM : l'utilisateur est rechargé à sa prochaine lecture
+    url = f'/api/allergies/users/{utilisateur.id}/reactions'
+    test_client.post(url, json={'aliment_id': lait.id, 'times_eaten': 10, 'times_reacted': 6})
+    assert verdict(lait)[0]['au_dessus_du_seuil']
+    # Insert en masse de la détection de fond : signalé explicitement
+    assert taches.traiter() == 1
+    assert verdict(lait)[0]['allergie_confirmee']
+
+    # Seuil d'aliment relevé : reconstruction complète
+    assert test_client.put(f'/api/aliments/{kiwi.id}', json={'nom': 'Kiwi index', 'seuil_allergie': 90}).status_code == 200
+    assert not verdict(kiwi)[0]['evitement']
+
+    app.config['ADMIN_TOKEN'] = 'jeton-test'
+    statistiques = test_client.get('/api/admin/index-allergies', headers={'X-Admin-Token': 'jeton-test'}).get_json()
+    assert statistiques == {**statistiques, 'utilisateurs': 1, 'allergies_confirmees': 2,
+                            'reactions_au_dessus_du_seuil': 1, 'octets': 12, 'utilisateurs_a_recharger': 0}
+
+    # Reconstruction en échec : la structure reste marquée périmée
+    index.invalider()
+    construire = index._construire
+    index._construire = lambda utilisateurs=None: 1 / 0
+    try:
+        with pytest.raises(ZeroDivisionError):
+            index.reconstruire()
+        assert index._perime
+    finally:
+        index._construire = construire
+    index.reconstruire()
+    assert not index._perime
+
+    # Invalidation pendant une reconstruction lente : l'ancienne version n'est pas
+    # servie pendant la construction, et la structure reste périmée après elle
+    index.intervalle, index._reconstruction = 60, object()  # thread simulé en cours
+    prets = []
+    def construire_lentement(utilisateurs=None):
+        if utilisateurs is None:
+            prets.append(index.pret(utilisateur.id))
+            index.invalider()
+        return construire(utilisateurs)
+    index._construire = construire_lentement
+    try:
+        index.invalider()
+        index.reconstruire()
+        assert prets == [False] and not index.pret(utilisateur.id)
+    finally:
+        index._construire = construire
+    index.reconstruire()
+    assert index.pret(utilisateur.id)
+    index.intervalle, index._reconstruction = 0, None
+
+def test_filtre_bloom_chemin_negatif(app, test_client):
+    """Paire inconnue : réponse sans base ; écriture ou nouvel aliment allergène : repassage par la base"""
+    import numpy as np
+    from app.filtre_bloom import FiltreBloom
+
+    filtre = FiltreBloom(1000)
+    paires = np.array([[u, a] for u in range(1, 40) for a in range(1, 20)])
+    filtre.ajouter(paires)
+    # Hachage vectorisé à l'insertion et hachage Python à la lecture concordent
+    assert all(filtre.contient(int(u), int(a)) for u, a in paires)
+    assert sum(filtre.contient(u, a) for u in range(100, 200) for a in range(1, 50)) < 200
+
+    # Pas de reconstruction en thread sur la connexion SQLite en mémoire partagée
+    app.extensions['filtre_bloom'].intervalle = app.extensions['index_allergies'].intervalle = 0
+    utilisateur = Utilisateur(nom='Bloom', prenom='Test', email='bloom@test.com', mot_de_passe_hash='x')
+    pomme, poire = Aliment(nom='Pomme bloom'), Aliment(nom='Poire bloom')
+    db.session.add_all([utilisateur, pomme, poire, Allergie(nom='Noix bloom')])
+    db.session.flush()
+    db.session.add_all([
+        ReactionAllergique(utilisateur_id=utilisateur.id, aliment_id=pomme.id, times_eaten=10, times_reacted=1),
+        AllergieUtilisateur(utilisateur_id=utilisateur.id, allergie_id=Allergie.query.filter_by(nom='Noix bloom').one().id),
+    ])
+    db.session.commit()
+
+    def verifier(aliment_id, detail='true'):
+        response = test_client.get(f'/api/allergies/check/{utilisateur.id}/{aliment_id}?detail={detail}')
+        return response.get_json(), int(response.headers['X-DB-Queries'])
+
+    verifier(pomme.id)
+    corps, requetes = verifier(poire.id)
+    # Seuls l'utilisateur et l'aliment sont lus : même forme de réponse que le chemin complet
+    assert corps['source'] == 'filtre_bloom' and requetes == 2
+    assert corps['analyse_risque']['niveau_risque'] == 'INCONNU'
+    assert corps['utilisateur']['nom_complet'] == 'Test Bloom' and corps['aliment']['nom'] == 'Poire bloom'
+    assert test_client.get(f'/api/allergies/check/{utilisateur.id}/99999').status_code == 404
+    assert test_client.get(f'/api/allergies/check/99999/{poire.id}').status_code == 404
+    assert verifier(poire.id, 'false')[0] == {'utilisateur_id': utilisateur.id, 'aliment_id': poire.id, 'evitement': False,
+                                              'allergie_confirmee': False, 'au_dessus_du_seuil': False,
+                                              'source': 'filtre_bloom'}
+    # Paire connue : chemin complet
+    corps, requetes = verifier(pomme.id)
+    assert corps['analyse_risque']['niveau_risque'] == 'FAIBLE' and requetes > 0
+
+    # Réaction enregistrée sur la poire : l'utilisateur est rechargé dans le filtre
+    test_client.post(f'/api/allergies/users/{utilisateur.id}/reactions',
+                     json={'aliment_id': poire.id, 'times_eaten': 3, 'times_reacted': 0})
+    assert 'source' not in verifier(poire.id)[0]
+
+    # Nouvel aliment portant le nom d'une allergie confirmée : jamais de faux négatif
+    noix = Aliment(nom='Noix bloom')
+    db.session.add(noix)
+    db.session.commit()
+    assert verifier(noix.id)[0]['analyse_risque']['niveau_risque'] == 'ALLERGIE CONFIRMÉE'
+
+    statistiques = app.extensions['filtre_bloom'].statistiques()
+    assert statistiques['paires'] == 3 and statistiques['fonctions_hachage'] == 7
+    metriques = test_client.get('/metrics').get_data(as_text=True)
+    assert 'allergy_bloom_checks_total{resultat="negatif"}' in metriques
+
+def test_verification_groupee(app, test_client):
+    """Lot d'aliments et de recettes : verdicts par élément, verdict global, nombre de requêtes constant"""
+    app.extensions['index_allergies'].intervalle = app.extensions['filtre_bloom'].intervalle = 0
+    utilisateur = Utilisateur(nom='Lot', prenom='Test', email='lot@test.com', mot_de_passe_hash='x')
+    aliments = [Aliment(nom=f'Aliment lot {i}') for i in range(30)]
+    recette = Recette(nom='Gratin lot', instructions='Gratiner')
+    allergie = Allergie(nom='Aliment lot 0')
+    db.session.add_all([utilisateur, recette, allergie, *aliments])
+    db.session.flush()
+    db.session.add_all([
+        AllergieUtilisateur(utilisateur_id=utilisateur.id, allergie_id=allergie.id),
+        ReactionAllergique(utilisateur_id=utilisateur.id, aliment_id=aliments[1].id, times_eaten=10, times_reacted=2),
+        ReactionAllergique(utilisateur_id=utilisateur.id, recette_id=recette.id, times_eaten=4, times_reacted=3),
+    ])
+    db.session.commit()
+    url = f'/api/allergies/check/{utilisateur.id}'
+
+    def verifier(corps):
+        response = test_client.post(url, json=corps)
+        return response, int(response.headers['X-DB-Queries'])
+
+    ids = [a.id for a in aliments]
+    verifier({'aliment_ids': ids[:1]})  # chargement de l'index
+    response, requetes_petit_lot = verifier({'aliment_ids': ids[:3], 'recette_ids': [recette.id]})
+    corps = response.get_json()
+    assert response.status_code == 200
+    assert [a['niveau_risque'] for a in corps['aliments']] == ['ALLERGIE CONFIRMÉE', 'MODÉRÉ', 'INCONNU']
+    assert corps['recettes'][0]['niveau_risque'] == 'TRÈS ÉLEVÉ'
+    assert corps['verdict_global'] == {'niveau_risque': 'ALLERGIE CONFIRMÉE', 'evitement': True,
+                                       'aliments_a_eviter': [ids[0]], 'recettes_a_eviter': [recette.id],
+                                       'elements_verifies': 4}
+
+    # Dix fois plus d'éléments, autant de requêtes ; doublons et ids inconnus tolérés
+    response, requetes = verifier({'aliment_ids': ids + [ids[0], 99999], 'recette_ids': [recette.id]})
+    corps = response.get_json()
+    assert requetes == requetes_petit_lot <= 4
+    assert len(corps['aliments']) == 30 and corps['introuvables'] == {'aliments': [99999], 'recettes': []}
+
+    # Index désactivé : la jointure des allergies confirmées est faite dans le même lot de requêtes
+    index = app.extensions.pop('index_allergies')
+    try:
+        response, requetes = verifier({'aliment_ids': ids})
+        assert response.get_json()['source'] == 'base' and requetes == 4
+        assert response.get_json()['aliments'][0]['allergie_confirmee']
+    finally:
+        app.extensions['index_allergies'] = index
+
+    assert verifier({'aliment_ids': []})[0].status_code == 400
+    assert verifier({'aliment_ids': ['1']})[0].status_code == 400
+    assert test_client.post('/api/allergies/check/99999', json={'aliment_ids': [ids[0]]}).status_code == 404
+
+def test_comptoir_memoire(app, test_client):
+    """Verdicts du comptoir servis sans SQL, mis à jour par utilisateur, base en attente de reconstruction"""
+    from app.comptoir import init_comptoir
+
+    comptoir = app.extensions['comptoir']
+    comptoir.intervalle = app.extensions['index_allergies'].intervalle = app.extensions['filtre_bloom'].intervalle = 0
+    app.extensions['reactivite'].intervalle = 0
+    utilisateur = Utilisateur(nom='Comptoir', prenom='Test', email='comptoir@test.com', mot_de_passe_hash='x')
+    crevette, riz = Aliment(nom='Crevette comptoir'), Aliment(nom='Riz comptoir')
+    curry = Recette(nom='Curry comptoir', instructions='Mijoter')
+    db.session.add_all([utilisateur, crevette, riz, curry, Allergie(nom='Crevette comptoir')])
+    db.session.flush()
+    db.session.add_all([
+        AllergieUtilisateur(utilisateur_id=utilisateur.id,
+                            allergie_id=Allergie.query.filter_by(nom='Crevette comptoir').one().id),
+        ReactionAllergique(utilisateur_id=utilisateur.id, recette_id=curry.id, times_eaten=4, times_reacted=2),
+    ])
+    db.session.commit()
+
+    def scanner(chemin):
+        response = test_client.get(f'/api/comptoir/{utilisateur.id}/{chemin}')
+        return response, int(response.headers.get('X-DB-Queries', 0))
+
+    scanner(f'aliments/{riz.id}')
+    response, requetes = scanner(f'aliments/{crevette.id}')
+    assert requetes == 0
+    assert response.get_json() == {'utilisateur_id': utilisateur.id, 'aliment_id': crevette.id, 'peut_manger': False,
+                                   'statut': 'interdit', 'allergenes': ['Crevette comptoir'], 'source': 'memoire'}
+    assert scanner(f'aliments/{riz.id}')[0].get_json()['peut_manger']
+    assert scanner(f'recettes/{curry.id}')[0].get_json()['statut'] == 'deconseille'
+    assert scanner('aliments/99999')[0].status_code == 404
+    # Badge inconnu : refusé, jamais « autorisé » par défaut
+    assert test_client.get(f'/api/comptoir/99999/aliments/{riz.id}').status_code == 404
+    # Utilisateur créé après le chargement : la base tranche, puis il rejoint la structure
+    nouveau = Utilisateur(nom='Nouveau', prenom='Test', email='nouveau@test.com', mot_de_passe_hash='x')
+    db.session.add(nouveau)
+    db.session.commit()
+    assert test_client.get(f'/api/comptoir/{nouveau.id}/aliments/{riz.id}').get_json()['source'] == 'base'
+    assert test_client.get(f'/api/comptoir/{nouveau.id}/aliments/{riz.id}').get_json()['source'] == 'memoire'
+    db.session.delete(nouveau)
+    db.session.commit()
+    assert test_client.get(f'/api/comptoir/{nouveau.id}/aliments/{riz.id}').status_code == 404
+
+    # Plat créé après le chargement : relu seul, sans reconstruction complète
+    reconstructions = comptoir._charge_a
+    gambas = Aliment(nom='Crevette comptoir')
+    db.session.add(gambas)
+    db.session.commit()
+    response, requetes = scanner(f'aliments/{gambas.id}')
+    assert response.get_json()['statut'] == 'interdit' and response.get_json()['source'] == 'memoire'
+    assert requetes > 0 and scanner(f'aliments/{gambas.id}')[1] == 0
+    db.session.delete(gambas)
+    db.session.commit()
+    assert scanner(f'aliments/{gambas.id}')[0].status_code == 404
+    assert comptoir._charge_a == reconstructions
+
+    # Écriture de l'utilisateur : son profil est rechargé seul
+    test_client.post(f'/api/allergies/users/{utilisateur.id}/reactions',
+                     json={'aliment_id': riz.id, 'times_eaten': 10, 'times_reacted': 5})
+    assert scanner(f'aliments/{riz.id}')[0].get_json()['statut'] == 'deconseille'
+
+    # Allergie créée après le chargement : inconnue des codes, vérification par la base jusqu'à la reconstruction
+    comptoir.intervalle = 3600
+    comptoir._reconstruction = object()  # reconstruction « en cours » : pas de thread sur la base partagée
+    allergie = Allergie(nom='Riz comptoir')
+    db.session.add(allergie)
+    db.session.flush()
+    db.session.add(AllergieUtilisateur(utilisateur_id=utilisateur.id, allergie_id=allergie.id))
+    db.session.commit()
+    response, requetes = scanner(f'aliments/{riz.id}')
+    assert response.get_json()['source'] == 'base' and response.get_json()['allergenes'] == ['Riz comptoir']
+    assert requetes >= 1
+    assert scanner(f'recettes/{curry.id}')[0].get_json() == {
+        'utilisateur_id': utilisateur.id, 'recette_id': curry.id, 'peut_manger': False,
+        'statut': 'deconseille', 'allergenes': [], 'source': 'base'}
+    comptoir._reconstruction = None
+    comptoir.reconstruire()
+    assert scanner(f'aliments/{riz.id}')[0].get_json()['source'] == 'memoire'
+    app.config['ADMIN_TOKEN'] = 'jeton-test'
+    statistiques = test_client.get('/api/admin/comptoir', headers={'X-Admin-Token': 'jeton-test'}).get_json()
+    assert statistiques == {**statistiques, 'profils': 1, 'allergenes': 2, 'aliments': 2, 'recettes': 1,
+                            'plats_a_recharger': 0, 'perime': False}
+
+    # Préchargement au démarrage : structure prête avant la première vérification
+    app.config['COUNTER_PRELOAD'] = True
+    init_comptoir(app)
+    assert app.extensions['comptoir'] is not comptoir
+    assert app.extensions['comptoir'].statistiques()['profils'] == 1
+
+# ============= TESTS DE LA RÉACTIVITÉ CROISÉE =============
+
+def test_reactivite_croisee(app, test_client):
+    """Fermeture transitive du graphe appliquée aux vérifications, au comptoir et au planificateur"""
+    for nom in ('index_allergies', 'filtre_bloom', 'comptoir', 'reactivite'):
+        app.extensions[nom].intervalle = 0
+    utilisateur = Utilisateur(nom='Croisee', prenom='Test', email='croisee@test.com', mot_de_passe_hash='x')
+    allergies = {nom: Allergie(nom=nom) for nom in ('Crevette RC', 'Homard RC', 'Langouste RC', 'Arachide RC')}
+    aliments = {nom: Aliment(nom=nom, calories=100) for nom in ('Crevette RC', 'Homard RC', 'Langouste RC', 'Bisque', 'Riz')}
+    db.session.add_all([utilisateur, *allergies.values(), *aliments.values()])
+    db.session.flush()
+    db.session.add(AllergieUtilisateur(utilisateur_id=utilisateur.id, allergie_id=allergies['Crevette RC'].id))
+    db.session.commit()
+    ids = {nom: aliment.id for nom, aliment in aliments.items()}
+
+    def relier(**arete):
+        return test_client.post('/api/reactivites/', json=arete)
+
+    # Crevette ↔ Homard, Homard → Langouste, Homard porté par la bisque
+    assert relier(allergie_id=allergies['Crevette RC'].id, allergie_liee_id=allergies['Homard RC'].id).status_code == 201
+    assert relier(allergie_id=allergies['Homard RC'].id, allergie_liee_id=allergies['Langouste RC'].id,
+                  bidirectionnelle=False).status_code == 201
+    assert relier(allergie_id=allergies['Homard RC'].id, aliment_id=ids['Bisque']).status_code == 201
+    assert relier(allergie_id=allergies['Homard RC'].id, allergie_liee_id=allergies['Homard RC'].id).status_code == 400
+    assert relier(allergie_id=allergies['Homard RC'].id, allergie_liee_id=allergies['Arachide RC'].id,
+                  aliment_id=ids['Riz']).status_code == 400
+    assert relier(allergie_id=allergies['Homard RC'].id, aliment_id=99999).status_code == 404
+
+    fermeture = test_client.get(f"/api/reactivites/fermeture/{allergies['Crevette RC'].id}").get_json()
+    assert fermeture['allergies_liees'] == ['Homard RC', 'Langouste RC']
+    assert sorted(fermeture['aliments_a_eviter']) == sorted(ids[n] for n in ('Crevette RC', 'Homard RC', 'Langouste RC', 'Bisque'))
+    assert test_client.get(f"/api/reactivites/fermeture/{allergies['Langouste RC'].id}").get_json()['allergies_liees'] == []
+
+    # Vérification unitaire (index puis base), groupée et au comptoir
+    verifier = lambda nom: test_client.get(f"/api/allergies/check/{utilisateur.id}/{ids[nom]}").get_json()
+    assert verifier('Langouste RC')['analyse_risque']['allergie_confirmee'] is True
+    assert verifier('Riz')['analyse_risque']['allergie_confirmee'] is False
+    del app.extensions['index_allergies'], app.extensions['filtre_bloom']
+    try:
+        assert verifier('Bisque')['analyse_risque']['niveau_risque'] == 'ALLERGIE CONFIRMÉE'
+        lot = test_client.post(f'/api/allergies/check/{utilisateur.id}',
+                               json={'aliment_ids': [ids['Riz'], ids['Homard RC'], ids['Langouste RC']]}).get_json()
+        assert lot['source'] == 'base'
+        assert lot['verdict_global']['aliments_a_eviter'] == [ids['Homard RC'], ids['Langouste RC']]
+    finally:
+        from app.filtre_bloom import init_filtre_bloom
+        from app.index_allergies import init_index_allergies
+        init_index_allergies(app)
+        init_filtre_bloom(app)
+        app.extensions['index_allergies'].intervalle = app.extensions['filtre_bloom'].intervalle = 0
+    scan = test_client.get(f"/api/comptoir/{utilisateur.id}/aliments/{ids['Langouste RC']}").get_json()
+    assert scan['statut'] == 'interdit' and scan['allergenes'] == ['Langouste RC']
+
+    # Planificateur : allergènes nommés sans tenir compte de la casse, famille entière exclue
+    filtrage = test_client.post('/api/planificateur/filtrer', json={'allergenes': ['crevette rc', 'Inconnu']}).get_json()
+    assert filtrage['aliments_exclus'] == 4
+    assert filtrage['criteres_appliques']['allergenes_exclus'] == ['Crevette RC', 'Homard RC', 'Langouste RC']
+    assert filtrage['criteres_appliques']['allergenes_inconnus'] == ['Inconnu']
+
+    # Arête retirée : graphe et index rechargés à la vérification suivante
+    arete = ReactiviteCroisee.query.filter_by(allergie_liee_id=allergies['Langouste RC'].id).one()
+    assert test_client.delete(f'/api/reactivites/{arete.id}').status_code == 204
+    assert verifier('Langouste RC')['analyse_risque']['allergie_confirmee'] is False
+    assert verifier('Homard RC')['analyse_risque']['allergie_confirmee'] is True
+    app.extensions['comptoir'].intervalle = 0
+    assert test_client.get(f"/api/comptoir/{utilisateur.id}/aliments/{ids['Langouste RC']}").get_json()['peut_manger']
+    app.config['ADMIN_TOKEN'] = 'jeton-test'
+    statistiques = test_client.get('/api/admin/reactivite', headers={'X-Admin-Token': 'jeton-test'}).get_json()
+    assert statistiques == {**statistiques, 'allergies': 4, 'aretes': 1, 'allergies_reliees': 2, 'perime': False}
+
+    # Écriture de ce worker : graphe rechargé sur place, même avec un rechargement
+    # en arrière-plan (simulé en cours) ; l'index reconstruit suit
+    reactivite = app.extensions['reactivite']
+    reactivite.intervalle, reactivite._rechargement = 60, object()
+    fermeture = lambda: test_client.get(f"/api/reactivites/fermeture/{allergies['Homard RC'].id}").get_json()
+    try:
+        assert relier(allergie_id=allergies['Homard RC'].id, allergie_liee_id=allergies['Langouste RC'].id,
+                      bidirectionnelle=False).status_code == 201
+        assert fermeture()['allergies_liees'] == ['Crevette RC', 'Langouste RC']
+        assert verifier('Langouste RC')['analyse_risque']['allergie_confirmee'] is True
+
+        # Écriture d'un autre processus, à l'échéance : ancienne version servie pendant le rechargement
+        db.session.execute(ReactiviteCroisee.__table__.delete().where(
+            ReactiviteCroisee.allergie_liee_id == allergies['Langouste RC'].id))
+        db.session.commit()
+        reactivite._charge_a -= 60
+        assert fermeture()['allergies_liees'] == ['Crevette RC', 'Langouste RC']
+        assert reactivite.graphe(attendre=True).statistiques()['aretes'] == 1
+        assert fermeture()['allergies_liees'] == ['Crevette RC']
+    finally:
+        reactivite.intervalle, reactivite._rechargement = 0, None
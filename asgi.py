@@ -0,0 +1,5 @@
+from run import app
+from app.asgi import creer_application_asgi
+
+# uvicorn asgi:application --workers 4
+application = creer_application_asgi(app)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+🧮 BENCHMARK DU MOTEUR ANALYTIQUE VECTORISÉ
+============================================
+
+Mesure app.analytique à grande échelle :
+  - calcul : analyser() sur un tableau synthétique de N réactions généré
+    directement en colonnes NumPy (dizaines de millions sans base), comparé
+    au même calcul ligne à ligne en Python mesuré sur un échantillon ;
+  - chargement (--chargement) : charger_reactions() depuis une base peuplée
+    par bench_endpoints.generer_donnees, en réactions par seconde.
+
+Exemples :
+    python benchmarks/bench_analytique.py --reactions 10000000 --reactions 30000000
+    python benchmarks/bench_analytique.py --chargement --base sqlite:////tmp/bench.db --utilisateurs 20000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+
+# ============= DONNÉES SYNTHÉTIQUES =============
+
+def tableau_synthetique(reactions, utilisateurs, aliments, categories=6, graine=42):
+    """Tableau de réactions aléatoire : ~20 % de réactions positives, seuils de 20 à 40 %"""
+    from app.analytique import TableauReactions
+
+    aleatoire = np.random.default_rng(graine)
+    consommations = aleatoire.integers(1, 31, reactions, dtype=np.int32)
+    positives = aleatoire.random(reactions) < 0.2
+    reagies = (aleatoire.random(reactions) * (consommations + 1)).astype(np.int32)
+    return TableauReactions(
+        aleatoire.integers(0, utilisateurs, reactions, dtype=np.int32),
+        aleatoire.integers(0, aliments, reactions, dtype=np.int32),
+        consommations,
+        np.where(positives, np.minimum(reagies, consommations), 0).astype(np.int32),
+        np.arange(1, aliments + 1),
+        aleatoire.choice([20.0, 30.0, 40.0], aliments),
+        (np.arange(aliments) % categories).astype(np.int32)
+    )
+
+
+def analyser_ligne_a_ligne(tableau):
+    """Référence : le calcul par aliment tel que l'écrirait une boucle Python sur les lignes"""
+    par_aliment = {}
+    for i in range(len(tableau)):
+        aliment = int(tableau.aliments[i])
+        eaten, reacted = int(tableau.consommations[i]), int(tableau.reactions[i])
+        cumul = par_aliment.setdefault(aliment, [0, 0, 0, 0.0])
+        cumul[0] += eaten
+        cumul[1] += reacted
+        if eaten:
+            cumul[3] += reacted / eaten * 100
+            if reacted * 100 > tableau.seuils[aliment] * eaten:
+                cumul[2] += 1
+    return par_aliment
+
+
+# ============= MESURES =============
+
+def mesurer_calcul(reactions, utilisateurs, aliments, repetitions=3, echantillon=200000):
+    from app.analytique import analyser
+
+    t0 = time.perf_counter()
+    tableau = tableau_synthetique(reactions, utilisateurs, aliments)
+    generation = time.perf_counter() - t0
+
+    durees = []
+    for _ in range(repetitions):
+        t0 = time.perf_counter()
+        resultat = analyser(tableau)
+        durees.append(time.perf_counter() - t0)
+
+    # Boucle Python mesurée sur un échantillon, extrapolée linéairement
+    taille = min(echantillon, reactions)
+    extrait = tableau_synthetique(taille, utilisateurs, aliments, graine=7)
+    t0 = time.perf_counter()
+    analyser_ligne_a_ligne(extrait)
+    ligne_a_ligne = (time.perf_counter() - t0) * reactions / taille
+
+    octets = sum(getattr(tableau, nom).nbytes for nom in ('utilisateurs', 'aliments', 'consommations', 'reactions'))
+    return {
+        'reactions': reactions,
+        'utilisateurs': utilisateurs,
+        'aliments': aliments,
+        'generation_s': round(generation, 2),
+        'calcul_s': round(min(durees), 3),
+        'reactions_par_s': round(reactions / min(durees)),
+        'ligne_a_ligne_estime_s': round(ligne_a_ligne, 1),
+        'acceleration': round(ligne_a_ligne / min(durees), 1),
+        'memoire_colonnes_mo': round(octets / 2 ** 20, 1),
+        'reactions_allergiques': resultat['global']['reactions_allergiques'],
+    }
+
+
+def mesurer_chargement(base, utilisateurs, aliments, reactions_par_utilisateur, preparer):
+    os.environ['DATABASE_URL'] = base
+    os.environ.setdefault('FLASK_ENV', 'benchmark')
+
+    from run import create_app
+    from app.db.db import db
+    from app.analytique import analyser, charger_reactions
+    from benchmarks.bench_endpoints import generer_donnees
+
+    app = create_app()
+    with app.app_context():
+        if preparer:
+            generer_donnees(db, utilisateurs=utilisateurs, aliments=aliments,
+                            reactions_par_utilisateur=reactions_par_utilisateur)
+        t0 = time.perf_counter()
+        tableau = charger_reactions()
+        chargement = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        analyser(tableau)
+        calcul = time.perf_counter() - t0
+    return {
+        'base': base.split('://')[0],
+        'reactions': len(tableau),
+        'chargement_s': round(chargement, 2),
+        'reactions_chargees_par_s': round(len(tableau) / chargement) if chargement else None,
+        'calcul_s': round(calcul, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark du moteur analytique vectorisé')
+    parser.add_argument('--reactions', type=int, action='append',
+                        help='Taille(s) du tableau synthétique (répétable, défaut : 1M, 10M, 20M)')
+    parser.add_argument('--utilisateurs', type=int, default=1000000)
+    parser.add_argument('--aliments', type=int, default=5000)
+    parser.add_argument('--repetitions', type=int, default=3)
+    parser.add_argument('--chargement', action='store_true', help='Mesurer aussi le chargement depuis la base')
+    parser.add_argument('--base', default='sqlite:////tmp/bench_analytique.db', help='URL de base (écrasée si --preparer)')
+    parser.add_argument('--preparer', action='store_true', help='Peupler la base avant de mesurer le chargement')
+    parser.add_argument('--reactions-par-utilisateur', type=int, default=50)
+    parser.add_argument('--sortie', help='Fichier JSON de résultats')
+    args = parser.parse_args()
+
+    rapport = {'calcul': [], 'chargement': None}
+    print(f"{'Réactions':>12}{'calcul (s)':>12}{'réactions/s':>16}{'ligne à ligne (s)':>20}{'×':>8}{'Mo':>8}")
+    print('-' * 76)
+    for reactions in args.reactions or [1000000, 10000000, 20000000]:
+        mesure = mesurer_calcul(reactions, args.utilisateurs, args.aliments, args.repetitions)
+        rapport['calcul'].append(mesure)
+        print(f"{reactions:>12,}{mesure['calcul_s']:>12}{mesure['reactions_par_s']:>16,}"
+              f"{mesure['ligne_a_ligne_estime_s']:>20}{mesure['acceleration']:>8}{mesure['memoire_colonnes_mo']:>8}")
+
+    if args.chargement:
+        mesure = mesurer_chargement(args.base, args.utilisateurs, args.aliments,
+                                    args.reactions_par_utilisateur, args.preparer)
+        rapport['chargement'] = mesure
+        print(f"\n💽 Chargement {mesure['base']} : {mesure['reactions']:,} réactions en {mesure['chargement_s']} s "
+              f"({mesure['reactions_chargees_par_s']:,}/s), calcul {mesure['calcul_s']} s")
+
+    if args.sortie:
+        with open(args.sortie, 'w') as f:
+            json.dump(rapport, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Résultats enregistrés : {args.sortie}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+⚖️ BENCHMARK ASGI (ASYNCHRONE) CONTRE GUNICORN (SYNCHRONE)
+==========================================================
+
+Lance successivement, sur la même base et la même machine :
+  - gunicorn en workers synchrones (wsgi:app) ;
+  - uvicorn avec l'application ASGI (asgi:application), dont les lectures
+    critiques (profil, vérification, recommandations) utilisent le moteur
+    SQLAlchemy asynchrone ;
+puis les soumet au générateur de charge en boucle ouverte avec beaucoup de
+connexions simultanées et compare débit atteint et latences.
+
+Exemples :
+    python benchmarks/bench_asgi.py --base sqlite:////tmp/bench.db --preparer
+    python benchmarks/bench_asgi.py --base postgresql://u:p@localhost/bench --debit 800 --connexions 512
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+from benchmarks.load_generator import decouvrir_ids, executer, parser_mix, resumer
+
+MODES = {
+    'gunicorn-sync': lambda workers, port, threads: [
+        sys.executable, '-m', 'gunicorn', 'wsgi:app', '--worker-class', 'sync', '--workers', str(workers),
+        '--threads', str(threads), '--bind', f'127.0.0.1:{port}', '--log-level', 'warning'
+    ],
+    'uvicorn-asgi': lambda workers, port, threads: [
+        sys.executable, '-m', 'uvicorn', 'asgi:application', '--workers', str(workers),
+        '--host', '127.0.0.1', '--port', str(port), '--lifespan', 'on', '--no-access-log', '--log-level', 'warning'
+    ],
+}
+
+
+def preparer(base, utilisateurs, aliments, reactions_par_utilisateur, graine):
+    """Peuple la base avec le jeu synthétique du benchmark in-process"""
+    os.environ['DATABASE_URL'] = base
+    from run import create_app
+    from app.db.db import db
+    from benchmarks.bench_endpoints import generer_donnees
+
+    app = create_app()
+    with app.app_context():
+        return generer_donnees(db, utilisateurs, aliments, reactions_par_utilisateur, graine=graine)
+
+
+def attendre_port(port, timeout=30.0):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def mesurer_mode(mode, args, env):
+    commande = MODES[mode](args.workers, args.port, args.threads)
+    serveur = subprocess.Popen(commande, cwd=RACINE, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not attendre_port(args.port):
+            raise RuntimeError(f"{mode} n'a pas démarré sur le port {args.port}")
+        url = f'http://127.0.0.1:{args.port}'
+        utilisateurs = decouvrir_ids(url, '/api/utilisateurs/', args.timeout)
+        aliments = decouvrir_ids(url, '/api/aliments/', args.timeout)
+
+        # Échauffement (connexions, caches du SGBD) non comptabilisé
+        executer(url, min(args.debit, 50), 2, 8, parser_mix(args.mix), utilisateurs, aliments,
+                 timeout=args.timeout, graine=args.graine)
+        mesures, duree = executer(url, args.debit, args.duree, args.connexions, parser_mix(args.mix),
+                                  utilisateurs, aliments, timeout=args.timeout, graine=args.graine)
+        return resumer(mesures, duree, args.debit)
+    finally:
+        serveur.terminate()
+        try:
+            serveur.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            serveur.kill()
+
+
+def afficher(rapports):
+    print(f"\n{'Mode':<16}{'req/s':>10}{'err %':>8}{'p50 ms':>10}{'p99 ms':>10}{'p99.9 ms':>11}")
+    print('-' * 65)
+    for mode, rapport in rapports.items():
+        g = rapport['global']
+        c = g['latence_corrigee_ms']
+        print(f"{mode:<16}{rapport['debit_atteint_rps']:>10}{g['taux_erreur_pourcent']:>8}"
+              f"{c['p50']:>10}{c['p99']:>10}{c['p999']:>11}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ASGI asynchrone contre gunicorn synchrone')
+    parser.add_argument('--base', required=True, help='URL de base partagée (fichier SQLite ou PostgreSQL)')
+    parser.add_argument('--preparer', action='store_true', help='Peupler la base avant les mesures (écrasée !)')
+    parser.add_argument('--utilisateurs', type=int, default=500)
+    parser.add_argument('--aliments', type=int, default=1000)
+    parser.add_argument('--reactions-par-utilisateur', type=int, default=30)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--threads', type=int, default=1, help='Threads par worker gunicorn')
+    parser.add_argument('--debit', type=float, default=400)
+    parser.add_argument('--duree', type=float, default=30)
+    parser.add_argument('--connexions', type=int, default=256)
+    parser.add_argument('--mix', default='check=50,profil=40,recherche=10')
+    parser.add_argument('--mode', action='append', choices=list(MODES), help='Limiter à un mode (répétable)')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--graine', type=int, default=42)
+    parser.add_argument('--sortie', help='Fichier JSON pour le rapport')
+    args = parser.parse_args()
+
+    if ':memory:' in args.base:
+        parser.error('--base doit désigner une base partagée entre processus')
+    if args.preparer:
+        echelle = preparer(args.base, args.utilisateurs, args.aliments, args.reactions_par_utilisateur, args.graine)
+        print(f"🌱 Base peuplée : {echelle}")
+
+    env = dict(os.environ, DATABASE_URL=args.base, FLASK_ENV='production')
+    rapports = {}
+    for mode in args.mode or list(MODES):
+        print(f"🚦 {mode} : {args.debit} req/s pendant {args.duree}s sur {args.connexions} connexions "
+              f"({args.workers} workers)")
+        rapports[mode] = mesurer_mode(mode, args, env)
+
+    afficher(rapports)
+    if args.sortie:
+        with open(args.sortie, 'w') as f:
+            json.dump({'parametres': vars(args), 'rapports': rapports}, f, indent=2, ensure_ascii=False)
+        print(f"💾 Rapport enregistré : {args.sortie}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+🍱 BENCHMARK DU COMPTOIR DE CAFÉTÉRIA
+=====================================
+
+Lance un seul worker gunicorn (structure du comptoir préchargée au démarrage)
+puis lui envoie des scans badge + plat (/api/comptoir/<user>/aliments/<id>)
+en boucle ouverte au débit cible, sur plusieurs connexions simultanées comme
+autant de caisses. Le p99 corrigé de l'omission coordonnée est comparé à
+l'objectif (5 ms par défaut) ; le code de sortie vaut 1 s'il est dépassé.
+La part des scans traités en moins de 5 ms côté serveur (histogramme de
+/metrics) est rapportée à part : sur une machine où générateur et worker
+partagent les mêmes cœurs, l'écart entre les deux mesure le client.
+
+Exemples :
+    python benchmarks/bench_comptoir.py --base sqlite:////tmp/comptoir.db --preparer --debit 500
+    python benchmarks/bench_comptoir.py --base postgresql://u:p@localhost/bench --debit 800 --threads 8
+"""
+
+import argparse
+import http.client
+import json
+import os
+import re
+import subprocess
+import sys
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+from benchmarks.bench_asgi import MODES, attendre_port, preparer
+from benchmarks.load_generator import decouvrir_ids, executer, resumer
+
+MIX = {'comptoir': 1.0}
+ENDPOINT = 'comptoir_comptoir_aliment'
+
+
+def histogramme_serveur(port, timeout):
+    """(scans ≤ 5 ms, scans) côté serveur, lus dans l'histogramme http_request_duration_seconds"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    conn.request('GET', '/metrics')
+    texte = conn.getresponse().read().decode()
+    conn.close()
+
+    def valeur(motif):
+        trouve = re.search(motif, texte)
+        return float(trouve.group(1)) if trouve else 0.0
+
+    sous_5ms = valeur(rf'http_request_duration_seconds_bucket{{endpoint="{ENDPOINT}",le="0.005"}} (\S+)')
+    total = valeur(rf'http_request_duration_seconds_count{{endpoint="{ENDPOINT}"}} (\S+)')
+    return sous_5ms, total
+
+
+def mesurer(args, env):
+    commande = MODES['gunicorn-sync'](1, args.port, args.threads)
+    serveur = subprocess.Popen(commande, cwd=RACINE, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not attendre_port(args.port, timeout=120):
+            raise RuntimeError(f"gunicorn n'a pas démarré sur le port {args.port}")
+        url = f'http://127.0.0.1:{args.port}'
+        utilisateurs = decouvrir_ids(url, '/api/utilisateurs/', args.timeout)
+        aliments = decouvrir_ids(url, '/api/aliments/', args.timeout)
+
+        # Échauffement (connexions) non comptabilisé
+        executer(url, min(args.debit, 100), 2, args.caisses, MIX, utilisateurs, aliments,
+                 timeout=args.timeout, graine=args.graine)
+        avant = histogramme_serveur(args.port, args.timeout)
+        mesures, duree = executer(url, args.debit, args.duree, args.caisses, MIX, utilisateurs, aliments,
+                                  poisson=not args.constant, timeout=args.timeout, graine=args.graine)
+        apres = histogramme_serveur(args.port, args.timeout)
+        rapport = resumer(mesures, duree, args.debit)
+        scans = apres[1] - avant[1]
+        rapport['serveur_sous_5ms_pourcent'] = round((apres[0] - avant[0]) / scans * 100, 2) if scans else None
+        return rapport
+    finally:
+        serveur.terminate()
+        try:
+            serveur.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            serveur.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark du comptoir de cafétéria sur un worker')
+    parser.add_argument('--base', required=True, help='URL de base partagée (fichier SQLite ou PostgreSQL)')
+    parser.add_argument('--preparer', action='store_true', help='Peupler la base avant la mesure (écrasée !)')
+    parser.add_argument('--utilisateurs', type=int, default=5000)
+    parser.add_argument('--aliments', type=int, default=2000)
+    parser.add_argument('--reactions-par-utilisateur', type=int, default=30)
+    parser.add_argument('--threads', type=int, default=4, help='Threads du worker gunicorn')
+    parser.add_argument('--debit', type=float, default=500, help='Scans par seconde')
+    parser.add_argument('--duree', type=float, default=30)
+    parser.add_argument('--caisses', type=int, default=16, help='Connexions simultanées (une par caisse)')
+    parser.add_argument('--constant', action='store_true', help='Arrivées régulières au lieu de Poisson')
+    parser.add_argument('--objectif-p99-ms', type=float, default=5.0)
+    parser.add_argument('--port', type=int, default=8110)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--graine', type=int, default=42)
+    parser.add_argument('--sortie', help='Fichier JSON pour le rapport')
+    args = parser.parse_args()
+
+    if ':memory:' in args.base:
+        parser.error('--base doit désigner une base partagée entre processus')
+    if args.preparer:
+        echelle = preparer(args.base, args.utilisateurs, args.aliments, args.reactions_par_utilisateur, args.graine)
+        print(f"🌱 Base peuplée : {echelle}")
+
+    env = dict(os.environ, DATABASE_URL=args.base, FLASK_ENV='production', COUNTER_PRELOAD='true')
+    print(f"🍱 {args.debit} scans/s pendant {args.duree}s sur {args.caisses} caisses (1 worker, {args.threads} threads)")
+    rapport = mesurer(args, env)
+
+    g = rapport['global']
+    c, s = g['latence_corrigee_ms'], g['latence_service_ms']
+    atteint = c['p99'] <= args.objectif_p99_ms and g['taux_erreur_pourcent'] == 0
+    print(f"\n{'scans/s':>10}{'err %':>8}{'p50 ms':>10}{'p99 ms':>10}{'p99.9 ms':>11}{'p99 service':>14}")
+    print('-' * 63)
+    print(f"{rapport['debit_atteint_rps']:>10}{g['taux_erreur_pourcent']:>8}{c['p50']:>10}{c['p99']:>10}"
+          f"{c['p999']:>11}{s['p99']:>14}")
+    print(f"\n🖥️ Côté serveur : {rapport['serveur_sous_5ms_pourcent']} % des scans traités en moins de 5 ms")
+    print(f"{'✅' if atteint else '❌'} Objectif p99 ≤ {args.objectif_p99_ms} ms "
+          f"{'atteint' if atteint else 'manqué'} (latences corrigées de l'omission coordonnée)")
+
+    if args.sortie:
+        with open(args.sortie, 'w') as f:
+            json.dump({'parametres': vars(args), 'rapport': rapport, 'objectif_atteint': atteint},
+                      f, indent=2, ensure_ascii=False)
+        print(f"💾 Rapport enregistré : {args.sortie}")
+    sys.exit(0 if atteint else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+⏱️ BENCHMARK IN-PROCESS DES ENDPOINTS CRITIQUES
+===============================================
+
+Mesure débit et latence des endpoints les plus sollicités via le client de
+test Flask, sur un jeu de données synthétique d'échelle configurable.
+Les résultats sont enregistrés en JSON et peuvent être comparés à une
+référence pour signaler les régressions.
+
+Exemples :
+    python benchmarks/bench_endpoints.py --utilisateurs 500 --aliments 1000
+    python benchmarks/bench_endpoints.py --sortie ref.json
+    python benchmarks/bench_endpoints.py --reference ref.json --tolerance 0.2
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DOSSIER_RESULTATS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resultats')
+
+NOMS_ALIMENTS = ['Lait', 'Arachide', 'Noisette', 'Blé', 'Oeuf', 'Soja', 'Crevette', 'Moule',
+                 'Pomme', 'Kiwi', 'Sésame', 'Céleri', 'Moutarde', 'Poisson', 'Riz', 'Poulet']
+TYPES_ALIMENTS = ['Fruit', 'Légume', 'Céréale', 'Protéine', 'Produit laitier', 'Fruit à coque']
+
+
+# ============= JEU DE DONNÉES SYNTHÉTIQUE =============
+
+def generer_donnees(db, utilisateurs=200, aliments=500, reactions_par_utilisateur=30,
+                    recettes=200, graine=42):
+    """Insère un jeu de données reproductible en lots (insert ORM multi-lignes)"""
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+    from app.model import (Utilisateur, Categorie, Aliment, Recette, Allergie,
+                           ReactionAllergique, AllergieUtilisateur)
+
+    aleatoire = random.Random(graine)
+    db.drop_all()
+    db.create_all()
+
+    db.session.execute(insert(Categorie), [
+        {'id': i + 1, 'nom': nom, 'description': f'Catégorie {nom}'}
+        for i, nom in enumerate(TYPES_ALIMENTS)
+    ])
+
+    db.session.execute(insert(Aliment), [
+        {
+            'id': i + 1,
+            'nom': f'{NOMS_ALIMENTS[i % len(NOMS_ALIMENTS)]} {i + 1}',
+            'calories': round(aleatoire.uniform(10, 600), 1),
+            'proteines': round(aleatoire.uniform(0, 30), 1),
+            'lipides': round(aleatoire.uniform(0, 50), 1),
+            'glucides': round(aleatoire.uniform(0, 60), 1),
+            'fibres': round(aleatoire.uniform(0, 10), 1),
+            'type_aliment': TYPES_ALIMENTS[i % len(TYPES_ALIMENTS)],
+            'categorie_id': (i % len(TYPES_ALIMENTS)) + 1
+        }
+        for i in range(aliments)
+    ])
+
+    db.session.execute(insert(Recette), [
+        {
+            'id': i + 1,
+            'nom': f'Recette {i + 1}',
+            'instructions': 'Mélanger et servir',
+            'temps_preparation': aleatoire.randint(5, 120),
+            'difficulte': aleatoire.choice(['Facile', 'Moyen', 'Difficile']),
+            'portions': aleatoire.randint(1, 8)
+        }
+        for i in range(recettes)
+    ])
+
+    # Un seul hachage partagé : le hachage par utilisateur dominerait la génération
+    hash_commun = generate_password_hash('benchmark')
+    db.session.execute(insert(Utilisateur), [
+        {
+            'id': i + 1,
+            'nom': f'Nom{i + 1}',
+            'prenom': f'Prenom{i + 1}',
+            'email': f'bench{i + 1}@example.com',
+            'mot_de_passe_hash': hash_commun,
+            'age': aleatoire.randint(18, 80)
+        }
+        for i in range(utilisateurs)
+    ])
+
+    reactions = []
+    for u in range(1, utilisateurs + 1):
+        for aliment_id in aleatoire.sample(range(1, aliments + 1), min(reactions_par_utilisateur, aliments)):
+            eaten = aleatoire.randint(1, 30)
+            reactions.append({
+                'utilisateur_id': u,
+                'aliment_id': aliment_id,
+                'times_eaten': eaten,
+                'times_reacted': aleatoire.randint(0, eaten) if aleatoire.random() < 0.2 else 0
+            })
+    db.session.execute(insert(ReactionAllergique), reactions)
+
+    db.session.execute(insert(Allergie), [
+        {'id': i + 1, 'nom': f'{NOMS_ALIMENTS[i % len(NOMS_ALIMENTS)]} {i + 1}', 'gravite': 'Modéré'}
+        for i in range(min(aliments, 50))
+    ])
+    db.session.execute(insert(AllergieUtilisateur), [
+        {'utilisateur_id': u, 'allergie_id': aleatoire.randint(1, min(aliments, 50)), 'detectee_automatiquement': True}
+        for u in range(1, utilisateurs + 1, 3)
+    ])
+
+    db.session.commit()
+    return {
+        'utilisateurs': utilisateurs,
+        'aliments': aliments,
+        'recettes': recettes,
+        'reactions': len(reactions)
+    }
+
+
+# ============= SCÉNARIOS =============
+
+def scenarios(echelle, aleatoire):
+    """Requêtes (méthode, url, corps) générées pour chaque endpoint mesuré"""
+    u = lambda: aleatoire.randint(1, echelle['utilisateurs'])
+    a = lambda: aleatoire.randint(1, echelle['aliments'])
+    return {
+        'allergies_profil': lambda: ('GET', f'/api/allergies/users/{u()}/profile', None),
+        'allergies_check': lambda: ('GET', f'/api/allergies/check/{u()}/{a()}', None),
+        'allergies_statistiques': lambda: ('GET', '/api/allergies/statistics', None),
+        'planificateur_filtrer': lambda: ('POST', '/api/planificateur/filtrer', {
+            'calories_max': aleatoire.randint(100, 600), 'temps_preparation_max': 60, 'difficulte_max': 'Moyen'
+        }),
+        'aliments_recherche': lambda: ('GET', f'/api/aliments/recherche/{aleatoire.choice(NOMS_ALIMENTS)[:3]}', None),
+        'aliments_liste': lambda: ('GET', '/api/aliments', None),
+        'recettes_liste': lambda: ('GET', '/api/recettes', None),
+    }
+
+
+def percentile(valeurs, q):
+    if not valeurs:
+        return 0.0
+    triees = sorted(valeurs)
+    rang = q * (len(triees) - 1)
+    bas = int(rang)
+    haut = min(bas + 1, len(triees) - 1)
+    return triees[bas] + (triees[haut] - triees[bas]) * (rang - bas)
+
+
+def mesurer(client, generateur, iterations, echauffement):
+    """Exécute un scénario et renvoie ses statistiques de latence (ms)"""
+    for _ in range(echauffement):
+        methode, url, corps = generateur()
+        client.open(url, method=methode, json=corps)
+
+    latences, requetes_sql, erreurs = [], [], 0
+    debut = time.perf_counter()
+    for _ in range(iterations):
+        methode, url, corps = generateur()
+        t0 = time.perf_counter()
+        response = client.open(url, method=methode, json=corps)
+        latences.append((time.perf_counter() - t0) * 1000)
+        if response.status_code >= 500:
+            erreurs += 1
+        if 'X-DB-Queries' in response.headers:
+            requetes_sql.append(int(response.headers['X-DB-Queries']))
+    duree = time.perf_counter() - debut
+
+    return {
+        'iterations': iterations,
+        'erreurs': erreurs,
+        'debit_rps': round(iterations / duree, 1) if duree > 0 else 0.0,
+        'moyenne_ms': round(statistics.fmean(latences), 3),
+        'p50_ms': round(percentile(latences, 0.50), 3),
+        'p95_ms': round(percentile(latences, 0.95), 3),
+        'p99_ms': round(percentile(latences, 0.99), 3),
+        'max_ms': round(max(latences), 3),
+        'requetes_sql_moyennes': round(statistics.fmean(requetes_sql), 1) if requetes_sql else None
+    }
+
+
+def executer(app, db, echelle_demandee, iterations=200, echauffement=20, graine=42, selection=None):
+    """Génère les données puis mesure tous les scénarios (ou une sélection)"""
+    with app.app_context():
+        echelle = generer_donnees(db, graine=graine, **echelle_demandee)
+        db.session.remove()
+
+    client = app.test_client()
+    resultats = {}
+    for nom, generateur in scenarios(echelle, random.Random(graine)).items():
+        if selection and nom not in selection:
+            continue
+        resultats[nom] = mesurer(client, generateur, iterations, echauffement)
+
+    return {
+        'date': datetime.utcnow().isoformat(),
+        'environnement': {
+            'python': platform.python_version(),
+            'plateforme': platform.platform(),
+            'base': app.config['SQLALCHEMY_DATABASE_URI'].split('://')[0]
+        },
+        'echelle': echelle,
+        'iterations': iterations,
+        'resultats': resultats
+    }
+
+
+def comparer(rapport, reference, tolerance=0.2, metriques=('p50_ms', 'p95_ms')):
+    """Liste des régressions : métriques dépassant la référence de plus de `tolerance`"""
+    regressions = []
+    for nom, mesures in rapport['resultats'].items():
+        ref = reference.get('resultats', {}).get(nom)
+        if not ref:
+            continue
+        for metrique in metriques:
+            avant, apres = ref.get(metrique), mesures.get(metrique)
+            if avant and apres and apres > avant * (1 + tolerance):
+                regressions.append({
+                    'scenario': nom,
+                    'metrique': metrique,
+                    'reference': avant,
+                    'mesure': apres,
+                    'variation_pourcent': round((apres / avant - 1) * 100, 1)
+                })
+    return regressions
+
+
+def afficher(rapport):
+    print(f"\n📊 Échelle : {rapport['echelle']}")
+    print(f"{'Scénario':<26}{'req/s':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'SQL':>7}{'err':>6}")
+    print('-' * 79)
+    for nom, r in rapport['resultats'].items():
+        sql = r['requetes_sql_moyennes'] if r['requetes_sql_moyennes'] is not None else '-'
+        print(f"{nom:<26}{r['debit_rps']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{sql:>7}{r['erreurs']:>6}")
+    if 'echantillonneur' in rapport:
+        print(f"\n🧵 Surcoût de l'échantillonneur : {rapport['echantillonneur']['surcout_pourcent']} %")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark in-process des endpoints critiques')
+    parser.add_argument('--utilisateurs', type=int, default=200)
+    parser.add_argument('--aliments', type=int, default=500)
+    parser.add_argument('--reactions-par-utilisateur', type=int, default=30)
+    parser.add_argument('--recettes', type=int, default=200)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--echauffement', type=int, default=20)
+    parser.add_argument('--graine', type=int, default=42)
+    parser.add_argument('--scenario', action='append', help='Limiter à un scénario (répétable)')
+    parser.add_argument('--base', default='sqlite:///:memory:', help='URL de base de données (écrasée !)')
+    parser.add_argument('--sortie', help='Fichier JSON de résultats (défaut : benchmarks/resultats/<date>.json)')
+    parser.add_argument('--reference', help='Fichier JSON de référence à comparer')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Dégradation tolérée (0.2 = 20 %%)')
+    parser.add_argument('--echantillonneur', action='store_true',
+                        help="Activer l'échantillonneur de piles pour mesurer son surcoût")
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.base
+    os.environ.setdefault('FLASK_ENV', 'benchmark')
+    if args.echantillonneur:
+        os.environ['SAMPLER_ENABLED'] = 'true'
+
+    from run import create_app
+    from app.db.db import db
+
+    app = create_app()
+    rapport = executer(
+        app, db,
+        {
+            'utilisateurs': args.utilisateurs,
+            'aliments': args.aliments,
+            'reactions_par_utilisateur': args.reactions_par_utilisateur,
+            'recettes': args.recettes
+        },
+        iterations=args.iterations,
+        echauffement=args.echauffement,
+        graine=args.graine,
+        selection=args.scenario
+    )
+
+    if args.echantillonneur:
+        from app.monitoring.sampler import echantillonneur_courant
+        rapport['echantillonneur'] = echantillonneur_courant().statistiques()
+
+    afficher(rapport)
+
+    sortie = args.sortie or os.path.join(DOSSIER_RESULTATS, f"{datetime.utcnow():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(sortie)), exist_ok=True)
+    with open(sortie, 'w') as f:
+        json.dump(rapport, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Résultats enregistrés : {sortie}")
+
+    if args.reference:
+        with open(args.reference) as f:
+            reference = json.load(f)
+        regressions = comparer(rapport, reference, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} régression(s) au-delà de {args.tolerance:.0%} :")
+            for r in regressions:
+                print(f"  - {r['scenario']} {r['metrique']} : {r['reference']} → {r['mesure']} ms (+{r['variation_pourcent']} %)")
+            sys.exit(1)
+        print("\n✅ Aucune régression par rapport à la référence")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+🚦 GÉNÉRATEUR DE CHARGE HTTP EN BOUCLE OUVERTE
+==============================================
+
+Rejoue un mélange configurable du trafic réel (écritures de réactions,
+vérifications, lectures de profil, recherches) à un débit cible fixe, sur
+de nombreuses connexions persistantes, contre un serveur local.
+
+Les requêtes sont planifiées à l'avance (boucle ouverte) : la latence est
+mesurée depuis l'instant prévu d'envoi, ce qui corrige l'omission coordonnée
+lorsque le serveur ralentit. La latence de service (depuis l'envoi effectif)
+est aussi rapportée pour comparaison.
+
+Exemples :
+    python benchmarks/load_generator.py --debit 200 --duree 60 --connexions 64
+    python benchmarks/load_generator.py --mix check=70,profil=15,reaction=10,recherche=5
+"""
+
+import argparse
+import http.client
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from urllib.parse import quote, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_endpoints import NOMS_ALIMENTS, percentile
+
+MIX_PAR_DEFAUT = {'check': 60, 'profil': 15, 'reaction': 15, 'recherche': 10}
+QUANTILES = {'p50': 0.5, 'p90': 0.9, 'p99': 0.99, 'p999': 0.999}
+
+
+# ============= TRAFIC =============
+
+def construire_requetes(utilisateurs, aliments, aleatoire):
+    """Générateurs (méthode, chemin, corps) pour chaque type de trafic"""
+    u = lambda: aleatoire.choice(utilisateurs)
+    a = lambda: aleatoire.choice(aliments)
+
+    def reaction():
+        eaten = aleatoire.randint(1, 20)
+        return ('POST', f'/api/allergies/users/{u()}/reactions', {
+            'aliment_id': a(),
+            'times_eaten': eaten,
+            'times_reacted': aleatoire.randint(0, eaten // 3)
+        })
+
+    return {
+        'check': lambda: ('GET', f'/api/allergies/check/{u()}/{a()}', None),
+        'comptoir': lambda: ('GET', f'/api/comptoir/{u()}/aliments/{a()}', None),
+        'profil': lambda: ('GET', f'/api/allergies/users/{u()}/profile', None),
+        'reaction': reaction,
+        'recherche': lambda: ('GET', f'/api/aliments/recherche/{quote(aleatoire.choice(NOMS_ALIMENTS)[:3])}', None),
+    }
+
+
+def parser_mix(texte):
+    """'check=60,profil=20' → {'check': 60.0, 'profil': 20.0}"""
+    mix = {}
+    for element in texte.split(','):
+        nom, _, poids = element.partition('=')
+        mix[nom.strip()] = float(poids)
+    return mix
+
+
+# ============= CONNEXIONS =============
+
+class Connexion:
+    """Connexion HTTP persistante, rouverte si le serveur la ferme"""
+
+    def __init__(self, hote, port, timeout):
+        self.hote, self.port, self.timeout = hote, port, timeout
+        self._conn = None
+
+    def envoyer(self, methode, chemin, corps):
+        entetes = {'Connection': 'keep-alive'}
+        donnees = None
+        if corps is not None:
+            donnees = json.dumps(corps).encode()
+            entetes['Content-Type'] = 'application/json'
+
+        for tentative in range(2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.hote, self.port, timeout=self.timeout)
+            try:
+                self._conn.request(methode, chemin, body=donnees, headers=entetes)
+                response = self._conn.getresponse()
+                response.read()
+                if response.getheader('Connection', '').lower() == 'close':
+                    self.fermer()
+                return response.status
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # Connexion keep-alive fermée côté serveur : une seule nouvelle tentative
+                self.fermer()
+                if tentative:
+                    raise
+
+    def fermer(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def decouvrir_ids(url_base, chemin, timeout):
+    """Récupère les identifiants existants (utilisateurs, aliments) depuis l'API"""
+    cible = urlsplit(url_base)
+    conn = http.client.HTTPConnection(cible.hostname, cible.port or 80, timeout=timeout)
+    conn.request('GET', chemin)
+    response = conn.getresponse()
+    donnees = json.loads(response.read() or b'[]')
+    conn.close()
+    return [element['id'] for element in donnees] if isinstance(donnees, list) else []
+
+
+# ============= BOUCLE OUVERTE =============
+
+def executer(url_base, debit, duree, connexions, mix, utilisateurs, aliments,
+             poisson=True, timeout=30.0, graine=None):
+    """Envoie debit × duree requêtes planifiées et renvoie les mesures brutes"""
+    cible = urlsplit(url_base)
+    aleatoire = random.Random(graine)
+    requetes = construire_requetes(utilisateurs, aliments, aleatoire)
+    noms = [nom for nom in mix if nom in requetes]
+    poids = [mix[nom] for nom in noms]
+
+    file = queue.Queue()
+    mesures = []
+    verrou = threading.Lock()
+
+    def travailleur():
+        connexion = Connexion(cible.hostname, cible.port or 80, timeout)
+        locales = []
+        while True:
+            tache = file.get()
+            if tache is None:
+                break
+            prevu, nom, (methode, chemin, corps) = tache
+            envoi = time.perf_counter()
+            try:
+                statut = connexion.envoyer(methode, chemin, corps)
+            except (OSError, http.client.HTTPException):
+                statut = None
+                connexion.fermer()
+            fin = time.perf_counter()
+            locales.append((nom, prevu, envoi, fin, statut))
+        connexion.fermer()
+        with verrou:
+            mesures.extend(locales)
+
+    threads = [threading.Thread(target=travailleur, daemon=True) for _ in range(connexions)]
+    for thread in threads:
+        thread.start()
+
+    # Planification indépendante des réponses : un serveur lent ne ralentit pas l'émission
+    total = int(debit * duree)
+    debut = time.perf_counter()
+    prevu = debut
+    for _ in range(total):
+        prevu += aleatoire.expovariate(debit) if poisson else 1.0 / debit
+        attente = prevu - time.perf_counter()
+        if attente > 0:
+            time.sleep(attente)
+        nom = aleatoire.choices(noms, poids)[0]
+        file.put((prevu, nom, requetes[nom]()))
+
+    for _ in threads:
+        file.put(None)
+    for thread in threads:
+        thread.join()
+
+    return mesures, time.perf_counter() - debut
+
+
+def resumer(mesures, duree_totale, debit_cible):
+    """Percentiles corrigés (depuis l'instant prévu) et de service, par type et global"""
+    def stats(lignes):
+        corrigees = [(fin - prevu) * 1000 for _, prevu, _, fin, _ in lignes]
+        service = [(fin - envoi) * 1000 for _, _, envoi, fin, _ in lignes]
+        erreurs = sum(1 for *_, statut in lignes if statut is None or statut >= 500)
+        return {
+            'requetes': len(lignes),
+            'taux_erreur_pourcent': round(erreurs / len(lignes) * 100, 2) if lignes else 0.0,
+            'latence_corrigee_ms': {nom: round(percentile(corrigees, q), 2) for nom, q in QUANTILES.items()},
+            'latence_service_ms': {nom: round(percentile(service, q), 2) for nom, q in QUANTILES.items()},
+            'max_corrigee_ms': round(max(corrigees), 2) if corrigees else 0.0
+        }
+
+    par_type = {}
+    for ligne in mesures:
+        par_type.setdefault(ligne[0], []).append(ligne)
+
+    return {
+        'debit_cible_rps': debit_cible,
+        'debit_atteint_rps': round(len(mesures) / duree_totale, 1) if duree_totale > 0 else 0.0,
+        'global': stats(mesures),
+        'par_type': {nom: stats(lignes) for nom, lignes in sorted(par_type.items())}
+    }
+
+
+def afficher(rapport):
+    print(f"\n🎯 Débit cible : {rapport['debit_cible_rps']} req/s — atteint : {rapport['debit_atteint_rps']} req/s")
+    print(f"{'Type':<12}{'req':>8}{'err %':>8}{'p50':>10}{'p99':>10}{'p99.9':>10}{'p99 service':>14}")
+    print('-' * 72)
+    lignes = list(rapport['par_type'].items()) + [('GLOBAL', rapport['global'])]
+    for nom, s in lignes:
+        c, sv = s['latence_corrigee_ms'], s['latence_service_ms']
+        print(f"{nom:<12}{s['requetes']:>8}{s['taux_erreur_pourcent']:>8}{c['p50']:>10}{c['p99']:>10}{c['p999']:>10}{sv['p99']:>14}")
+    print("\nLatences corrigées de l'omission coordonnée (mesurées depuis l'instant prévu d'envoi).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Générateur de charge HTTP en boucle ouverte')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='URL du serveur')
+    parser.add_argument('--debit', type=float, default=100, help='Débit cible (requêtes/s)')
+    parser.add_argument('--duree', type=float, default=30, help='Durée du test (s)')
+    parser.add_argument('--connexions', type=int, default=32, help='Connexions concurrentes')
+    parser.add_argument('--mix', default=','.join(f'{k}={v}' for k, v in MIX_PAR_DEFAUT.items()),
+                        help='Pondération du trafic, ex. check=60,profil=15,reaction=15,recherche=10')
+    parser.add_argument('--constant', action='store_true', help='Arrivées régulières au lieu de Poisson')
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--graine', type=int)
+    parser.add_argument('--sortie', help='Fichier JSON pour le rapport')
+    args = parser.parse_args()
+
+    utilisateurs = decouvrir_ids(args.url, '/api/utilisateurs/', args.timeout)
+    aliments = decouvrir_ids(args.url, '/api/aliments/', args.timeout)
+    if not utilisateurs or not aliments:
+        print("❌ Aucun utilisateur ou aliment trouvé : peuplez la base d'abord (seeder.py)")
+        sys.exit(1)
+
+    print(f"🚦 {args.debit} req/s pendant {args.duree}s sur {args.connexions} connexions "
+          f"({len(utilisateurs)} utilisateurs, {len(aliments)} aliments)")
+    mesures, duree = executer(
+        args.url, args.debit, args.duree, args.connexions, parser_mix(args.mix),
+        utilisateurs, aliments, poisson=not args.constant, timeout=args.timeout, graine=args.graine
+    )
+    rapport = resumer(mesures, duree, args.debit)
+    afficher(rapport)
+
+    if args.sortie:
+        with open(args.sortie, 'w') as f:
+            json.dump(rapport, f, indent=2, ensure_ascii=False)
+        print(f"💾 Rapport enregistré : {args.sortie}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,7 @@ from flask import Flask
 from flask_migrate import Migrate
 from flask_restx import Api
 from app.db.db import db
-from app.initialize_functions import register_blueprints
+from app.initialize_functions import register_blueprints, register_commands, register_index_memoire, register_monitoring, register_protections
 import os
 
 def create_app():
@@ -50,9 +50,21 @@ def create_app():
     db.init_app(app)
     Migrate(app, db)
     
+    # Instrumentation des performances
+    register_monitoring(app)
+    
+    # Protection contre la surcharge (limites de concurrence)
+    register_protections(app)
+    
+    # Index en mémoire (vérifications d'allergies sans requête SQL)
+    register_index_memoire(app)
+    
     # Enregistrer les blueprints avec l'API
     register_blueprints(app, api)
     
+    # Commandes CLI (flask import-aliments, ...)
+    register_commands(app)
+    
     return app
 
 # Créer l'instance de l'application
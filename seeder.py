@@ -1,5 +1,11 @@
 from app.model import db, Utilisateur, Aliment, Recette, Menu, Buffet, Recommandation, Allergie, Categorie, ReactionAllergique, AllergieUtilisateur
 from run import create_app
+from werkzeug.security import generate_password_hash
+from datetime import datetime
+import argparse
+import io
+import random
+import time
 
 app = create_app()
 
@@ -307,5 +313,234 @@ def seed_all():
             utilisateur = Utilisateur.query.get(reaction.utilisateur_id)
             print(f"• {utilisateur.prenom} {utilisateur.nom} - {aliment.nom}: {reaction.probabilite_allergie():.1f}% ({'ALLERGIQUE' if reaction.is_allergic() else 'OK'})")
 
+
+# ============= MODE VOLUME : GÉNÉRATION MASSIVE =============
+
+# Familles d'allergènes : (nom, prévalence dans la population, aliments typiques)
+FAMILLES_ALLERGENES = [
+    ('Lait', 0.030, ['Lait de vache', 'Yaourt', 'Fromage', 'Beurre', 'Crème fraîche']),
+    ('Arachide', 0.020, ['Arachides', 'Beurre de cacahuète', 'Huile d\'arachide']),
+    ('Fruits à coque', 0.015, ['Noisette', 'Amande', 'Noix de cajou', 'Noix', 'Pistache']),
+    ('Oeuf', 0.015, ['Oeuf', 'Mayonnaise', 'Meringue']),
+    ('Crustacés', 0.010, ['Crevette', 'Crabe', 'Homard', 'Langoustine']),
+    ('Blé', 0.010, ['Pain', 'Pâtes', 'Semoule', 'Farine de blé']),
+    ('Soja', 0.005, ['Tofu', 'Sauce soja', 'Lait de soja']),
+    ('Poisson', 0.005, ['Saumon', 'Thon', 'Cabillaud', 'Sardine']),
+    ('Sésame', 0.003, ['Graines de sésame', 'Tahini']),
+    ('Mollusques', 0.002, ['Moule', 'Huître', 'Calamar']),
+]
+# Une allergie par aliment allergène, nommée comme l'aliment (même convention que la détection automatique)
+ALLERGIES_VOLUME = [(nom, famille) for famille, (_, _, noms) in enumerate(FAMILLES_ALLERGENES) for nom in noms]
+ALIMENTS_NEUTRES = ['Pomme', 'Poire', 'Banane', 'Carotte', 'Brocoli', 'Courgette', 'Riz complet',
+                    'Quinoa', 'Poulet', 'Boeuf', 'Lentilles', 'Pois chiches', 'Tomate', 'Épinards']
+PRENOMS = ['Jean', 'Marie', 'Pierre', 'Awa', 'Paul', 'Fatou', 'Luc', 'Aminata', 'Éric', 'Sophie']
+NOMS = ['Dupont', 'Martin', 'Durand', 'Ndiaye', 'Bernard', 'Mbarga', 'Petit', 'Kamga', 'Moreau', 'Fotso']
+
+
+def _valeur_copy(valeur):
+    """Format texte de COPY : NULL = \\N, tabulations et retours échappés"""
+    if valeur is None:
+        return '\\N'
+    if isinstance(valeur, bool):
+        return 't' if valeur else 'f'
+    if isinstance(valeur, datetime):
+        return valeur.isoformat()
+    texte = str(valeur)
+    return texte.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+
+def _ecrire_lots(connexion, dialecte, table, colonnes, lignes, taille_lot):
+    """Écrit un flux de tuples par lots : COPY sur PostgreSQL, executemany ailleurs"""
+    curseur = connexion.cursor()
+    total = 0
+    lot = []
+
+    def vider():
+        if not lot:
+            return
+        if dialecte == 'postgresql':
+            tampon = io.StringIO()
+            for ligne in lot:
+                tampon.write('\t'.join(_valeur_copy(v) for v in ligne))
+                tampon.write('\n')
+            tampon.seek(0)
+            curseur.copy_expert(f"COPY {table} ({', '.join(colonnes)}) FROM STDIN", tampon)
+        else:
+            marqueurs = ', '.join('?' if dialecte == 'sqlite' else '%s' for _ in colonnes)
+            curseur.executemany(f"INSERT INTO {table} ({', '.join(colonnes)}) VALUES ({marqueurs})", lot)
+        lot.clear()
+
+    for ligne in lignes:
+        lot.append(ligne)
+        if len(lot) >= taille_lot:
+            total += len(lot)
+            vider()
+    total += len(lot)
+    vider()
+    curseur.close()
+    return total
+
+
+def seed_volume(utilisateurs=10000, aliments=2000, recettes=5000, reactions=1000000,
+                graine=42, taille_lot=50000):
+    """Génère un jeu de données massif, déterministe et réaliste (prévalences d'allergies)"""
+    aleatoire = random.Random(graine)
+    maintenant = datetime.utcnow()
+
+    with app.app_context():
+        print(f"🌱 Mode volume : {utilisateurs} utilisateurs, {aliments} aliments, "
+              f"{recettes} recettes, {reactions} réactions (graine {graine})")
+        db.drop_all()
+        db.create_all()
+
+        engine = db.engine
+        dialecte = engine.dialect.name
+        connexion = engine.raw_connection()
+        if dialecte == 'sqlite':
+            connexion.execute('PRAGMA journal_mode = OFF')
+            connexion.execute('PRAGMA synchronous = OFF')
+
+        # Aliments : ~30 % rattachés à une famille d'allergènes, le reste neutre
+        familles_aliments = []
+        def lignes_aliments():
+            for i in range(1, aliments + 1):
+                if aleatoire.random() < 0.3:
+                    famille = aleatoire.randrange(len(FAMILLES_ALLERGENES))
+                    base = aleatoire.choice(FAMILLES_ALLERGENES[famille][2])
+                else:
+                    famille = -1
+                    base = aleatoire.choice(ALIMENTS_NEUTRES)
+                familles_aliments.append(famille)
+                yield (i, base, None, round(aleatoire.uniform(10, 600), 1),
+                       round(aleatoire.uniform(0, 30), 1), round(aleatoire.uniform(0, 50), 1),
+                       round(aleatoire.uniform(0, 60), 1), round(aleatoire.uniform(0, 10), 1),
+                       FAMILLES_ALLERGENES[famille][0] if famille >= 0 else 'Standard',
+                       maintenant, maintenant, famille + 2)
+
+        def lignes_recettes():
+            for i in range(1, recettes + 1):
+                yield (i, f'Recette #{i}', None, 'Préparer, cuire et servir',
+                       aleatoire.randint(5, 120), aleatoire.choice(['Facile', 'Moyen', 'Difficile']),
+                       aleatoire.randint(1, 8), maintenant, maintenant)
+
+        # Utilisateurs : un profil allergique latent tiré selon les prévalences
+        hash_commun = generate_password_hash('volume')
+        profils = []
+        def lignes_utilisateurs():
+            for i in range(1, utilisateurs + 1):
+                profils.append(frozenset(
+                    f for f, (_, prevalence, _) in enumerate(FAMILLES_ALLERGENES)
+                    if aleatoire.random() < prevalence
+                ))
+                yield (i, aleatoire.choice(NOMS), aleatoire.choice(PRENOMS), f'utilisateur{i}@volume.example',
+                       hash_commun, aleatoire.randint(16, 85), round(aleatoire.uniform(45, 110), 1),
+                       round(aleatoire.uniform(150, 200), 1), maintenant, maintenant)
+
+        def repartition_reactions():
+            # Au plus une réaction par couple utilisateur/aliment ; le reliquat des arrondis et
+            # des plafonds est redistribué pour atteindre exactement la cible
+            cible = min(reactions, utilisateurs * aliments)
+            if cible < reactions:
+                print(f"⚠️  {reactions} réactions demandées, {cible} possibles "
+                      f"({utilisateurs} utilisateurs × {aliments} aliments)")
+            poids = [aleatoire.uniform(0.5, 1.5) for _ in range(utilisateurs)]
+            somme = sum(poids)
+            nombres = [min(aliments, int(cible * p / somme)) for p in poids]
+            manque = cible - sum(nombres)
+            while manque > 0:
+                for u in range(utilisateurs):
+                    if manque == 0:
+                        break
+                    if nombres[u] < aliments:
+                        nombres[u] += 1
+                        manque -= 1
+            return nombres
+
+        def lignes_reactions():
+            identifiant = 0
+            for u, nombre in enumerate(repartition_reactions(), start=1):
+                profil = profils[u - 1]
+                for aliment_id in aleatoire.sample(range(1, aliments + 1), nombre):
+                    eaten = min(50, 1 + int(aleatoire.expovariate(1 / 6)))
+                    if familles_aliments[aliment_id - 1] in profil:
+                        reacted = max(1, int(eaten * aleatoire.uniform(0.35, 0.9)))
+                    elif aleatoire.random() < 0.03:
+                        reacted = int(eaten * aleatoire.uniform(0, 0.25))
+                    else:
+                        reacted = 0
+                    identifiant += 1
+                    yield (identifiant, u, aliment_id, None, eaten, reacted, maintenant, maintenant)
+
+        def lignes_allergies():
+            for i, (nom, famille) in enumerate(ALLERGIES_VOLUME, start=1):
+                yield (i, nom, f'Allergie {FAMILLES_ALLERGENES[famille][0].lower()} : {nom.lower()} '
+                               f'(génération volume)', 'Modéré', maintenant)
+
+        def lignes_allergies_utilisateur():
+            # ~60 % des allergies latentes sont diagnostiquées et saisies manuellement
+            identifiant = 0
+            for u, profil in enumerate(profils, start=1):
+                for famille in sorted(profil):
+                    if aleatoire.random() < 0.6:
+                        gravite = aleatoire.choice(['Léger', 'Modéré', 'Sévère'])
+                        for allergie_id, (_, famille_allergie) in enumerate(ALLERGIES_VOLUME, start=1):
+                            if famille_allergie == famille:
+                                identifiant += 1
+                                yield (identifiant, u, allergie_id, gravite, False, maintenant)
+
+        etapes = [
+            ('categories', ('id', 'nom', 'description', 'created_at'),
+             ((i, nom, f'Famille {nom}', maintenant) for i, nom in
+              enumerate(['Standard'] + [f[0] for f in FAMILLES_ALLERGENES], start=1))),
+            ('aliments', ('id', 'nom', 'description', 'calories', 'proteines', 'lipides', 'glucides',
+                          'fibres', 'type_aliment', 'created_at', 'updated_at', 'categorie_id'), lignes_aliments()),
+            ('recettes', ('id', 'nom', 'description', 'instructions', 'temps_preparation', 'difficulte',
+                          'portions', 'created_at', 'updated_at'), lignes_recettes()),
+            ('utilisateurs', ('id', 'nom', 'prenom', 'email', 'mot_de_passe_hash', 'age', 'poids', 'taille',
+                              'created_at', 'updated_at'), lignes_utilisateurs()),
+            ('reactions_allergiques', ('id', 'utilisateur_id', 'aliment_id', 'recette_id', 'times_eaten',
+                                       'times_reacted', 'created_at', 'updated_at'), lignes_reactions()),
+            ('allergies', ('id', 'nom', 'description', 'gravite', 'created_at'), lignes_allergies()),
+            ('allergies_utilisateur', ('id', 'utilisateur_id', 'allergie_id', 'gravite_personnelle',
+                                       'detectee_automatiquement', 'created_at'), lignes_allergies_utilisateur()),
+        ]
+
+        debut_total = time.perf_counter()
+        try:
+            for table, colonnes, lignes in etapes:
+                debut = time.perf_counter()
+                total = _ecrire_lots(connexion, dialecte, table, colonnes, lignes, taille_lot)
+                connexion.commit()
+                duree = time.perf_counter() - debut
+                print(f"✅ {table}: {total} lignes en {duree:.1f}s ({total / duree if duree else 0:,.0f} lignes/s)")
+
+            if dialecte == 'postgresql':
+                # Les identifiants explicites ne font pas avancer les séquences SERIAL
+                curseur = connexion.cursor()
+                for table, _, _ in etapes:
+                    curseur.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                                    f"COALESCE((SELECT MAX(id) FROM {table}), 1))")
+                    curseur.execute(f"ANALYZE {table}")
+                connexion.commit()
+                curseur.close()
+        finally:
+            connexion.close()
+
+        print(f"🎉 Génération volume terminée en {time.perf_counter() - debut_total:.1f}s")
+
+
 if __name__ == '__main__':
-    seed_all()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Peuplement de la base de données')
+    parser.add_argument('--volume', action='store_true', help='Génération massive au lieu du jeu de démonstration')
+    parser.add_argument('--utilisateurs', type=int, default=10000)
+    parser.add_argument('--aliments', type=int, default=2000)
+    parser.add_argument('--recettes', type=int, default=5000)
+    parser.add_argument('--reactions', type=int, default=1000000)
+    parser.add_argument('--graine', type=int, default=42)
+    parser.add_argument('--lot', type=int, default=50000, help='Taille des lots COPY / executemany')
+    args = parser.parse_args()
+
+    if args.volume:
+        seed_volume(args.utilisateurs, args.aliments, args.recettes, args.reactions, args.graine, args.lot)
+    else:
+        seed_all()